@@ -0,0 +1,84 @@
+# coding: utf-8
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ITEM = b'{"index":{"status":201}}'
+
+
+class BulkHandler(BaseHTTPRequestHandler):
+    """Answers _bulk requests as a healthy Elasticsearch node would.
+
+    Documents are counted and discarded. The response is written in a single
+    send so that keep-alive requests are not slowed down by delayed ACKs.
+    """
+
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def send_body(self, body: bytes) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self) -> None:
+        self.send_body(b"")
+
+    def do_GET(self) -> None:
+        self.send_body(
+            b'{"version":{"number":"9.0.0"},"tagline":"You Know, for Search"}'
+        )
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        count = body.count(b"\n") // 2
+        with self.server.lock:
+            self.server.documents += count
+            self.server.requests += 1
+            self.server.bytes += len(body)
+        self.send_body(
+            b'{"took":1,"errors":false,"items":[%b]}' % b",".join([ITEM] * count)
+        )
+
+    do_PUT = do_POST
+
+
+class MockBulkServer(ThreadingHTTPServer):
+    """Local HTTP endpoint accepting _bulk requests, run on a daemon thread.
+
+    Usage:
+        with MockBulkServer() as server:
+            ... send to server.port ...
+            server.documents
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), BulkHandler)
+        self.lock = threading.Lock()
+        self.documents = 0
+        self.requests = 0
+        self.bytes = 0
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def reset(self) -> None:
+        with self.lock:
+            self.documents, self.requests, self.bytes = 0, 0, 0
+
+    def __enter__(self) -> "MockBulkServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,296 @@
+# coding: utf-8
+import argparse
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import orjson
+from mft import PyMftParser
+
+from mft2es.models.ElasticsearchUtils import build_bulk_body, calc_hash
+from mft2es.models.MetaData import get_version
+from mft2es.models.Mft2es import (
+    Mft2es,
+    pack_records,
+    process_standard_by_chunk,
+    process_timeline_by_chunk,
+)
+from mft2es.presenters.Mft2esPresenter import Mft2esPresenter
+
+from benchmarks.mock_bulk import MockBulkServer
+from benchmarks.synthetic_mft import build_mft
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+# Results are only compared with a baseline measured in the same conditions
+COMPARABLE = ("entries", "chunk_size", "cpu_count")
+
+# Options of the end-to-end imports, by benchmark name
+END_TO_END = {
+    "bulk_sequential": {},
+    "bulk_threads": {"thread_count": 4},
+    "bulk_multiprocess": {"multiprocess": True, "thread_count": 4},
+    "bulk_raw": {"multiprocess": True, "raw_bulk": True, "thread_count": 4},
+    "bulk_sharded": {"multiprocess": True, "sharded": True, "thread_count": 4},
+    "bulk_timeline": {"multiprocess": True, "timeline_mode": True, "thread_count": 4},
+}
+
+
+def measure(func: Callable[[], int], repeat: int) -> dict:
+    """Run func repeat times and keep the fastest run.
+
+    Args:
+        func (Callable[[], int]): Benchmark, returning the number of records
+            it processed.
+        repeat (int): Number of runs.
+
+    Returns:
+        dict: seconds, records and records_per_second of the fastest run.
+    """
+    best, records = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = func()
+        best = min(best, time.perf_counter() - start)
+    return {
+        "seconds": round(best, 6),
+        "records": records,
+        "records_per_second": round(records / best if best else 0.0, 1),
+    }
+
+
+def run_stages(mft_path: Path, chunk_size: int, repeat: int) -> Dict[str, dict]:
+    """Time each processing stage separately, on data prepared beforehand.
+
+    Args:
+        mft_path (Path): MFT file.
+        chunk_size (int): Number of entries per chunk.
+        repeat (int): Number of runs of each stage.
+
+    Returns:
+        Dict[str, dict]: Result of each stage (see measure).
+    """
+    source = str(mft_path.resolve())
+    chunks = list(Mft2es(mft_path).gen_chunks(chunk_size))
+    packed = [(pack_records(json), paths) for json, paths in chunks]
+    standard = [process_standard_by_chunk(*chunk) for chunk in chunks]
+    records = [record for chunk in standard for record in chunk]
+
+    def entries_json() -> int:
+        return sum(1 for _ in PyMftParser(source).entries_json())
+
+    def entries_csv() -> int:
+        return sum(1 for _ in PyMftParser(source).entries_csv())
+
+    def standard_by_chunk() -> int:
+        return sum(len(process_standard_by_chunk(*chunk)) for chunk in chunks)
+
+    def standard_by_packed_chunk() -> int:
+        return sum(len(process_standard_by_chunk(*chunk)) for chunk in packed)
+
+    def timeline_by_chunk() -> int:
+        return sum(
+            len(process_timeline_by_chunk(json, paths, source))
+            for json, paths in chunks
+        )
+
+    def hash_records() -> int:
+        for record in records:
+            calc_hash(record)
+        return len(records)
+
+    def serialize_bulk() -> int:
+        for chunk in standard:
+            build_bulk_body(chunk, "mft2es", "", "key", source)
+        return len(records)
+
+    def serialize_json() -> int:
+        for record in records:
+            orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+        return len(records)
+
+    stages = {
+        "entries_json": entries_json,
+        "entries_csv": entries_csv,
+        "process_standard_by_chunk": standard_by_chunk,
+        "process_standard_packed": standard_by_packed_chunk,
+        "process_timeline_by_chunk": timeline_by_chunk,
+        "calc_hash": hash_records,
+        "serialize_bulk": serialize_bulk,
+        "serialize_json": serialize_json,
+    }
+    return {name: measure(func, repeat) for name, func in stages.items()}
+
+
+def run_end_to_end(mft_path: Path, chunk_size: int, repeat: int) -> Dict[str, dict]:
+    """Time complete imports into a local mock _bulk endpoint.
+
+    Args:
+        mft_path (Path): MFT file.
+        chunk_size (int): Number of entries per chunk.
+        repeat (int): Number of runs of each import.
+
+    Returns:
+        Dict[str, dict]: Result of each import (see measure).
+    """
+    results = dict()
+    with MockBulkServer() as server:
+        for name, options in END_TO_END.items():
+
+            def bulk_import() -> int:
+                server.reset()
+                success, failed = Mft2esPresenter(
+                    input_path=mft_path,
+                    host="127.0.0.1",
+                    port=server.port,
+                    chunk_size=chunk_size,
+                    is_quiet=True,
+                    **options,
+                ).bulk_import()
+                if failed or success != server.documents:
+                    raise RuntimeError(f"{name}: {failed} documents failed")
+                return success
+
+            results[name] = measure(bulk_import, repeat)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Find the benchmarks slower than the baseline by more than tolerance.
+
+    Args:
+        results (dict): Output of run_suite.
+        baseline (dict): Output of run_suite stored as the baseline.
+        tolerance (float): Accepted slowdown (0.2: 20% fewer records/s).
+
+    Returns:
+        List[str]: Description of each regression.
+    """
+    regressions = list()
+    for name, expected in baseline.get("benchmarks", {}).items():
+        actual = results["benchmarks"].get(name)
+        if actual is None:
+            continue
+        floor = expected["records_per_second"] * (1 - tolerance)
+        if actual["records_per_second"] < floor:
+            regressions.append(
+                f"{name}: {actual['records_per_second']:.0f} records/s, "
+                f"baseline {expected['records_per_second']:.0f} records/s"
+            )
+    return regressions
+
+
+def run_suite(
+    mft_path: Path, chunk_size: int = 500, repeat: int = 3, end_to_end: bool = True
+) -> dict:
+    """Run every benchmark on an MFT file.
+
+    Args:
+        mft_path (Path): MFT file.
+        chunk_size (int): Number of entries per chunk.
+        repeat (int): Number of runs of each benchmark.
+        end_to_end (bool): Also time complete imports into a mock _bulk endpoint.
+
+    Returns:
+        dict: Environment and results, JSON serializable.
+    """
+    benchmarks = run_stages(mft_path, chunk_size, repeat)
+    if end_to_end:
+        benchmarks.update(run_end_to_end(mft_path, chunk_size, repeat))
+    return {
+        "environment": {
+            "mft2es": get_version("mft2es"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "entries": PyMftParser(str(mft_path)).number_of_entries(),
+            "chunk_size": chunk_size,
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark mft2es on a synthetic $MFT, offline."
+    )
+    parser.add_argument(
+        "--entries", type=int, default=50000, help="Entries of the synthetic $MFT"
+    )
+    parser.add_argument(
+        "--mft", type=Path, help="Benchmark this MFT instead of a synthetic one"
+    )
+    parser.add_argument("--chunk-size", type=int, default=500, help="Chunk size")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each benchmark")
+    parser.add_argument(
+        "--no-end-to-end",
+        action="store_true",
+        help="Only time the stages, not the imports into the mock _bulk endpoint",
+    )
+    parser.add_argument("--output", type=Path, help="Write the results to this file")
+    parser.add_argument(
+        "--baseline", type=Path, default=BASELINE, help="Results to compare with"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Accepted slowdown against the baseline (0.2: 20%% fewer records/s)",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the new baseline instead of comparing",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        mft_path = args.mft or build_mft(Path(directory) / "MFT", args.entries)
+        results = run_suite(
+            mft_path, args.chunk_size, args.repeat, not args.no_end_to_end
+        )
+
+    baseline = (
+        orjson.loads(args.baseline.read_bytes()) if args.baseline.exists() else {}
+    )
+    for name, result in results["benchmarks"].items():
+        expected = baseline.get("benchmarks", {}).get(name)
+        change = (
+            f"{result['records_per_second'] / expected['records_per_second'] - 1:+7.1%}"
+            if expected
+            else ""
+        )
+        print(
+            f"{name:<28}{result['seconds']:>10.3f}s"
+            f"{result['records_per_second']:>14.0f} records/s {change}"
+        )
+
+    output = orjson.dumps(results, option=orjson.OPT_INDENT_2)
+    if args.output:
+        args.output.write_bytes(output)
+    if args.save_baseline:
+        args.baseline.write_bytes(output)
+        return
+
+    environment = baseline.get("environment", {})
+    if any(environment.get(key) != results["environment"][key] for key in COMPARABLE):
+        print(
+            "The baseline was measured on another MFT size, chunk size or CPU "
+            "count; run with --save-baseline to measure one for this machine.",
+            file=sys.stderr,
+        )
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# coding: utf-8
+import argparse
+import random
+import struct
+from pathlib import Path
+from typing import List, Tuple
+
+ENTRY_SIZE = 1024
+SECTOR_SIZE = 512
+
+# Entries 0-15 are the NTFS metadata files, 5 is the root directory
+ROOT_ENTRY = 5
+FIRST_USER_ENTRY = 16
+
+# Attribute type codes
+STANDARD_INFORMATION = 0x10
+FILE_NAME = 0x30
+DATA = 0x80
+END_OF_ATTRIBUTES = 0xFFFFFFFF
+
+# Entry header flags
+IN_USE = 0x01
+DIRECTORY = 0x02
+
+# FILETIME of 2019-04-15, each entry is one second later than the previous one
+BASE_FILETIME = 132000000000000000
+
+
+def filetime(number: int) -> int:
+    return BASE_FILETIME + number * 10000000
+
+
+def resident_attribute(
+    type_code: int, content: bytes, attribute_id: int, name: str = ""
+) -> bytes:
+    """Build a resident attribute (content stored in the entry).
+
+    Args:
+        type_code (int): Attribute type code.
+        content (bytes): Attribute content.
+        attribute_id (int): Identifier unique in the entry.
+        name (str): Attribute name (e.g. the name of an alternate data stream).
+
+    Returns:
+        bytes: Attribute, 8-byte aligned.
+    """
+    encoded_name = name.encode("utf-16-le")
+    content_offset = (24 + len(encoded_name) + 7) // 8 * 8
+    length = (content_offset + len(content) + 7) // 8 * 8
+    attribute = bytearray(length)
+    struct.pack_into(
+        "<IIBBHHH",
+        attribute,
+        0,
+        type_code,
+        length,
+        0,
+        len(name),
+        24 if name else 0,
+        0,
+        attribute_id,
+    )
+    struct.pack_into("<IH", attribute, 16, len(content), content_offset)
+    attribute[24 : 24 + len(encoded_name)] = encoded_name
+    attribute[content_offset : content_offset + len(content)] = content
+    return bytes(attribute)
+
+
+def nonresident_attribute(
+    type_code: int, size: int, lcn: int, attribute_id: int, name: str = ""
+) -> bytes:
+    """Build a non-resident attribute (content stored in clusters).
+
+    Args:
+        type_code (int): Attribute type code.
+        size (int): Size of the content in bytes.
+        lcn (int): First cluster of the (single) data run.
+        attribute_id (int): Identifier unique in the entry.
+        name (str): Attribute name.
+
+    Returns:
+        bytes: Attribute, 8-byte aligned.
+    """
+    clusters = max((size + 4095) // 4096, 1)
+    # one run: 2-byte length, 4-byte offset, then the terminating zero
+    runs = bytes([0x42]) + struct.pack("<H", clusters) + struct.pack("<I", lcn) + b"\0"
+    encoded_name = name.encode("utf-16-le")
+    runs_offset = (64 + len(encoded_name) + 7) // 8 * 8
+    length = (runs_offset + len(runs) + 7) // 8 * 8
+    attribute = bytearray(length)
+    struct.pack_into(
+        "<IIBBHHH",
+        attribute,
+        0,
+        type_code,
+        length,
+        1,
+        len(name),
+        64 if name else 0,
+        0,
+        attribute_id,
+    )
+    struct.pack_into(
+        "<QQHH4xQQQ",
+        attribute,
+        16,
+        0,
+        clusters - 1,
+        runs_offset,
+        0,
+        clusters * 4096,
+        size,
+        size,
+    )
+    attribute[64 : 64 + len(encoded_name)] = encoded_name
+    attribute[runs_offset : runs_offset + len(runs)] = runs
+    return bytes(attribute)
+
+
+def standard_information(number: int) -> bytes:
+    time = filetime(number)
+    return struct.pack(
+        "<QQQQIIIIIIQQ", time, time + 1, time + 2, time + 3, 0x20, 0, 0, 0, 0, 0, 0, 0
+    )
+
+
+def file_name(
+    parent: int,
+    parent_sequence: int,
+    name: str,
+    number: int,
+    size: int,
+    is_directory: bool,
+) -> bytes:
+    time = filetime(number)
+    return struct.pack(
+        "<QQQQQQQIIBB",
+        (parent_sequence << 48) | parent,
+        time,
+        time + 1,
+        time + 2,
+        time + 3,
+        (size + 4095) // 4096 * 4096,
+        size,
+        0x10000000 if is_directory else 0x20,
+        0,
+        len(name),
+        1,  # Win32 namespace
+    ) + name.encode("utf-16-le")
+
+
+def build_entry(
+    number: int, sequence: int, flags: int, attributes: List[bytes]
+) -> bytes:
+    """Build an MFT entry, with the update sequence fixups applied.
+
+    Args:
+        number (int): Record number.
+        sequence (int): Sequence number.
+        flags (int): Entry flags (IN_USE, DIRECTORY).
+        attributes (List[bytes]): Attributes, in type code order.
+
+    Returns:
+        bytes: ENTRY_SIZE bytes.
+    """
+    entry = bytearray(ENTRY_SIZE)
+    offset = 0x38
+    for attribute in attributes:
+        entry[offset : offset + len(attribute)] = attribute
+        offset += len(attribute)
+    struct.pack_into("<I", entry, offset, END_OF_ATTRIBUTES)
+    offset += 8
+
+    sectors = ENTRY_SIZE // SECTOR_SIZE
+    entry[0:4] = b"FILE"
+    struct.pack_into(
+        "<HHQHHHHIIQHHI",
+        entry,
+        4,
+        0x30,  # update sequence array offset
+        sectors + 1,
+        0,
+        sequence,
+        1,
+        0x38,  # first attribute
+        flags,
+        offset,
+        ENTRY_SIZE,
+        0,
+        len(attributes),
+        0,
+        number,
+    )
+
+    # the last two bytes of each sector are saved in the update sequence array
+    update_sequence = 1
+    struct.pack_into("<H", entry, 0x30, update_sequence)
+    for sector in range(sectors):
+        end = (sector + 1) * SECTOR_SIZE - 2
+        entry[0x32 + 2 * sector : 0x34 + 2 * sector] = entry[end : end + 2]
+        struct.pack_into("<H", entry, end, update_sequence)
+    return bytes(entry)
+
+
+def build_mft(
+    path: Path,
+    entries: int,
+    depth: int = 12,
+    directory_ratio: float = 0.1,
+    ads_ratio: float = 0.1,
+    nonresident_ratio: float = 0.3,
+    seed: int = 0,
+) -> Path:
+    """Write a synthetic $MFT image.
+
+    Entries 0-15 mimic the metadata files, entry 5 being the root directory.
+    The following entries are files and directories placed in a tree of at
+    most depth levels, the first ones forming a chain of depth nested
+    directories. Files carry resident or non-resident $DATA, some of them an
+    alternate data stream, and about 1 entry in 13 is deleted (not in use).
+
+    Args:
+        path (Path): Output file.
+        entries (int): Number of entries.
+        depth (int): Maximum depth of the directory tree.
+        directory_ratio (float): Share of entries that are directories.
+        ads_ratio (float): Share of files with an alternate data stream.
+        nonresident_ratio (float): Share of files whose $DATA is non-resident.
+        seed (int): Seed of the random generator, for reproducible images.
+
+    Returns:
+        Path: Output file.
+    """
+    rng = random.Random(seed)
+    # (record number, depth) of each directory
+    directories: List[Tuple[int, int]] = [(ROOT_ENTRY, 0)]
+    lcn = 0x10000
+
+    with Path(path).open("wb") as f:
+        for number in range(entries):
+            information = resident_attribute(
+                STANDARD_INFORMATION, standard_information(number), 0
+            )
+            if number < FIRST_USER_ENTRY:
+                is_root = number == ROOT_ENTRY
+                name = "." if is_root else f"$Meta{number}"
+                attributes = [
+                    information,
+                    resident_attribute(
+                        FILE_NAME,
+                        file_name(ROOT_ENTRY, ROOT_ENTRY, name, number, 0, is_root),
+                        1,
+                    ),
+                ]
+                flags = IN_USE | (DIRECTORY if is_root else 0)
+                f.write(
+                    build_entry(number, ROOT_ENTRY if is_root else 1, flags, attributes)
+                )
+                continue
+
+            if number < FIRST_USER_ENTRY + depth:
+                # the chain reaching the maximum depth
+                parent, level = directories[-1]
+                is_directory = True
+            else:
+                parent, level = rng.choice(directories)
+                is_directory = level + 1 < depth and rng.random() < directory_ratio
+            parent_sequence = ROOT_ENTRY if parent == ROOT_ENTRY else 1
+
+            if is_directory:
+                size = 0
+                name = f"dir{number}"
+                attributes = [
+                    information,
+                    resident_attribute(
+                        FILE_NAME,
+                        file_name(parent, parent_sequence, name, number, 0, True),
+                        1,
+                    ),
+                ]
+                directories.append((number, level + 1))
+            else:
+                nonresident = rng.random() < nonresident_ratio
+                size = (
+                    rng.randint(4096, 1 << 24) if nonresident else rng.randint(0, 256)
+                )
+                name = f"file{number}.{rng.choice(('txt', 'exe', 'dll', 'log'))}"
+                attributes = [
+                    information,
+                    resident_attribute(
+                        FILE_NAME,
+                        file_name(parent, parent_sequence, name, number, size, False),
+                        1,
+                    ),
+                ]
+                if nonresident:
+                    attributes.append(nonresident_attribute(DATA, size, lcn, 2))
+                    lcn += (size + 4095) // 4096
+                else:
+                    attributes.append(resident_attribute(DATA, rng.randbytes(size), 2))
+                if rng.random() < ads_ratio:
+                    attributes.append(
+                        resident_attribute(
+                            DATA,
+                            b"[ZoneTransfer]\r\nZoneId=3\r\n",
+                            3,
+                            "Zone.Identifier",
+                        )
+                    )
+
+            flags = (IN_USE if number % 13 else 0) | (DIRECTORY if is_directory else 0)
+            f.write(build_entry(number, 1, flags, attributes))
+
+    return Path(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write a synthetic $MFT image.")
+    parser.add_argument("entries", type=int, help="Number of entries")
+    parser.add_argument("output", type=Path, help="Output file")
+    parser.add_argument("--depth", type=int, default=12, help="Maximum directory depth")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    build_mft(args.output, args.entries, depth=args.depth, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 # coding: utf-8
-from typing import List
+from typing import Dict, Iterator, List, Union
 from pathlib import Path
 
-from mft2es.models.Mft2es import Mft2es
+from mft2es.models.FieldProjection import FieldProjection
+from mft2es.models.Mft2es import Mft2es, parse_fields, parse_tags
+from mft2es.models.RecordFilter import RecordFilter, parse_filter
 from mft2es.presenters.Mft2esPresenter import Mft2esPresenter
 
-
 # for use via python-script!
 
 
@@ -21,6 +22,28 @@ def mft2es(
     multiprocess: bool = False,
     chunk_size: int = 500,
     timeline_mode: bool = False,
+    tags: str = "",
+    single_pass: bool = False,
+    sharded: bool = False,
+    thread_count: int = 0,
+    bulk_size: int = 500,
+    bulk_bytes: int = 100 * 1024 * 1024,
+    queue_size: int = 4,
+    id_strategy: str = "key",
+    raw_bulk: bool = False,
+    fields: Dict[str, str] = None,
+    checkpoint: str = "",
+    resume: bool = False,
+    max_retries: int = 5,
+    dead_letter: str = "",
+    worker_batch: int = 1,
+    auto_size: bool = False,
+    max_memory: int = 1024,
+    filters: List[str] = None,
+    projection: Union[str, List[str]] = "full",
+    exclude_fields: List[str] = None,
+    delta: str = "",
+    tag_changes: bool = False,
 ) -> None:
     """Fast import of Windows MFT into Elasticsearch.
     Args:
@@ -52,11 +75,95 @@ def mft2es(
             Flag to run multiprocessing.
 
         chunk_size (int, optional):
-            Size of the chunk to be processed for each process.
+            Number of entries read from the parser at a time. Defaults to 500.
 
         timeline_mode (bool, optional):
             Enable timeline analysis mode - creates specialized records
             for Standard Information, Filename, and attributes.
+
+        tags (str, optional):
+            Comma-separated tags to add to each record (e.g. "WS1,DOMAIN").
+
+        single_pass (bool, optional):
+            Parse the MFT once, rebuilding full paths from the records.
+
+        sharded (bool, optional):
+            Parse disjoint record ranges of the MFT on each worker process
+            instead of distributing the output of a single parser.
+
+        thread_count (int, optional):
+            Number of threads sending bulk requests concurrently with parsing.
+            Defaults to 0 (sequential).
+
+        bulk_size (int, optional):
+            Maximum number of documents per bulk request. Defaults to 500.
+
+        bulk_bytes (int, optional):
+            Maximum size of a bulk request in bytes. Defaults to 100MiB.
+
+        queue_size (int, optional):
+            Number of bulk requests queued between parser and threads. Defaults to 4.
+
+        id_strategy (str, optional):
+            How document ids are derived: "key" (MFT path, record number and
+            sequence), "content" (sha1 of the record) or "none" (generated by
+            Elasticsearch). Defaults to "key". With "key", the resolved path of
+            the MFT file is part of the ids, so importing the same file again
+            from another location creates duplicates.
+
+        raw_bulk (bool, optional):
+            Serialize bulk request bodies with the records (in the worker
+            processes with multiprocess) and send them as they are.
+
+        fields (Dict[str, str], optional):
+            Static fields to add to each record, keyed by dotted name
+            (e.g. {"host.name": "WS1"}).
+
+        checkpoint (str, optional):
+            Journal file recording the records acknowledged by Elasticsearch.
+
+        resume (bool, optional):
+            Skip the records the checkpoint journal records as already imported.
+
+        max_retries (int, optional):
+            Number of retries of documents rejected by a busy cluster. Defaults to 5.
+
+        dead_letter (str, optional):
+            NDJSON file collecting the documents that could not be indexed.
+
+        worker_batch (int, optional):
+            Number of chunks processed by each worker task. Defaults to 1.
+
+        auto_size (bool, optional):
+            Adjust chunk_size, worker_batch and bulk_size while running from the
+            measured throughput, bulk request latency and memory use.
+
+        max_memory (int, optional):
+            Resident memory (MiB) above which auto_size reduces every size.
+            Defaults to 1024.
+
+        filters (List[str], optional):
+            Only import the entries matching every filter term, given as
+            "key=value": path (glob), ext (e.g. "exe,dll"), state
+            (allocated, deleted), type (file, directory), since and until
+            (ISO 8601 times of a StandardInformation or FileName timestamp).
+
+        projection (Union[str, List[str]], optional):
+            Fields of each document: a profile ("minimal", "standard" or
+            "full") or dotted field names (e.g. ["header.flags",
+            "attributes.FileName.data"]), "*" matching any one name.
+            Defaults to "full".
+
+        exclude_fields (List[str], optional):
+            Dotted field names removed from each document.
+
+        delta (str, optional):
+            Fingerprint store of the volume: only the entries that are new,
+            changed or deleted since the last import that saved it are sent.
+
+        tag_changes (bool, optional):
+            Add the change type (new, changed, deleted) of each document sent
+            with delta as the "delta" field.
     """
 
     mp = Mft2esPresenter(
@@ -72,41 +179,132 @@ def mft2es(
         multiprocess=multiprocess,
         chunk_size=int(chunk_size),
         timeline_mode=timeline_mode,
+        tags=tags,
+        single_pass=single_pass,
+        sharded=sharded,
+        thread_count=int(thread_count),
+        bulk_size=int(bulk_size),
+        bulk_bytes=int(bulk_bytes),
+        queue_size=int(queue_size),
+        id_strategy=id_strategy,
+        raw_bulk=raw_bulk,
+        fields=parse_fields(fields or {}),
+        checkpoint=checkpoint,
+        resume=resume,
+        max_retries=int(max_retries),
+        dead_letter=dead_letter,
+        worker_batch=int(worker_batch),
+        auto_size=auto_size,
+        max_memory=int(max_memory),
+        filters=tuple(map(parse_filter, filters or ())),
+        projection=projection,
+        exclude_fields=tuple(exclude_fields or ()),
+        delta=delta,
+        tag_changes=tag_changes,
     ).bulk_import()
 
 
+def iter_mft_records(
+    filepath: str,
+    timeline_mode: bool = False,
+    multiprocess: bool = False,
+    chunk_size: int = 500,
+    tags: str = "",
+    fields: Dict[str, str] = None,
+    single_pass: bool = False,
+    sharded: bool = False,
+    filters: List[str] = None,
+    projection: Union[str, List[str]] = "full",
+    exclude_fields: List[str] = None,
+) -> Iterator[dict]:
+    """Read the records of a Windows MFT one at a time.
+
+    Records are parsed chunk by chunk as they are consumed, so only the chunks
+    in progress are held in memory.
+
+    Args:
+        filepath (str): Input MFT file.
+        timeline_mode (bool): Enable timeline analysis mode - creates specialized records.
+        multiprocess (bool): Flag to run multiprocessing.
+        chunk_size (int): Number of entries read from the parser at a time.
+        tags (str): Comma-separated tags to add to each record (e.g. "WS1,DOMAIN").
+        fields (Dict[str, str]): Static fields to add to each record, keyed by
+            dotted name (e.g. {"host.name": "WS1"}).
+        single_pass (bool): Parse the MFT once, rebuilding full paths from the records.
+        sharded (bool): Parse disjoint record ranges of the MFT on each process.
+        filters (List[str]): Only read the entries matching every filter term
+            (e.g. ["ext=exe,dll", "state=deleted"], see mft2es).
+        projection (Union[str, List[str]]): Profile or field names of each
+            record (see mft2es).
+        exclude_fields (List[str]): Field names removed from each record.
+
+    Raises:
+        ValueError: If a field name or filter term is invalid, as on the
+            command line.
+
+    Yields:
+        Iterator[dict]: MFT records (several per entry in timeline mode).
+    """
+    mft = Mft2es(Path(filepath).resolve(), single_pass=single_pass, sharded=sharded)
+    for records in mft.gen_timeline_records(
+        multiprocess=multiprocess,
+        chunk_size=int(chunk_size),
+        timeline_mode=timeline_mode,
+        tags=parse_tags(tags),
+        fields=parse_fields(fields or {}),
+        record_filter=RecordFilter.from_terms(map(parse_filter, filters or ())),
+        projection=FieldProjection.from_options(projection, exclude_fields),
+    ):
+        yield from records
+
+
 def mft2json(
     filepath: str,
     multiprocess: bool = False,
     chunk_size: int = 500,
     timeline_mode: bool = False,
+    single_pass: bool = False,
+    sharded: bool = False,
+    tags: str = "",
+    fields: Dict[str, str] = None,
+    filters: List[str] = None,
+    projection: Union[str, List[str]] = "full",
+    exclude_fields: List[str] = None,
 ) -> List[dict]:
     """Convert Windows MFT to List[dict].
 
     Args:
         filepath (str): Input MFT file.
         multiprocess (bool): Flag to run multiprocessing.
-        chunk_size (int): Size of the chunk to be processed for each process.
+        chunk_size (int): Number of entries read from the parser at a time.
         timeline_mode (bool): Enable timeline analysis mode - creates specialized records.
+        single_pass (bool): Parse the MFT once, rebuilding full paths from the records.
+        sharded (bool): Parse disjoint record ranges of the MFT on each process.
+        tags (str): Comma-separated tags to add to each record (e.g. "WS1,DOMAIN").
+        fields (Dict[str, str]): Static fields to add to each record, keyed by
+            dotted name (e.g. {"host.name": "WS1"}).
+        filters (List[str]): Only convert the entries matching every filter
+            term (e.g. ["ext=exe,dll", "state=deleted"], see mft2es).
+        projection (Union[str, List[str]]): Profile or field names of each
+            record (see mft2es).
+        exclude_fields (List[str]): Field names removed from each record.
 
     Note:
-        Since the content of the file is loaded into memory at once,
-        it requires the same amount of memory as the file to be loaded.
+        Every record is kept in memory; use iter_mft_records to process
+        records as they are read instead.
     """
-    mft = Mft2es(Path(filepath).resolve())
-    if timeline_mode:
-        records: List[dict] = sum(
-            list(
-                mft.gen_timeline_records(
-                    multiprocess=multiprocess, chunk_size=chunk_size
-                )
-            ),
-            list(),
+    return list(
+        iter_mft_records(
+            filepath,
+            timeline_mode=timeline_mode,
+            multiprocess=multiprocess,
+            chunk_size=chunk_size,
+            tags=tags,
+            fields=fields,
+            single_pass=single_pass,
+            sharded=sharded,
+            filters=filters,
+            projection=projection,
+            exclude_fields=exclude_fields,
         )
-    else:
-        records: List[dict] = sum(
-            list(mft.gen_records(multiprocess=multiprocess, chunk_size=chunk_size)),
-            list(),
-        )
-
-    return records
+    )
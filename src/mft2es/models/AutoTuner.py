@@ -0,0 +1,154 @@
+# coding: utf-8
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
+# Bounds of the sizes the tuner moves between
+MIN_CHUNK_SIZE = 100
+MAX_CHUNK_SIZE = 20000
+MAX_WORKER_BATCH = 64
+MIN_BULK_SIZE = 10
+MAX_BULK_SIZE = 10000
+
+# Throughput is measured over windows of at least this many seconds
+WINDOW_SECONDS = 2.0
+
+# Bulk requests faster than the first bound grow, slower than the second shrink
+TARGET_LATENCY = (0.5, 2.0)
+
+
+def get_rss() -> Optional[int]:
+    """Get the resident set size of this process.
+
+    Returns:
+        Optional[int]: RSS in bytes (the peak RSS where the current one is not
+            available), or None if it cannot be measured on this platform.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class AutoTuner(object):
+    """Adjusts the parse chunk, worker batch and bulk sizes while importing.
+
+    The parse chunk size and the worker batch size are tuned in turn by hill
+    climbing on the records/s measured over each window: a size keeps moving
+    (doubling or halving) while throughput improves, and turns back once it
+    drops. The bulk size grows while requests take less than TARGET_LATENCY
+    and shrinks when they take more. Every size is halved while the RSS of
+    this process exceeds max_memory.
+
+    The get_* methods can be passed wherever a size, or a callable returning
+    one, is accepted (see current_size); each size is read once per chunk or
+    request, so it may change from any thread.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 500,
+        worker_batch: int = 1,
+        bulk_size: int = 500,
+        max_memory: int = 1024 * 1024 * 1024,
+    ) -> None:
+        self.chunk_size = chunk_size
+        self.worker_batch = worker_batch
+        self.bulk_size = bulk_size
+        self.max_memory = max_memory
+        self.lock = threading.Lock()
+
+        # direction (1: double, -1: halve) of the next move of each size
+        self.directions = {"chunk_size": 1, "worker_batch": 1}
+        self.moved: Optional[str] = None
+        self.last_rate: Optional[float] = None
+        self.window_start = time.perf_counter()
+        self.window_records = 0
+
+    def get_chunk_size(self) -> int:
+        return self.chunk_size
+
+    def get_worker_batch(self) -> int:
+        return self.worker_batch
+
+    def get_bulk_size(self) -> int:
+        return self.bulk_size
+
+    def observe_records(self, count: int) -> None:
+        """Report records produced by the import.
+
+        Args:
+            count (int): Number of records (documents) produced.
+        """
+        with self.lock:
+            self.window_records += count
+            elapsed = time.perf_counter() - self.window_start
+            if elapsed < WINDOW_SECONDS:
+                return
+            rate = self.window_records / elapsed
+            self.window_start = time.perf_counter()
+            self.window_records = 0
+
+            rss = get_rss()
+            if rss is not None and self.max_memory < rss:
+                self.chunk_size = max(self.chunk_size // 2, MIN_CHUNK_SIZE)
+                self.worker_batch = max(self.worker_batch // 2, 1)
+                self.bulk_size = max(self.bulk_size // 2, MIN_BULK_SIZE)
+                self.directions = {name: -1 for name in self.directions}
+                self.moved, self.last_rate = None, None
+                return
+
+            self.step(rate)
+
+    def step(self, rate: float) -> None:
+        """Move one of the parse sizes according to the measured throughput.
+
+        Args:
+            rate (float): Records/s of the window that just ended.
+        """
+        if self.moved and self.last_rate is not None and rate < self.last_rate:
+            # the last move made things slower, it is undone on its next turn
+            self.directions[self.moved] *= -1
+        self.last_rate = rate
+
+        self.moved = "worker_batch" if self.moved == "chunk_size" else "chunk_size"
+        if self.moved == "chunk_size":
+            self.chunk_size = self.scale(
+                self.chunk_size,
+                self.directions["chunk_size"],
+                MIN_CHUNK_SIZE,
+                MAX_CHUNK_SIZE,
+            )
+        else:
+            self.worker_batch = self.scale(
+                self.worker_batch, self.directions["worker_batch"], 1, MAX_WORKER_BATCH
+            )
+
+    @staticmethod
+    def scale(size: int, direction: int, lower: int, upper: int) -> int:
+        size = size * 2 if 0 < direction else size // 2
+        return min(max(size, lower), upper)
+
+    def observe_request(self, count: int, seconds: float) -> None:
+        """Report a bulk request that was sent.
+
+        Args:
+            count (int): Number of documents in the request.
+            seconds (float): Time taken by the request.
+        """
+        with self.lock:
+            if TARGET_LATENCY[1] < seconds:
+                self.bulk_size = max(self.bulk_size // 2, MIN_BULK_SIZE)
+            elif seconds < TARGET_LATENCY[0] and self.bulk_size <= count:
+                # only full requests tell whether larger ones would be faster
+                self.bulk_size = min(self.bulk_size * 2, MAX_BULK_SIZE)
@@ -0,0 +1,107 @@
+# coding: utf-8
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Tuple, Union
+
+import orjson
+
+# Lines appended by a journal after which it rewrites the file, keeping the
+# last line of each key
+COMPACT_LINES = 1024
+
+# Serializes the appends and rewrites of the journals of this process (the
+# files imported concurrently share one journal)
+_journal_lock = threading.Lock()
+
+
+class CheckpointJournal(object):
+    """Append-only journal of the MFT records acknowledged by Elasticsearch.
+
+    Each line holds, for an MFT file, an index and the settings the documents
+    are built with (see calc_settings), the record number an interrupted
+    import resumes from: every record below it has been acknowledged. A line
+    is appended for each acknowledged chunk, so a killed process loses at
+    most the chunks that were in flight. The last line of a key wins.
+
+    The file is rewritten with the last line of each key on the first commit,
+    which drops a line cut short by a crash, and every COMPACT_LINES commits,
+    so it does not grow with the number of chunks.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        # the first commit compacts the file
+        self.appended = COMPACT_LINES
+
+    def read(self) -> Dict[Tuple[str, str, str], dict]:
+        """Read the last line of each key.
+
+        Returns:
+            Dict[Tuple[str, str, str], dict]: Lines by source, index and settings.
+        """
+        entries: Dict[Tuple[str, str, str], dict] = dict()
+        if not self.path.exists():
+            return entries
+        for line in self.path.read_bytes().splitlines():
+            try:
+                entry = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # the last line may be cut short by a crash
+                continue
+            key = (entry.get("source"), entry.get("index"), entry.get("settings", ""))
+            entries[key] = entry
+        return entries
+
+    def load(self, source: str, index_name: str, settings: str = "") -> int:
+        """Read the record number to resume an import from.
+
+        Args:
+            source (str): Path of the MFT file.
+            index_name (str): Target Elasticsearch Index.
+            settings (str): Identifies how documents are built (see
+                calc_settings); imports with other settings start over.
+
+        Returns:
+            int: First record number that has not been acknowledged.
+        """
+        entry = self.read().get((source, index_name, settings), {})
+        return entry.get("next_record", 0)
+
+    def compact(self) -> None:
+        """Rewrite the file with the last line of each key, replacing it at once."""
+        lines = b"".join(
+            orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE)
+            for entry in self.read().values()
+        )
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        temporary.write_bytes(lines)
+        os.replace(temporary, self.path)
+
+    def commit(
+        self, source: str, index_name: str, next_record: int, settings: str = ""
+    ) -> None:
+        """Record that every record below next_record has been acknowledged.
+
+        Args:
+            source (str): Path of the MFT file.
+            index_name (str): Target Elasticsearch Index.
+            next_record (int): First record number that has not been acknowledged.
+            settings (str): Identifies how documents are built (see calc_settings).
+        """
+        line = orjson.dumps(
+            {
+                "source": source,
+                "index": index_name,
+                "settings": settings,
+                "next_record": next_record,
+            },
+            option=orjson.OPT_APPEND_NEWLINE,
+        )
+        with _journal_lock:
+            if COMPACT_LINES <= self.appended:
+                self.compact()
+                self.appended = 0
+            with self.path.open("ab") as f:
+                f.write(line)
+            self.appended += 1
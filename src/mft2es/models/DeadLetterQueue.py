@@ -0,0 +1,45 @@
+# coding: utf-8
+import threading
+from pathlib import Path
+from typing import Generator, List, Union
+
+
+class DeadLetterQueue(object):
+    """NDJSON file of the _bulk operations that could not be indexed.
+
+    Each document is stored as its action line followed by its source line,
+    so the file is itself a valid _bulk body and can be sent again as is
+    (see mft2es-replay).
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def write(self, operations: List[bytes]) -> None:
+        """Append operations (action and source line pairs) to the file.
+
+        Args:
+            operations (List[bytes]): _bulk operations, one per document.
+        """
+        if not operations:
+            return
+
+        with self.lock:
+            with self.path.open("ab") as f:
+                f.writelines(operations)
+            self.count += len(operations)
+
+    def read(self) -> Generator:
+        """Read the operations stored in the file.
+
+        Yields:
+            Generator: Yields bytes, the action and source lines of a document.
+        """
+        if not self.path.exists():
+            return
+
+        with self.path.open("rb") as f:
+            for action in f:
+                yield action + next(f, b"")
@@ -1,26 +1,244 @@
 # coding: utf-8
-from typing import List
+import threading
+import time
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from typing import Callable, List, Iterable, Generator, Optional, Tuple
 from hashlib import sha1
 
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch import (
+    ApiError,
+    ConnectionError,
+    ConnectionTimeout,
+    Elasticsearch,
+)
 
 import orjson
 
+from mft2es.models.DeadLetterQueue import DeadLetterQueue
+from mft2es.models.ImportStats import ImportStats
+from mft2es.models.IterUtils import Size, current_size, imap_bounded
+
+# How the _id of each document is derived.
+#   key:     MFT path, record number, sequence (and attribute/MACB type in timeline mode)
+#   content: SHA-1 of the record serialized with sorted keys
+#   none:    no _id, generated by Elasticsearch (re-imports create duplicates)
+ID_STRATEGIES = ("key", "content", "none")
+
+# Statuses returned by a busy cluster; the documents are retried with backoff
+RETRY_STATUSES = (429, 503)
+
+# Smallest request size the retries split rejected documents into
+MIN_BULK_SIZE = 10
+
+# Delay before the first retry, doubled on each retry up to MAX_BACKOFF (seconds)
+INITIAL_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+
+def calc_hash(record: dict) -> str:
+    """Calculate hash value from record.
+
+    Args:
+        record (dict): MFT record.
+
+    Returns:
+        str: Hash value
+    """
+    return sha1(orjson.dumps(record, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def calc_prefix(source: str) -> str:
+    """Calculate the id prefix identifying an MFT file.
+
+    The prefix identifies the file by its path, not by its volume: the same
+    MFT read from another path gets other ids.
+
+    Args:
+        source (str): Path of the MFT file.
+
+    Returns:
+        str: Id prefix
+    """
+    return sha1(source.encode("utf-8")).hexdigest()[:16]
+
+
+def calc_key(record: dict, prefix: str) -> str:
+    """Derive document id from the natural key of record.
+
+    Args:
+        record (dict): MFT record (standard or timeline).
+        prefix (str): Identifier of the MFT file the record was read from.
+
+    Returns:
+        str: Document id
+    """
+    if "windows" in record:
+        mft = record["windows"]["mft"]
+        attribute = mft["attribute"]
+        return (
+            f"{prefix}-{mft['record']['number']}-{mft['header'].get('sequence')}"
+            f"-{attribute['type']}-{attribute['macb_type']}"
+        )
+
+    header = record.get("header", {})
+    return f"{prefix}-{header.get('record_number')}-{header.get('sequence')}"
+
+
+def calc_id(record: dict, id_strategy: str, prefix: str) -> Optional[str]:
+    """Calculate document id from record according to id_strategy.
+
+    Args:
+        record (dict): MFT record.
+        id_strategy (str): One of ID_STRATEGIES.
+        prefix (str): Identifier of the MFT file the record was read from.
+
+    Returns:
+        Optional[str]: Document id, or None to let Elasticsearch generate it.
+    """
+    if id_strategy == "key":
+        return calc_key(record, prefix)
+    elif id_strategy == "content":
+        return calc_hash(record)
+    return None
+
+
+def gen_operations(
+    records: Iterable[dict],
+    index_name: str,
+    pipeline: str,
+    id_strategy: str = "key",
+    source: str = "",
+) -> Generator:
+    """Serialize records into _bulk operations.
+
+    Args:
+        records (Iterable[dict]): Records read from MFT files.
+        index_name (str): Target Elasticsearch Index.
+        pipeline (str): Target Elasticsearch Ingest Pipeline
+        id_strategy (str): One of ID_STRATEGIES.
+        source (str): Path of the MFT file the records were read from.
+
+    Yields:
+        Generator: Yields bytes, the action and source lines of a document.
+    """
+    prefix = calc_prefix(source)
+    for record in records:
+        action = {"_index": index_name}
+        _id = calc_id(record, id_strategy, prefix)
+        if _id is not None:
+            action["_id"] = _id
+        if pipeline != "":
+            action["pipeline"] = pipeline
+        yield b"%b\n%b\n" % (orjson.dumps({"index": action}), orjson.dumps(record))
+
+
+def build_bulk_body(
+    records: List[dict],
+    index_name: str,
+    pipeline: str,
+    id_strategy: str = "key",
+    source: str = "",
+) -> bytes:
+    """Serialize records into an NDJSON _bulk request body.
+
+    Runs on the worker processes in multiprocess mode, so the records reach
+    the main process already encoded and are sent without re-serialization.
+
+    Args:
+        records (List[dict]): List of each records read from MFT files.
+        index_name (str): Target Elasticsearch Index.
+        pipeline (str): Target Elasticsearch Ingest Pipeline
+        id_strategy (str): One of ID_STRATEGIES.
+        source (str): Path of the MFT file the records were read from.
+
+    Returns:
+        bytes: _bulk request body.
+    """
+    return b"".join(gen_operations(records, index_name, pipeline, id_strategy, source))
+
+
+def split_operations(body: bytes) -> List[bytes]:
+    """Split a _bulk request body into its operations.
+
+    Args:
+        body (bytes): _bulk request body (see build_bulk_body).
+
+    Returns:
+        List[bytes]: Action and source lines of each document.
+    """
+    lines = body.split(b"\n")
+    return [b"%b\n%b\n" % (lines[i], lines[i + 1]) for i in range(0, len(lines) - 1, 2)]
+
+
+def batch_operations(
+    operations: Iterable[bytes],
+    bulk_size: Size = 500,
+    bulk_bytes: int = 100 * 1024 * 1024,
+) -> Generator:
+    """Group operations into bulk requests.
+
+    Args:
+        operations (Iterable[bytes]): _bulk operations (see gen_operations).
+        bulk_size (Size): Maximum number of documents per bulk request, read
+            again for each request.
+        bulk_bytes (int): Maximum size of a bulk request in bytes.
+
+    Yields:
+        Generator: Yields List[bytes].
+    """
+    batch: List[bytes] = list()
+    size = 0
+    limit = current_size(bulk_size)
+    for operation in operations:
+        if batch and (limit <= len(batch) or bulk_bytes < size + len(operation)):
+            yield batch
+            batch, size = list(), 0
+            limit = current_size(bulk_size)
+        batch.append(operation)
+        size += len(operation)
+    if batch:
+        yield batch
+
 
 class ElasticsearchUtils(object):
     def __init__(
-        self, hostname: str, port: int, scheme: str, login: str, pwd: str
+        self,
+        hostname: str,
+        port: int,
+        scheme: str,
+        login: str,
+        pwd: str,
+        id_strategy: str = "key",
+        connections: int = 10,
+        max_retries: int = 5,
+        dead_letter: Optional[DeadLetterQueue] = None,
+        on_request: Optional[Callable[[int, float], None]] = None,
+        stats: Optional[ImportStats] = None,
     ) -> None:
+        self.id_strategy = id_strategy
+        self.max_retries = max_retries
+        self.dead_letter = dead_letter
+        # called with the number of documents and duration of each request
+        self.on_request = on_request
+        # collects the serialize, bulk and backoff times and request sizes
+        self.stats = stats
+        # reduced number of documents per request while the cluster is busy,
+        # shared by the threads sending requests
+        self.pressure_size: Optional[int] = None
+        self.pressure_lock = threading.Lock()
         if login == "":
             self.es = Elasticsearch(
-                hosts=[f"{scheme}://{hostname}:{port}"], verify_certs=False
+                hosts=[f"{scheme}://{hostname}:{port}"],
+                verify_certs=False,
+                connections_per_node=connections,
             )
         else:
             self.es = Elasticsearch(
                 hosts=[f"{scheme}://{hostname}:{port}"],
                 verify_certs=False,
                 http_auth=(login, pwd),
+                connections_per_node=connections,
             )
 
     def calc_hash(self, record: dict) -> str:
@@ -32,35 +250,244 @@ class ElasticsearchUtils(object):
         Returns:
             str: Hash value
         """
-        return sha1(orjson.dumps(record, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        return calc_hash(record)
 
-    def bulk_indice(self, records: List[dict], index_name: str, pipeline: str) -> tuple:
-        """Bulk indices the documents into Elasticsearch.
+    def gen_actions(
+        self,
+        records: Iterable[dict],
+        index_name: str,
+        pipeline: str,
+        source: str = "",
+    ) -> Generator:
+        """Generates bulk actions from records.
 
         Args:
-            records (List[dict]): List of each records read from MFT files.
+            records (Iterable[dict]): Records read from MFT files.
             index_name (str): Target Elasticsearch Index.
             pipeline (str): Target Elasticsearch Ingest Pipeline
+            source (str): Path of the MFT file the records were read from.
 
-        Returns:
-            tuple: (success_count, failed_list) - Results of bulk indexing operation
+        Yields:
+            Generator: Yields bulk action dict.
         """
-        events = []
+        prefix = calc_prefix(source)
         for record in records:
             event = {
-                "_id": self.calc_hash(record),
                 "_index": index_name,
                 "_source": record,
             }
+            _id = calc_id(record, self.id_strategy, prefix)
+            if _id is not None:
+                event["_id"] = _id
             if pipeline != "":
                 event["pipeline"] = pipeline
-            events.append(event)
+            yield event
+
+    def send_batch(self, batch: List[bytes]) -> Tuple[int, list, list]:
+        """Send one _bulk request, sorting its documents by outcome.
+
+        Args:
+            batch (List[bytes]): _bulk operations.
 
-        # Perform bulk indexing and return results
+        Returns:
+            Tuple[int, list, list]: Number of indexed documents, and
+                (operation, item) pairs to retry and that failed.
+        """
         try:
-            success, failed = bulk(
-                self.es, events, raise_on_error=False, stats_only=False
-            )
-            return (success, failed)
-        except Exception as e:
-            raise Exception(f"Bulk indexing error: {e}") from e
+            body = b"".join(batch)
+            start = time.perf_counter()
+            resp = self.es.bulk(operations=body)
+            elapsed = time.perf_counter() - start
+            if self.on_request:
+                self.on_request(len(batch), elapsed)
+            if self.stats:
+                self.stats.observe_request(len(batch), len(body), elapsed)
+        except (ApiError, ConnectionError, ConnectionTimeout) as e:
+            status = getattr(e, "status_code", None)
+            item = {"index": {"status": status, "error": str(e)}}
+            pairs = [(operation, item) for operation in batch]
+            if status is None or status in RETRY_STATUSES:
+                return 0, pairs, []
+            return 0, [], pairs
+
+        success, retry, failed = 0, [], []
+        for operation, item in zip(batch, resp["items"]):
+            op_type, info = next(iter(item.items()))
+            status = info.get("status", 500)
+            if 200 <= status < 300:
+                success += 1
+            elif status in RETRY_STATUSES:
+                retry.append((operation, {op_type: info}))
+            else:
+                failed.append((operation, {op_type: info}))
+        return success, retry, failed
+
+    def send_operations(self, operations: List[bytes]) -> tuple:
+        """Send _bulk operations, retrying the documents a busy cluster rejects.
+
+        Documents rejected with RETRY_STATUSES, or whose request could not be
+        delivered, are retried up to max_retries times with exponential
+        backoff. While retrying, requests are split into smaller ones, and
+        the reduced size carries over to the following calls until requests
+        go through again. Documents that still fail are written to the
+        dead-letter queue, if any.
+
+        Args:
+            operations (List[bytes]): _bulk operations (see gen_operations).
+
+        Returns:
+            tuple: (success_count, failed_list) - Results of bulk indexing operation
+        """
+        success, failed = 0, []
+        pending = operations
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = min(INITIAL_BACKOFF * 2 ** (attempt - 1), MAX_BACKOFF)
+                time.sleep(delay)
+                if self.stats:
+                    self.stats.add_stage("backoff", delay)
+
+            with self.pressure_lock:
+                size = min(self.pressure_size or len(pending), len(pending)) or 1
+            retry = []
+            for start in range(0, len(pending), size):
+                ok, to_retry, to_fail = self.send_batch(pending[start : start + size])
+                success += ok
+                retry.extend(to_retry)
+                failed.extend(to_fail)
+
+            if not retry:
+                with self.pressure_lock:
+                    if self.pressure_size:
+                        self.pressure_size *= 2
+                        if len(operations) <= self.pressure_size:
+                            self.pressure_size = None
+                break
+
+            with self.pressure_lock:
+                self.pressure_size = max(size // 2, MIN_BULK_SIZE)
+            pending = [operation for operation, _ in retry]
+        else:
+            failed.extend(retry)
+
+        if self.dead_letter:
+            self.dead_letter.write([operation for operation, _ in failed])
+        return (success, [item for _, item in failed])
+
+    def bulk_indice(
+        self,
+        records: List[dict],
+        index_name: str,
+        pipeline: str,
+        source: str = "",
+        bulk_size: Size = 500,
+        bulk_bytes: int = 100 * 1024 * 1024,
+    ) -> tuple:
+        """Bulk indices the documents into Elasticsearch.
+
+        Args:
+            records (List[dict]): List of each records read from MFT files.
+            index_name (str): Target Elasticsearch Index.
+            pipeline (str): Target Elasticsearch Ingest Pipeline
+            source (str): Path of the MFT file the records were read from.
+            bulk_size (Size): Maximum number of documents per bulk request.
+            bulk_bytes (int): Maximum size of a bulk request in bytes.
+
+        Returns:
+            tuple: (success_count, failed_list) - Results of bulk indexing operation
+        """
+        operations = gen_operations(
+            records, index_name, pipeline, self.id_strategy, source
+        )
+        batches = batch_operations(operations, bulk_size, bulk_bytes)
+        if self.stats:
+            batches = self.stats.timed(batches, "serialize")
+        success, failed = 0, []
+        for batch in batches:
+            ok, errors = self.send_operations(batch)
+            success += ok
+            failed.extend(errors)
+        return (success, failed)
+
+    def parallel_bulk_indice(
+        self,
+        records: Iterable[dict],
+        index_name: str,
+        pipeline: str,
+        thread_count: int = 4,
+        bulk_size: Size = 500,
+        bulk_bytes: int = 100 * 1024 * 1024,
+        queue_size: int = 4,
+        source: str = "",
+        callback: Optional[Callable[[int, bool], None]] = None,
+    ) -> tuple:
+        """Bulk indices the documents into Elasticsearch with concurrent requests.
+
+        records is consumed lazily: at most queue_size bulk requests are
+        prepared ahead of the thread_count requests in flight, so parsing and
+        indexing run at the same time without buffering the whole MFT.
+
+        Args:
+            records (Iterable[dict]): Records read from MFT files.
+            index_name (str): Target Elasticsearch Index.
+            pipeline (str): Target Elasticsearch Ingest Pipeline
+            thread_count (int): Number of threads sending bulk requests.
+            bulk_size (Size): Maximum number of documents per bulk request.
+            bulk_bytes (int): Maximum size of a bulk request in bytes.
+            queue_size (int): Number of bulk requests queued for the threads.
+            source (str): Path of the MFT file the records were read from.
+            callback (Callable[[int, bool], None]): Called, in the order of
+                records, with the number of documents of each finished bulk
+                request and whether any of them failed.
+
+        Returns:
+            tuple: (success_count, failed_list) - Results of bulk indexing operation
+        """
+        operations = gen_operations(
+            records, index_name, pipeline, self.id_strategy, source
+        )
+        batches = batch_operations(operations, bulk_size, bulk_bytes)
+        if self.stats:
+            batches = self.stats.timed(batches, "serialize")
+
+        success, failed = 0, []
+        with ThreadPool(thread_count) as pool:
+            for ok, errors in imap_bounded(
+                pool,
+                self.send_operations,
+                ((batch,) for batch in batches),
+                thread_count + queue_size,
+                partial(self.stats.observe_depth, "bulk") if self.stats else None,
+            ):
+                success += ok
+                failed.extend(errors)
+                if callback:
+                    callback(ok + len(errors), bool(errors))
+        return (success, failed)
+
+    def bulk_body_indice(
+        self,
+        body: bytes,
+        bulk_size: Size = 500,
+        bulk_bytes: int = 100 * 1024 * 1024,
+    ) -> tuple:
+        """Send a pre-serialized _bulk request body to Elasticsearch.
+
+        The body holds the records of a whole worker task, so it is sent in
+        requests of at most bulk_size documents.
+
+        Args:
+            body (bytes): _bulk request body (see build_bulk_body).
+            bulk_size (Size): Maximum number of documents per bulk request.
+            bulk_bytes (int): Maximum size of a bulk request in bytes.
+
+        Returns:
+            tuple: (success_count, failed_list) - Results of bulk indexing operation
+        """
+        success, failed = 0, []
+        operations = split_operations(body)
+        for batch in batch_operations(operations, bulk_size, bulk_bytes):
+            ok, errors = self.send_operations(batch)
+            success += ok
+            failed.extend(errors)
+        return (success, failed)
@@ -0,0 +1,275 @@
+# coding: utf-8
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+# Fields document ids and checkpoints are derived from (see calc_key and
+# get_record_number), kept by every projection
+KEY_FIELDS = (
+    "header.record_number",
+    "header.sequence",
+    "windows.mft.record.number",
+    "windows.mft.header.sequence",
+    "windows.mft.attribute.type",
+    "windows.mft.attribute.macb_type",
+)
+
+# Entry header fields describing the on-disk layout of the entry
+LAYOUT_FIELDS = (
+    "signature",
+    "usa_offset",
+    "usa_size",
+    "metadata_transaction_journal",
+    "first_attribute_record_offset",
+    "first_attribute_id",
+    "used_entry_size",
+    "total_entry_size",
+)
+
+# Fields of each profile, as (include, exclude); an empty include keeps
+# every field. Names of both standard and timeline documents are listed,
+# the ones a document does not have are ignored.
+FIELD_PROFILES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "full": ((), ()),
+    "standard": (
+        (),
+        (
+            *(f"header.{name}" for name in LAYOUT_FIELDS),
+            *(f"windows.mft.header.{name}" for name in LAYOUT_FIELDS),
+            "attributes.*.header",
+            "attributes.DATA.data",
+            "windows.mft.attribute.header",
+        ),
+    ),
+    "minimal": (
+        (
+            "header.flags",
+            "header.base_reference",
+            "header.hard_link_count",
+            "attributes.StandardInformation.data.created",
+            "attributes.StandardInformation.data.modified",
+            "attributes.StandardInformation.data.mft_modified",
+            "attributes.StandardInformation.data.accessed",
+            "attributes.StandardInformation.data.file_flags",
+            "attributes.FileName.data.created",
+            "attributes.FileName.data.modified",
+            "attributes.FileName.data.mft_modified",
+            "attributes.FileName.data.accessed",
+            "attributes.FileName.data.name",
+            "attributes.FileName.data.path",
+            "attributes.FileName.data.parent",
+            "attributes.FileName.data.logical_size",
+            "attributes.FileName.data.flags",
+            "@timestamp",
+            "event",
+            "log",
+            "windows.mft.record",
+            "windows.mft.header.flags",
+            "windows.mft.attribute.data.file_flags",
+            "windows.mft.attribute.data.flags",
+            "windows.mft.attribute.data.logical_size",
+            "windows.mft.attribute.data.parent",
+            "tags",
+        ),
+        (),
+    ),
+}
+
+# Matches any single name of a field path
+WILDCARD = "*"
+
+
+def parse_field_names(value: Union[str, Iterable[str]]) -> Tuple[str, ...]:
+    """Parse dotted field names given as a comma-separated string or a list.
+
+    Args:
+        value (Union[str, Iterable[str]]): e.g. "header.flags,attributes.*.header".
+
+    Raises:
+        ValueError: If a name has an empty part.
+
+    Returns:
+        Tuple[str, ...]: Field names.
+    """
+    names = value.split(",") if isinstance(value, str) else value
+    names = tuple(name.strip() for name in names if name.strip())
+    for name in names:
+        if not all(name.split(".")):
+            raise ValueError(f"invalid field name: {name}")
+    return names
+
+
+def build_tree(names: Iterable[str]) -> dict:
+    """Build the tree of field names, an empty dict standing for a whole field.
+
+    Args:
+        names (Iterable[str]): Dotted field names.
+
+    Returns:
+        dict: e.g. {"header": {"flags": {}}} for ["header.flags"].
+    """
+    tree: dict = dict()
+    for name in names:
+        node = tree
+        *parents, key = name.split(".")
+        for parent in parents:
+            if parent in node and not node[parent]:
+                break  # a parent field is already selected whole
+            node = node.setdefault(parent, dict())
+        else:
+            node[key] = dict()
+    return tree
+
+
+def merge_trees(left: dict, right: dict) -> dict:
+    """Merge two field trees (for a name matching both a field and "*")."""
+    if not left or not right:
+        return dict()
+    merged = dict(left)
+    for key, node in right.items():
+        merged[key] = merge_trees(merged[key], node) if key in merged else node
+    return merged
+
+
+def match_prefix(name: str, pattern: str) -> bool:
+    """Whether pattern selects name or one of its parents."""
+    names, patterns = name.split("."), pattern.split(".")
+    return len(patterns) <= len(names) and all(
+        p in (WILDCARD, n) for p, n in zip(patterns, names)
+    )
+
+
+class FieldProjection(object):
+    """Selects the fields of each document, as it is formatted.
+
+    Only the selected fields of the decoded records are copied into the
+    documents, so the others are never serialized nor sent. Fields are
+    dotted names of the document (e.g. "attributes.FileName.data.path" or
+    "windows.mft.attribute.header"), "*" matching any one name. The
+    KEY_FIELDS are always kept, and static fields (see parse_field) are
+    added after the projection.
+
+    Projections with the same fields are equal, so builders cached by
+    projection (see get_timeline_builder) are shared by every chunk.
+    """
+
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = ()):
+        self.include: Tuple[str, ...] = tuple(include)
+        self.exclude: Tuple[str, ...] = tuple(exclude)
+        for pattern in self.exclude:
+            if any(match_prefix(name, pattern) for name in KEY_FIELDS):
+                raise ValueError(
+                    f"cannot exclude {pattern}: document ids are derived from it"
+                )
+        self.include_tree: Optional[dict] = (
+            build_tree(self.include + KEY_FIELDS) if self.include else None
+        )
+        self.exclude_tree: Optional[dict] = (
+            build_tree(self.exclude) if self.exclude else None
+        )
+        # (id of a tree, name): tree of the field, merged once
+        self.subtrees: Dict[Tuple[int, str], Optional[dict]] = dict()
+
+    @classmethod
+    def from_options(
+        cls,
+        fields: Union[str, Iterable[str]] = "full",
+        exclude_fields: Union[str, Iterable[str]] = (),
+    ) -> Optional["FieldProjection"]:
+        """Build a projection from a profile or field names.
+
+        Args:
+            fields (Union[str, Iterable[str]]): Profile name (one of
+                FIELD_PROFILES) or field names to include.
+            exclude_fields (Union[str, Iterable[str]]): Field names to exclude.
+
+        Raises:
+            ValueError: If a field name is invalid or excludes a KEY_FIELDS.
+
+        Returns:
+            Optional[FieldProjection]: Projection, or None if every field is kept.
+        """
+        names = parse_field_names(fields or ())
+        if len(names) == 1 and names[0] in FIELD_PROFILES:
+            include, exclude = FIELD_PROFILES[names[0]]
+        else:
+            include, exclude = names, ()
+        exclude = exclude + parse_field_names(exclude_fields or ())
+        if not include and not exclude:
+            return None
+        return cls(include, exclude)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, FieldProjection) and (
+            self.include,
+            self.exclude,
+        ) == (other.include, other.exclude)
+
+    def __hash__(self) -> int:
+        return hash((self.include, self.exclude))
+
+    def __reduce__(self) -> tuple:
+        # subtrees is keyed by ids, which do not survive pickling
+        return (FieldProjection, (self.include, self.exclude))
+
+    def get_subtree(self, tree: dict, key: str) -> Optional[dict]:
+        """Get the tree of a field, or None if the field is not in tree."""
+        cache_key = (id(tree), key)
+        if cache_key not in self.subtrees:
+            exact, wildcard = tree.get(key), tree.get(WILDCARD)
+            if exact is not None and wildcard is not None:
+                exact = merge_trees(exact, wildcard)
+            self.subtrees[cache_key] = exact if exact is not None else wildcard
+        return self.subtrees[cache_key]
+
+    def project(
+        self,
+        document: dict,
+        include: Optional[dict],
+        exclude: Optional[dict],
+        memo: Optional[dict],
+    ) -> dict:
+        projected = dict()
+        for key, value in document.items():
+            include_node = None
+            if include is not None:
+                include_node = self.get_subtree(include, key)
+                if include_node is None:
+                    continue
+                include_node = include_node or None  # whole field
+            exclude_node = None
+            if exclude is not None:
+                exclude_node = self.get_subtree(exclude, key)
+                if exclude_node is not None and not exclude_node:
+                    continue  # whole field
+            if include_node is None and exclude_node is None:
+                projected[key] = value
+            elif isinstance(value, dict):
+                if memo is None:
+                    projected[key] = self.project(
+                        value, include_node, exclude_node, memo
+                    )
+                    continue
+                # nested dicts shared by several documents are projected once
+                memo_key = (id(value), id(include_node), id(exclude_node))
+                if memo_key not in memo:
+                    memo[memo_key] = (
+                        value,
+                        self.project(value, include_node, exclude_node, memo),
+                    )
+                projected[key] = memo[memo_key][1]
+            elif include_node is None:
+                projected[key] = value
+        return projected
+
+    def apply(self, document: dict, memo: Optional[dict] = None) -> dict:
+        """Copy the selected fields of a document.
+
+        Args:
+            document (dict): Standard or timeline record.
+            memo (Optional[dict]): Shared by the documents of one MFT entry,
+                whose nested dicts are then projected once; the projected
+                documents share them as well.
+
+        Returns:
+            dict: New document, sharing the selected values with document.
+        """
+        return self.project(document, self.include_tree, self.exclude_tree, memo)
@@ -0,0 +1,217 @@
+# coding: utf-8
+import os
+import sys
+from array import array
+from collections import Counter
+from hashlib import blake2b, sha1
+from pathlib import Path
+from typing import Generator, Iterable, Optional, Tuple, Union
+
+import orjson
+
+from mft2es.models.RecordFilter import CSV_FLAGS_COLUMN, split_csv_row
+
+# Positions of the entry number and sequence in an entries_csv() row
+CSV_ENTRY_ID_COLUMN = 1
+CSV_SEQUENCE_COLUMN = 2
+
+# Field holding the change type of each document, with tag_changes
+CHANGE_FIELD = "delta"
+
+# Change types (see FingerprintStore.compare)
+CHANGES = ("new", "changed", "deleted")
+
+STORE_VERSION = 1
+
+
+def calc_fingerprint(record: str, path: str) -> int:
+    """Calculate the fingerprint of an entry.
+
+    Args:
+        record (str): entries_json() record of the entry.
+        path (str): Full path of the entry.
+
+    Returns:
+        int: Non-zero 64-bit fingerprint (0 stands for no entry).
+    """
+    digest = blake2b(
+        record.encode("utf-8") + b"\0" + path.encode("utf-8"), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+def calc_settings(**options) -> str:
+    """Identify the options documents are built with (e.g. index, tags).
+
+    Args:
+        **options: JSON serializable options.
+
+    Returns:
+        str: sha1 of the options.
+    """
+    return sha1(orjson.dumps(options, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class FingerprintStore(object):
+    """Fingerprints of the entries of a volume, from the last delta import.
+
+    The store holds, indexed by record number, the sequence number, the
+    allocation state and a 64-bit fingerprint of each entry (11 bytes per
+    entry). Comparing the entries of a new MFT snapshot of the same volume
+    against it tells which ones are new (unknown record number, reused with
+    another sequence number, or allocated again), changed, deleted (no longer
+    allocated) or unchanged.
+
+    The store file starts with a JSON header line holding the settings the
+    documents were built with: if they differ, every entry is new again.
+    The arrays are updated as entries are compared and written back by
+    save, which replaces the file at once.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.settings = ""
+        self.sequences = array("H")
+        self.states = array("B")
+        self.fingerprints = array("Q")
+        # number of entries of each change type, and "unchanged"
+        self.counts: Counter = Counter()
+
+    def load(self, settings: str) -> bool:
+        """Read the store, if it was saved with the same settings.
+
+        Args:
+            settings (str): Identifies how documents are built (see
+                calc_settings); entries saved with others are all new.
+
+        Returns:
+            bool: Whether fingerprints were loaded.
+        """
+        self.settings = settings
+        if not self.path.exists():
+            return False
+        with self.path.open("rb") as f:
+            try:
+                header = orjson.loads(f.readline())
+            except orjson.JSONDecodeError:
+                return False
+            if (
+                header.get("version") != STORE_VERSION
+                or header.get("settings") != settings
+            ):
+                return False
+            count = header.get("count", 0)
+            sequences, states, fingerprints = array("H"), array("B"), array("Q")
+            try:
+                sequences.fromfile(f, count)
+                states.fromfile(f, count)
+                fingerprints.fromfile(f, count)
+            except EOFError:
+                return False
+        if sys.byteorder == "big":
+            sequences.byteswap()
+            fingerprints.byteswap()
+        self.sequences, self.states, self.fingerprints = sequences, states, fingerprints
+        return True
+
+    def save(self) -> None:
+        """Write the store, replacing the previous file at once."""
+        header = orjson.dumps(
+            {
+                "version": STORE_VERSION,
+                "settings": self.settings,
+                "count": len(self.fingerprints),
+            },
+            option=orjson.OPT_APPEND_NEWLINE,
+        )
+        sequences, fingerprints = array("H", self.sequences), array(
+            "Q", self.fingerprints
+        )
+        if sys.byteorder == "big":
+            # stored little-endian
+            sequences.byteswap()
+            fingerprints.byteswap()
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with temporary.open("wb") as f:
+            f.write(header)
+            sequences.tofile(f)
+            self.states.tofile(f)
+            fingerprints.tofile(f)
+        os.replace(temporary, self.path)
+
+    def grow(self, number: int) -> None:
+        size = max(number + 1, 2 * len(self.fingerprints))
+        extra = size - len(self.fingerprints)
+        self.sequences.frombytes(bytes(2 * extra))
+        self.states.frombytes(bytes(extra))
+        self.fingerprints.frombytes(bytes(8 * extra))
+
+    def compare(
+        self, number: int, sequence: int, allocated: bool, fingerprint: int
+    ) -> Optional[str]:
+        """Compare an entry with its previous state, and record the new one.
+
+        Args:
+            number (int): Record number.
+            sequence (int): Sequence number of the entry.
+            allocated (bool): Whether the entry is in use.
+            fingerprint (int): Fingerprint of the entry (see calc_fingerprint).
+
+        Returns:
+            Optional[str]: Change type (one of CHANGES), or None if unchanged.
+        """
+        if len(self.fingerprints) <= number:
+            self.grow(number)
+        previous = self.fingerprints[number]
+        if previous == fingerprint and self.sequences[number] == sequence:
+            self.counts["unchanged"] += 1
+            return None
+
+        # NTFS increments the sequence number when it frees an entry (not
+        # when it reuses it), so a deleted entry is told apart before its
+        # sequence number is compared
+        if self.states[number] and not allocated:
+            change = "deleted"
+        elif (
+            not previous
+            or self.sequences[number] != sequence
+            or (allocated and not self.states[number])
+        ):
+            change = "new"
+        else:
+            change = "changed"
+        self.sequences[number] = sequence
+        self.states[number] = allocated
+        self.fingerprints[number] = fingerprint
+        self.counts[change] += 1
+        return change
+
+    def gen_changes(
+        self, entries: Iterable[Tuple[str, bytes]], start_record: int = 0
+    ) -> Generator:
+        """Yield the entries that are not unchanged.
+
+        Args:
+            entries (Iterable[Tuple[str, bytes]]): entries_json() record and
+                entries_csv() row of each entry.
+            start_record (int): Entries numbered below it are skipped (and
+                keep their previous state).
+
+        Yields:
+            Generator: Yields Tuple[str, str, str] of the record(json), its
+                full path and its change type.
+        """
+        for record, row in entries:
+            columns = split_csv_row(row)
+            number = int(columns[CSV_ENTRY_ID_COLUMN])
+            if number < start_record:
+                continue
+            path = columns[-1].strip()
+            change = self.compare(
+                number,
+                int(columns[CSV_SEQUENCE_COLUMN]),
+                "ALLOCATED" in columns[CSV_FLAGS_COLUMN],
+                calc_fingerprint(record, path),
+            )
+            if change:
+                yield record, path, change
@@ -0,0 +1,313 @@
+# coding: utf-8
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import util
+from pathlib import Path
+from typing import Dict, Generator, Iterable, List, Optional
+
+import orjson
+
+from mft2es.models.AutoTuner import get_rss
+
+# Quantiles of the bulk request latency reported in the summary and metrics
+LATENCY_QUANTILES = (0.5, 0.9, 0.99)
+
+MIB = 1024 * 1024
+
+
+def quantile(values: List[float], q: float) -> float:
+    """Nearest-rank quantile of sorted values (0.0 if there are none)."""
+    if not values:
+        return 0.0
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def profile_worker(directory: str) -> None:
+    """Profile this worker process until it exits.
+
+    The profile is written to DIR/worker-<pid>.prof when the worker exits
+    normally, i.e. when its pool is closed and joined.
+
+    Args:
+        directory (str): Output directory.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def dump() -> None:
+        profiler.disable()
+        profiler.dump_stats(str(Path(directory) / f"worker-{os.getpid()}.prof"))
+
+    util.Finalize(None, dump, exitpriority=10)
+
+
+@contextmanager
+def profile_thread(path: Path) -> Generator:
+    """Profile the current thread while in the block.
+
+    Args:
+        path (Path): Output file of the profile (cProfile/pstats format).
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(path))
+
+
+class ImportStats(object):
+    """Metrics of an import, collected from every thread and worker process.
+
+    Stages are the time spent, summed over every process and thread, in:
+        parse: reading entries from the mft parser
+        index: the name pass of the sharded mode
+        decode: orjson.loads of the records of each chunk
+        filter: matching the decoded records against the filter (the csv
+            row prefilter is counted in parse)
+        format: rewriting the records (format_* functions)
+        serialize: building the _bulk request bodies (and document ids)
+        wait: waiting for the results of the worker processes
+        bulk: waiting for the _bulk responses
+        backoff: waiting before retrying rejected documents
+
+    Stages timed on the same thread are exclusive: the time a stage spends
+    pulling items from another timed stage is only counted in the latter.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.documents = 0
+        self.stages: Dict[str, float] = dict()
+        self.latencies: List[float] = list()
+        self.bulk_documents = 0
+        self.bulk_bytes = 0
+        # queue name: [number of samples, sum of depths, max depth]
+        self.depths: Dict[str, List[int]] = dict()
+        self.parent_rss = 0
+        self.worker_rss = 0
+        # per thread, time spent in nested stages by each enclosing stage
+        self.local = threading.local()
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_documents(self, count: int) -> None:
+        """Report documents produced by the import."""
+        rss = get_rss() or 0
+        with self.lock:
+            self.documents += count
+            self.parent_rss = max(self.parent_rss, rss)
+
+    def observe_request(self, count: int, size: int, seconds: float) -> None:
+        """Report a _bulk request of count documents and size bytes."""
+        with self.lock:
+            self.latencies.append(seconds)
+            self.bulk_documents += count
+            self.bulk_bytes += size
+            self.stages["bulk"] = self.stages.get("bulk", 0.0) + seconds
+
+    def observe_depth(self, queue: str, depth: int) -> None:
+        """Report the number of tasks waiting in a queue."""
+        with self.lock:
+            samples = self.depths.setdefault(queue, [0, 0, 0])
+            samples[0] += 1
+            samples[1] += depth
+            samples[2] = max(samples[2], depth)
+
+    def get_stack(self) -> List[float]:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = list()
+        return self.local.stack
+
+    def leave(self, name: str, start: float) -> None:
+        """Close a timed section opened with a 0.0 pushed on the stack."""
+        stack = self.get_stack()
+        elapsed = time.perf_counter() - start
+        self.add_stage(name, elapsed - stack.pop())
+        if stack:
+            stack[-1] += elapsed
+
+    def timed(self, iterable: Iterable, name: str) -> Generator:
+        """Yield from iterable, adding the time spent producing items to a stage.
+
+        Args:
+            iterable (Iterable): e.g. a generator reading the parser.
+            name (str): Stage name.
+
+        Yields:
+            Generator: Items of iterable.
+        """
+        iterator = iter(iterable)
+        stack = self.get_stack()
+        while True:
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.leave(name, start)
+            yield item
+
+    def collect(self, results: Iterable, local: bool = False) -> Generator:
+        """Unwrap the results of measure_by_chunk, merging their stage times.
+
+        Args:
+            results (Iterable): (result, stage times, worker RSS) tuples.
+            local (bool): The tasks ran on this thread (not on a worker), so
+                their time is nested in the enclosing timed stage, if any.
+
+        Yields:
+            Generator: Results.
+        """
+        for result, stages, rss in results:
+            with self.lock:
+                for name, seconds in stages.items():
+                    self.stages[name] = self.stages.get(name, 0.0) + seconds
+                if not local:
+                    self.worker_rss = max(self.worker_rss, rss or 0)
+            stack = self.get_stack()
+            if local and stack:
+                stack[-1] += sum(stages.values())
+            yield result
+
+    def finish(self) -> None:
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def to_dict(self) -> dict:
+        """Metrics as a JSON serializable dict."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            elapsed = self.elapsed
+            return {
+                "elapsed_seconds": elapsed,
+                "documents": self.documents,
+                "documents_per_second": self.documents / elapsed if elapsed else 0.0,
+                "stages": dict(self.stages),
+                "bulk": {
+                    "requests": len(latencies),
+                    "documents": self.bulk_documents,
+                    "bytes": self.bulk_bytes,
+                    "latency_seconds": {
+                        **{
+                            f"p{int(q * 100)}": quantile(latencies, q)
+                            for q in LATENCY_QUANTILES
+                        },
+                        "max": latencies[-1] if latencies else 0.0,
+                    },
+                },
+                "queue_depth": {
+                    queue: {"mean": total / count, "max": peak}
+                    for queue, (count, total, peak) in self.depths.items()
+                },
+                "peak_rss_bytes": {
+                    "parent": self.parent_rss,
+                    "worker": self.worker_rss,
+                },
+            }
+
+    def summary(self) -> List[str]:
+        """Human readable summary, one line per item."""
+        metrics = self.to_dict()
+        bulk = metrics["bulk"]
+        latency = bulk["latency_seconds"]
+        lines = [
+            f"Elapsed: {metrics['elapsed_seconds']:.1f}s, {metrics['documents']} documents "
+            f"({metrics['documents_per_second']:.0f} docs/s)",
+            "Stage time (summed over processes and threads):",
+        ]
+        for name, seconds in sorted(
+            metrics["stages"].items(), key=lambda item: item[1], reverse=True
+        ):
+            lines.append(f"  {name:<10}{seconds:>10.2f}s")
+        lines.append(
+            f"Bulk requests: {bulk['requests']}, {bulk['bytes'] / MIB:.1f} MiB sent, "
+            "latency "
+            + " ".join(f"{key} {value:.3f}s" for key, value in latency.items())
+        )
+        for queue, depth in metrics["queue_depth"].items():
+            lines.append(
+                f"Queue depth ({queue}): mean {depth['mean']:.1f}, max {depth['max']}"
+            )
+        rss = metrics["peak_rss_bytes"]
+        lines.append(
+            f"Peak RSS: parent {rss['parent'] / MIB:.0f} MiB"
+            + (f", worker {rss['worker'] / MIB:.0f} MiB" if rss["worker"] else "")
+        )
+        return lines
+
+    def to_prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        metrics = self.to_dict()
+        bulk = metrics["bulk"]
+        lines = [
+            "# TYPE mft2es_elapsed_seconds gauge",
+            f"mft2es_elapsed_seconds {metrics['elapsed_seconds']}",
+            "# TYPE mft2es_documents_total counter",
+            f"mft2es_documents_total {metrics['documents']}",
+            "# TYPE mft2es_documents_per_second gauge",
+            f"mft2es_documents_per_second {metrics['documents_per_second']}",
+            "# TYPE mft2es_stage_seconds_total counter",
+        ]
+        lines.extend(
+            f'mft2es_stage_seconds_total{{stage="{name}"}} {seconds}'
+            for name, seconds in metrics["stages"].items()
+        )
+        lines.extend(
+            [
+                "# TYPE mft2es_bulk_requests_total counter",
+                f"mft2es_bulk_requests_total {bulk['requests']}",
+                "# TYPE mft2es_bulk_bytes_total counter",
+                f"mft2es_bulk_bytes_total {bulk['bytes']}",
+                "# TYPE mft2es_bulk_latency_seconds summary",
+            ]
+        )
+        latencies = sorted(self.latencies)
+        lines.extend(
+            f'mft2es_bulk_latency_seconds{{quantile="{q}"}} {quantile(latencies, q)}'
+            for q in LATENCY_QUANTILES
+        )
+        lines.extend(
+            [
+                f"mft2es_bulk_latency_seconds_sum {sum(latencies)}",
+                f"mft2es_bulk_latency_seconds_count {len(latencies)}",
+                "# TYPE mft2es_queue_depth_max gauge",
+            ]
+        )
+        lines.extend(
+            f'mft2es_queue_depth_max{{queue="{queue}"}} {depth["max"]}'
+            for queue, depth in metrics["queue_depth"].items()
+        )
+        lines.append("# TYPE mft2es_peak_rss_bytes gauge")
+        lines.extend(
+            f'mft2es_peak_rss_bytes{{process="{process}"}} {value}'
+            for process, value in metrics["peak_rss_bytes"].items()
+        )
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path, format: str = "json") -> None:
+        """Write the metrics to a file.
+
+        Args:
+            path (Path): Output file.
+            format (str): "json" or "prometheus" (text exposition format).
+        """
+        if format == "prometheus":
+            Path(path).write_text(self.to_prometheus(), encoding="utf-8")
+        else:
+            Path(path).write_bytes(
+                orjson.dumps(self.to_dict(), option=orjson.OPT_INDENT_2)
+            )
@@ -0,0 +1,72 @@
+# coding: utf-8
+from collections import deque
+from itertools import islice
+from multiprocessing.pool import Pool
+from typing import Callable, Generator, Iterable, Optional, Union
+
+# A size, or a callable returning the size to use next (see AutoTuner)
+Size = Union[int, Callable[[], int]]
+
+
+def current_size(size: Size) -> int:
+    """Read a size that may change while running.
+
+    Args:
+        size (Size): Size, or a callable returning it.
+
+    Returns:
+        int: Size to use next.
+    """
+    return size() if callable(size) else size
+
+
+def generate_chunks(chunk_size: Size, iterable: Iterable) -> Generator:
+    """Generate arbitrarily sized chunks from iterable objects.
+
+    Args:
+        chunk_size (Size): Chunk sizes, read again for each chunk.
+        iterable (Iterable): Original Iterable object.
+
+    Yields:
+        Generator: List
+    """
+    i = iter(iterable)
+    piece = list(islice(i, current_size(chunk_size)))
+    while piece:
+        yield piece
+        piece = list(islice(i, current_size(chunk_size)))
+
+
+def imap_bounded(
+    pool: Pool,
+    func: Callable,
+    iterable: Iterable,
+    max_pending: int,
+    on_depth: Optional[Callable[[int], None]] = None,
+) -> Generator:
+    """Apply func to each argument tuple on the pool, yielding results in order.
+
+    Unlike Pool.imap, which drains the whole input iterable into the task queue,
+    at most max_pending tasks are submitted ahead of the result being yielded,
+    so the memory held by in-flight chunks stays bounded.
+
+    Args:
+        pool (Pool): Worker pool.
+        func (Callable): Function to run on the workers.
+        iterable (Iterable): Argument tuples for func.
+        max_pending (int): Maximum number of tasks in flight.
+        on_depth (Callable[[int], None]): Called with the number of tasks in
+            flight each time a result is awaited.
+
+    Yields:
+        Generator: Results of func, in the order of iterable.
+    """
+    pending: deque = deque()
+    for args in iterable:
+        pending.append(pool.apply_async(func, args))
+        if max_pending <= len(pending):
+            if on_depth:
+                on_depth(len(pending))
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
@@ -1,21 +1,163 @@
 # coding: utf-8
+import atexit
+import io
 import sys
 import os
-from itertools import chain
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache, partial
+from importlib import import_module
+from heapq import heappop, heappush
+from itertools import chain, count
 from pathlib import Path
-from typing import List, Generator, Iterable, Dict
-from itertools import islice
+from typing import (
+    Any,
+    List,
+    Generator,
+    Iterable,
+    Dict,
+    Callable,
+    ContextManager,
+    Optional,
+    Tuple,
+    Union,
+)
 import multiprocessing as mp
+from multiprocessing.pool import Pool
 
 import orjson
 from mft import PyMftParser
 
+from mft2es.models.AutoTuner import get_rss
+from mft2es.models.FieldProjection import FieldProjection
+from mft2es.models.FingerprintStore import CHANGE_FIELD, FingerprintStore
+from mft2es.models.ImportStats import ImportStats, profile_worker
+from mft2es.models.IterUtils import Size, current_size, generate_chunks, imap_bounded
+from mft2es.models.MftPathIndex import (
+    DIRECTORY_FLAG,
+    MftPathIndex,
+    WIN32_NAMESPACES,
+)
+from mft2es.models.RecordFilter import RecordFilter, split_csv_row
+
 # Constants for timeline analysis
 MACB_MAPPING = {"M": "modified", "A": "accessed", "C": "mft_modified", "B": "created"}
 
 # Target attributes for timeline analysis
 TIMELINE_ATTRIBUTES = ["StandardInformation", "FileName"]
 
+# Tags added to every record
+BASE_TAGS = ("mft",)
+
+# Entry size assumed when the first MFT entry has no valid header
+DEFAULT_ENTRY_SIZE = 1024
+
+# Number of entries scanned by each task of the sharded name index pass
+INDEX_SHARD_SIZE = 65536
+
+# Type code of the FileName attribute
+FILE_NAME_TYPE_CODE = 0x30
+
+# Modules imported by each worker process when it starts
+WARM_UP_MODULES = ("orjson", "mft", "mft2es.models.ElasticsearchUtils")
+
+# Process pool shared by every run of this process (see get_shared_pool)
+_shared_pool: Optional[Pool] = None
+_shared_pool_lock = threading.Lock()
+
+# Directory the workers of the shared pool write their profiles to, if any
+_profile_directory: Optional[str] = None
+
+# Time spent in each stage by the task running on this thread, while it is
+# measured (see measure_by_chunk)
+_stage_times = threading.local()
+
+
+def warm_up_worker(
+    modules: Tuple[str, ...] = WARM_UP_MODULES, profile_directory: str = None
+) -> None:
+    """Import the modules used by the tasks when a worker process starts.
+
+    With the spawn start method the workers begin with a fresh interpreter,
+    so this moves the imports out of the first chunk each worker processes.
+
+    Args:
+        modules (Tuple[str, ...]): Names of the modules to import.
+        profile_directory (str): Profile the worker into this directory
+            (see profile_worker).
+    """
+    for module in modules:
+        import_module(module)
+    if profile_directory:
+        profile_worker(profile_directory)
+
+
+def close_shared_pool() -> None:
+    """Shut down the shared process pool, waiting for its workers to exit."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is not None:
+            _shared_pool.close()
+            _shared_pool.join()
+            _shared_pool = None
+
+
+atexit.register(close_shared_pool)
+
+
+def set_worker_profiling(directory: Optional[str]) -> None:
+    """Profile the workers of the shared pool, or stop profiling them.
+
+    Each worker writes DIR/worker-<pid>.prof when the pool is closed. The
+    setting applies to the workers started next, so the current shared pool
+    is shut down.
+
+    Args:
+        directory (Optional[str]): Output directory, or None.
+    """
+    global _profile_directory
+    close_shared_pool()
+    _profile_directory = directory
+
+
+@contextmanager
+def stage(name: str) -> Generator:
+    """Add the time spent in the block to a stage of the measured task.
+
+    Does nothing unless the task runs under measure_by_chunk.
+
+    Args:
+        name (str): Stage name (see ImportStats).
+    """
+    times = getattr(_stage_times, "times", None)
+    if times is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        times[name] = times.get(name, 0.0) + time.perf_counter() - start
+
+
+def measure_by_chunk(func: Callable, *args) -> Tuple[Any, Dict[str, float], int]:
+    """Run func, measuring the time it spends in each stage.
+
+    Args:
+        func (Callable): Task run on a chunk (e.g. process_standard_by_chunk).
+        *args: Arguments of func.
+
+    Returns:
+        Tuple[Any, Dict[str, float], int]: Output of func, seconds spent in
+            each stage and RSS of this process (see ImportStats.collect).
+    """
+    _stage_times.times = dict()
+    try:
+        return func(*args), _stage_times.times, get_rss()
+    finally:
+        _stage_times.times = None
+
 
 class SafeMultiprocessingMixin:
     """Safe multiprocessing management class for Python 3.13 compatibility"""
@@ -42,22 +184,160 @@ class SafeMultiprocessingMixin:
         except NotImplementedError:
             return os.cpu_count() or 1
 
+    @classmethod
+    def get_shared_pool(cls) -> Pool:
+        """Get the process pool shared by every run, creating it on first use.
+
+        The pool lives until close_shared_pool is called or the interpreter
+        exits, so several MFT files (or presenters) do not each pay for
+        starting the worker processes.
+        """
+        global _shared_pool
+        with _shared_pool_lock:
+            if _shared_pool is None:
+                # Use safe context for Python 3.13 compatibility
+                ctx = cls.get_multiprocessing_context()
+                _shared_pool = ctx.Pool(
+                    cls.get_cpu_count(),
+                    initializer=warm_up_worker,
+                    initargs=(WARM_UP_MODULES, _profile_directory),
+                )
+            return _shared_pool
 
-def generate_chunks(chunk_size: int, iterable: Iterable) -> Generator:
-    """Generate arbitrarily sized chunks from iterable objects.
+    @classmethod
+    def open_pool(cls, pool: Optional[Pool] = None) -> ContextManager[Pool]:
+        """Use the given process pool, or the shared one, without closing it"""
+        return nullcontext(pool if pool is not None else cls.get_shared_pool())
+
+
+def merge_chunks(chunks: Iterable, worker_batch: Size) -> Generator:
+    """Merge every worker_batch chunks of records(json) and paths into one.
 
     Args:
-        chunk_size (int): Chunk sizes.
-        iterable (Iterable): Original Iterable object.
+        chunks (Iterable): Chunks of (List[str], List[str]), or of
+            (List[str], List[str], List[str]) with change types (see gen_chunks).
+        worker_batch (Size): Number of chunks merged together.
 
     Yields:
-        Generator: List
+        Generator: Yields tuples of lists, like the chunks.
+    """
+    for batch in generate_chunks(worker_batch, chunks):
+        if len(batch) == 1:
+            yield batch[0]
+        else:
+            yield tuple(list(chain.from_iterable(lists)) for lists in zip(*batch))
+
+
+def parse_tags(tags: str = None) -> Tuple[str, ...]:
+    """Parse comma-separated tags into the tags of every record.
+
+    Args:
+        tags (str): Comma-separated string of additional tags
+
+    Returns:
+        Tuple[str, ...]: "mft" followed by the additional tags.
+    """
+    additional_tags = (
+        [tag.strip() for tag in tags.split(",") if tag.strip()] if tags else []
+    )
+    return BASE_TAGS + tuple(additional_tags)
+
+
+def parse_field(field: str) -> Tuple[str, str]:
+    """Parse a static field given as "dotted.name=value".
+
+    Args:
+        field (str): Static field (e.g. "host.name=WS1").
+
+    Raises:
+        ValueError: If the field has no name or no "=".
+
+    Returns:
+        Tuple[str, str]: Dotted field name and value.
+    """
+    name, separator, value = field.partition("=")
+    if not separator or not all(name.strip().split(".")):
+        raise ValueError(f"invalid field: {field}")
+    return name.strip(), value
+
+
+def parse_fields(fields: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    """Validate static fields given as values keyed by dotted name.
+
+    Args:
+        fields (Dict[str, str]): Static fields (e.g. {"host.name": "WS1"}).
+
+    Raises:
+        ValueError: If a name is invalid (see parse_field).
+
+    Returns:
+        Tuple[Tuple[str, str], ...]: Dotted field names and values.
+    """
+    parsed = list()
+    for name, value in fields.items():
+        if "=" in name:
+            raise ValueError(f"invalid field: {name}")
+        parsed.append((parse_field(f"{name}=")[0], value))
+    return tuple(parsed)
+
+
+@lru_cache(maxsize=8)
+def expand_fields(fields: Tuple[Tuple[str, str], ...]) -> dict:
+    """Expand static fields into the nested dict merged into every record.
+
+    Args:
+        fields (Tuple[Tuple[str, str], ...]): Dotted field names and values.
+
+    Returns:
+        dict: Nested fields (e.g. {"host": {"name": "WS1"}}).
+    """
+    expanded: dict = dict()
+    for name, value in fields:
+        *parents, key = name.split(".")
+        node = expanded
+        for parent in parents:
+            if not isinstance(node.get(parent), dict):
+                node[parent] = dict()
+            node = node[parent]
+        node[key] = value
+    return expanded
+
+
+def copy_document(value: Any) -> Any:
+    """Copy a record with its nested dicts and lists.
+
+    Args:
+        value (Any): Record, or a value of it.
+
+    Returns:
+        Any: Copy sharing no dict or list with value.
+    """
+    if isinstance(value, dict):
+        return {k: copy_document(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_document(v) for v in value]
+    return value
+
+
+def merge_fields(document: dict, fields: dict) -> dict:
+    """Merge static fields into a record, overriding existing values.
+
+    Nested dicts of the record are copied before merging, and the merged
+    values are copied as well, since they may be shared with other records.
+
+    Args:
+        document (dict): Record (standard or timeline).
+        fields (dict): Nested fields (see expand_fields).
+
+    Returns:
+        dict: The record.
     """
-    i = iter(iterable)
-    piece = list(islice(i, chunk_size))
-    while piece:
-        yield piece
-        piece = list(islice(i, chunk_size))
+    for key, value in fields.items():
+        if isinstance(value, dict) and isinstance(document.get(key), dict):
+            document[key] = merge_fields(dict(document[key]), value)
+        else:
+            document[key] = copy_document(value)
+    return document
 
 
 def organize_attributes_by_type(record: dict) -> Dict[str, dict]:
@@ -77,124 +357,158 @@ def organize_attributes_by_type(record: dict) -> Dict[str, dict]:
     return attributes
 
 
-def create_timeline_record(
-    record: dict,
-    attribute: dict,
-    attr_type: str,
-    macb_type: str,
-    timestamp_field: str,
-    filepath: str,
-    mft_file_path: str,
-    tags: str = None,
-) -> dict:
-    """Create a single timeline record for MACB analysis.
-
-    Args:
-        record (dict): Original MFT record
-        attribute (dict): Attribute data
-        attr_type (str): Attribute type (StandardInformation or FileName)
-        macb_type (str): MACB type (M, A, C, B)
-        timestamp_field (str): Timestamp field name
-        filepath (str): File full path (record's file path)
-        mft_file_path (str): Path to the MFT file being processed
-        tags (str): Comma-separated string of additional tags
+class TimelineRecordBuilder(object):
+    """Builds MACB timeline records from a template prepared once per run.
 
-    Returns:
-        dict: Timeline record
+    The parts that are the same for every record (tags, log path, action
+    names) are computed in the constructor, and the header and data of each
+    attribute are filtered once and shallow-copied into its four MACB records.
+    Each record gets its own containers (the record, its event, log, tags and
+    windows.mft dicts; the event category and type are constant tuples), so
+    records share no dict or list with each other nor with the builder, which
+    is cached. Only the nested values of the MFT entry (e.g.
+    header.base_reference) are shared by the records of that entry, and
+    projected once per entry with a projection.
     """
-    # Parse tags from comma-separated string
-    additional_tags = (
-        [tag.strip() for tag in tags.split(",") if tag.strip()] if tags else []
-    )
-    base_tags = ["mft"] + additional_tags
-
-    attr_data = attribute.get("data", {})
-    record_header = record.get("header", {})
-    attr_header = attribute.get("header", {})
-
-    return {
-        "@timestamp": attr_data.get(timestamp_field),
-        "event": {
-            "action": f"mft-{attr_type.lower()}-{macb_type.lower()}",
-            "category": ["file"],
-            "type": ["change"],
-            "kind": "event",
-            "provider": "mft",
-            "module": "windows",
-            "dataset": "windows.mft",
-        },
-        "windows": {
-            "mft": {
-                "record": {
-                    "number": record_header.get("record_number", 0),
-                    "name": filepath.split("/")[-1] if filepath else "",
-                    "path": filepath,
-                },
-                "header": {
-                    k: v for k, v in record_header.items() if k != "record_number"
-                },
-                "attribute": {
-                    "type": attr_type,
-                    "macb_type": macb_type,
-                    "header": {
-                        k: v for k, v in attr_header.items() if k != "type_code"
-                    },
-                    "data": {
-                        k: v
-                        for k, v in attr_data.items()
-                        if k not in MACB_MAPPING.values()
-                    },
-                },
-            },
-        },
-        "log": {"file": {"path": mft_file_path}},
-        "tags": base_tags,
-    }
-
-
-def create_macb_records_for_attribute(
-    record: dict,
-    attribute: dict,
-    attr_type: str,
-    filepath: str,
+
+    def __init__(
+        self,
+        mft_file_path: str,
+        tags: Tuple[str, ...] = BASE_TAGS,
+        fields: Tuple[Tuple[str, str], ...] = (),
+        projection: FieldProjection = None,
+    ) -> None:
+        # copied into each record as a list (see build)
+        self.tags = tuple(tags)
+        self.fields = expand_fields(fields)
+        self.projection = projection
+        self.mft_file_path = mft_file_path
+        self.actions = {
+            (attr_type, macb_type): f"mft-{attr_type.lower()}-{macb_type.lower()}"
+            for attr_type in TIMELINE_ATTRIBUTES
+            for macb_type in MACB_MAPPING
+        }
+        self.timestamp_fields = frozenset(MACB_MAPPING.values())
+
+    def build(
+        self, record: dict, filepath: str, record_filter: RecordFilter = None
+    ) -> List[dict]:
+        """Format MFT record into timeline analysis records.
+
+        Args:
+            record (dict): Single MFT record
+            filepath (str): File full path (record's file path)
+            record_filter (RecordFilter): Only the timestamps in its time
+                window (if any) are built.
+
+        Returns:
+            List[dict]: Timeline records (MACB for StandardInformation and FileName)
+        """
+        attributes = organize_attributes_by_type(record)
+        record_header = record.get("header", {})
+        number = record_header.get("record_number", 0)
+        name = filepath.rpartition("/")[2] if filepath else ""
+        header = dict(record_header)
+        header.pop("record_number", None)
+
+        change = record.get(CHANGE_FIELD)
+        timeline_records = []
+        for attr_type in TIMELINE_ATTRIBUTES:
+            attribute = attributes.get(attr_type, {})
+            if not attribute or "data" not in attribute:
+                continue
+
+            attr_data = attribute.get("data", {})
+            attr_header = dict(attribute.get("header", {}))
+            attr_header.pop("type_code", None)
+            data = {
+                k: v for k, v in attr_data.items() if k not in self.timestamp_fields
+            }
+
+            for macb_type, timestamp_field in MACB_MAPPING.items():
+                timestamp = attr_data.get(timestamp_field)
+                if record_filter and not record_filter.match_timestamp(timestamp):
+                    continue
+                timeline_records.append(
+                    {
+                        "@timestamp": timestamp,
+                        "event": {
+                            "action": self.actions[(attr_type, macb_type)],
+                            # constants, serialized as arrays
+                            "category": ("file",),
+                            "type": ("change",),
+                            "kind": "event",
+                            "provider": "mft",
+                            "module": "windows",
+                            "dataset": "windows.mft",
+                        },
+                        "windows": {
+                            "mft": {
+                                "record": {
+                                    "number": number,
+                                    "name": name,
+                                    "path": filepath,
+                                },
+                                "header": header.copy(),
+                                "attribute": {
+                                    "type": attr_type,
+                                    "macb_type": macb_type,
+                                    "header": attr_header.copy(),
+                                    "data": data.copy(),
+                                },
+                            },
+                        },
+                        "log": {"file": {"path": self.mft_file_path}},
+                        "tags": list(self.tags),
+                    }
+                )
+
+        if self.projection:
+            memo: dict = dict()
+            timeline_records = [
+                self.projection.apply(timeline_record, memo)
+                for timeline_record in timeline_records
+            ]
+
+        if self.fields:
+            for timeline_record in timeline_records:
+                merge_fields(timeline_record, self.fields)
+
+        if change:
+            for timeline_record in timeline_records:
+                timeline_record[CHANGE_FIELD] = change
+
+        return timeline_records
+
+
+@lru_cache(maxsize=8)
+def get_timeline_builder(
     mft_file_path: str,
-    tags: str = None,
-) -> List[dict]:
-    """Create MACB records for a single attribute.
+    tags: Tuple[str, ...] = BASE_TAGS,
+    fields: Tuple[Tuple[str, str], ...] = (),
+    projection: FieldProjection = None,
+) -> TimelineRecordBuilder:
+    """Get the TimelineRecordBuilder of a run, creating it on first use.
 
     Args:
-        record (dict): Original MFT record
-        attribute (dict): Attribute data
-        attr_type (str): Attribute type
-        filepath (str): File full path (record's file path)
         mft_file_path (str): Path to the MFT file being processed
-        tags (str): Comma-separated string of additional tags
+        tags (Tuple[str, ...]): Tags of every record (see parse_tags)
+        fields (Tuple[Tuple[str, str], ...]): Static fields (see parse_field)
+        projection (FieldProjection): Fields kept in each record.
 
     Returns:
-        List[dict]: MACB timeline records for the attribute
-    """
-    if not attribute or "data" not in attribute:
-        return []
-
-    records = []
-    for macb_type, timestamp_field in MACB_MAPPING.items():
-        timeline_record = create_timeline_record(
-            record,
-            attribute,
-            attr_type,
-            macb_type,
-            timestamp_field,
-            filepath,
-            mft_file_path,
-            tags,
-        )
-        records.append(timeline_record)
-
-    return records
+        TimelineRecordBuilder: Builder shared by every chunk of the run.
+    """
+    return TimelineRecordBuilder(mft_file_path, tags, fields, projection)
 
 
 def format_timeline_records(
-    record: dict, filepath: str, mft_file_path: str, tags: str = None
+    record: dict,
+    filepath: str,
+    mft_file_path: str,
+    tags: Tuple[str, ...] = BASE_TAGS,
+    fields: Tuple[Tuple[str, str], ...] = (),
+    projection: FieldProjection = None,
 ) -> List[dict]:
     """Format MFT record into timeline analysis records.
 
@@ -204,41 +518,39 @@ def format_timeline_records(
         record (dict): Single MFT record
         filepath (str): File full path (record's file path)
         mft_file_path (str): Path to the MFT file being processed
-        tags (str): Comma-separated string of additional tags
+        tags (Tuple[str, ...]): Tags of every record (see parse_tags)
+        fields (Tuple[Tuple[str, str], ...]): Static fields (see parse_field)
+        projection (FieldProjection): Fields kept in each record.
 
     Returns:
         List[dict]: Timeline records (MACB for StandardInformation and FileName)
     """
-    attributes = organize_attributes_by_type(record)
-    timeline_records = []
-
-    # Create MACB records for each target attribute type
-    for attr_type in TIMELINE_ATTRIBUTES:
-        attribute = attributes.get(attr_type, {})
-        macb_records = create_macb_records_for_attribute(
-            record, attribute, attr_type, filepath, mft_file_path, tags
-        )
-        timeline_records.extend(macb_records)
-
-    return timeline_records
+    return get_timeline_builder(mft_file_path, tags, fields, projection).build(
+        record, filepath
+    )
 
 
-def format_standard_record(record: dict, filepath: str, tags: str = None) -> dict:
+def format_standard_record(
+    record: dict,
+    filepath: str,
+    tags: Tuple[str, ...] = BASE_TAGS,
+    fields: dict = None,
+    projection: FieldProjection = None,
+) -> dict:
     """Format MFT record into standard format.
 
     Args:
         record (dict): Single MFT record
         filepath (str): File full path
-        tags (str): Comma-separated string of additional tags
+        tags (Tuple[str, ...]): Tags of every record (see parse_tags)
+        fields (dict): Nested static fields (see expand_fields)
+        projection (FieldProjection): Fields kept in the record.
 
     Returns:
         dict: Standard MFT record
     """
-    # Parse tags from comma-separated string
-    additional_tags = (
-        [tag.strip() for tag in tags.split(",") if tag.strip()] if tags else []
-    )
-    base_tags = ["mft"] + additional_tags
+    # added back after the projection, like the static fields
+    change = record.pop(CHANGE_FIELD, None)
 
     attributes = {}
     for attribute in record.get("attributes"):
@@ -271,139 +583,879 @@ def format_standard_record(record: dict, filepath: str, tags: str = None) -> dic
                 )
 
     # Add tags to the record
-    record["tags"] = base_tags
+    record["tags"] = list(tags)
+
+    if projection:
+        record = projection.apply(record)
+
+    if fields:
+        merge_fields(record, fields)
+
+    if change:
+        record[CHANGE_FIELD] = change
 
     return record
 
 
-def process_standard_by_chunk(
-    records: List[str], rows: List[bytes], tags: str = None
-) -> List[dict]:
-    """Process standard MFT records by chunk.
+def extract_csv_paths(rows: List[bytes]) -> List[str]:
+    """Extract the full path (last column) from each entries_csv() row.
 
     Args:
-        records (List[str]): chunk of MFT records(json).
         rows (List[bytes]): chunk of MFT records(csv).
-        tags (str): Comma-separated string of additional tags
+
+    Returns:
+        List[str]: Full path of each record.
+    """
+    return [split_csv_row(row)[-1].strip() for row in rows]
+
+
+def pack_records(records: List[str]) -> bytes:
+    """Pack a chunk of records(json) into a single JSON array buffer.
+
+    A chunk is sent to the worker processes as this one bytes object, which
+    is pickled with a single copy (a list of str is encoded string by string)
+    and decoded there by one orjson.loads, without joining strings again.
+
+    Args:
+        records (List[str]): chunk of MFT records(json).
+
+    Returns:
+        bytes: JSON array of the records.
+    """
+    return f"[{','.join(records)}]".encode("utf-8")
+
+
+def decode_records(records: Union[bytes, List[str]]) -> List[dict]:
+    """Decode a chunk of MFT records(json).
+
+    Args:
+        records (Union[bytes, List[str]]): Records packed by pack_records, or
+            the records(json) themselves, decoded one by one instead of being
+            concatenated first.
 
     Returns:
         List[dict]: MFT records list.
     """
+    if isinstance(records, (bytes, bytearray, memoryview)):
+        return orjson.loads(records)
+    return [orjson.loads(record) for record in records]
 
-    filename_list: List[str] = [
-        row.decode("utf-8").split(",")[-1].strip() for row in rows
-    ]
 
-    concatenated_json: str = f"[{','.join(records)}]"
-    record_list: List[dict] = orjson.loads(concatenated_json)
+def format_standard_chunk(
+    record_list: List[dict],
+    filename_list: List[str],
+    tags: Tuple[str, ...] = BASE_TAGS,
+    fields: Tuple[Tuple[str, str], ...] = (),
+    projection: FieldProjection = None,
+) -> List[dict]:
+    """Format decoded MFT records into standard records.
+
+    Args:
+        record_list (List[dict]): chunk of MFT records.
+        filename_list (List[str]): Full path of each record.
+        tags (Tuple[str, ...]): Tags of every record (see parse_tags)
+        fields (Tuple[Tuple[str, str], ...]): Static fields (see parse_field)
+        projection (FieldProjection): Fields kept in each record.
 
+    Returns:
+        List[dict]: MFT records list.
+    """
+    expanded = expand_fields(fields)
     return [
-        format_standard_record(record, filename, tags)
+        format_standard_record(record, filename, tags, expanded, projection)
         for record, filename in zip(record_list, filename_list)
     ]
 
 
+def format_timeline_chunk(
+    record_list: List[dict],
+    filename_list: List[str],
+    mft_file_path: str,
+    tags: Tuple[str, ...] = BASE_TAGS,
+    fields: Tuple[Tuple[str, str], ...] = (),
+    record_filter: RecordFilter = None,
+    projection: FieldProjection = None,
+) -> List[dict]:
+    """Format decoded MFT records into timeline records.
+
+    Args:
+        record_list (List[dict]): chunk of MFT records.
+        filename_list (List[str]): Full path of each record.
+        mft_file_path (str): Path to the MFT file being processed
+        tags (Tuple[str, ...]): Tags of every record (see parse_tags)
+        fields (Tuple[Tuple[str, str], ...]): Static fields (see parse_field)
+        record_filter (RecordFilter): Restricts the timestamps built.
+        projection (FieldProjection): Fields kept in each record.
+
+    Returns:
+        List[dict]: Multiple specialized timeline records per MFT entry.
+    """
+    builder = get_timeline_builder(mft_file_path, tags, fields, projection)
+    timeline_records = []
+    for record, filename in zip(record_list, filename_list):
+        timeline_records.extend(builder.build(record, filename, record_filter))
+
+    return timeline_records
+
+
+def process_standard_by_chunk(
+    records: Union[bytes, List[str]],
+    filename_list: List[str],
+    tags: Tuple[str, ...] = BASE_TAGS,
+    fields: Tuple[Tuple[str, str], ...] = (),
+    record_filter: RecordFilter = None,
+    projection: FieldProjection = None,
+    changes: List[str] = None,
+) -> List[dict]:
+    """Process standard MFT records by chunk.
+
+    Args:
+        records (Union[bytes, List[str]]): chunk of MFT records(json), or
+            packed records (see pack_records).
+        filename_list (List[str]): Full path of each record.
+        tags (Tuple[str, ...]): Tags of every record (see parse_tags)
+        fields (Tuple[Tuple[str, str], ...]): Static fields (see parse_field)
+        record_filter (RecordFilter): Records that do not match are dropped
+            before formatting.
+        projection (FieldProjection): Fields kept in each record.
+        changes (List[str]): Change type of each record (see
+            FingerprintStore), added to its documents.
+
+    Returns:
+        List[dict]: MFT records list.
+    """
+
+    with stage("decode"):
+        record_list: List[dict] = decode_records(records)
+        if changes:
+            for record, change in zip(record_list, changes):
+                record[CHANGE_FIELD] = change
+    if record_filter:
+        with stage("filter"):
+            record_list, filename_list = record_filter.select(
+                record_list, filename_list
+            )
+
+    with stage("format"):
+        return format_standard_chunk(
+            record_list, filename_list, tags, fields, projection
+        )
+
+
 def process_timeline_by_chunk(
-    records: List[str], rows: List[bytes], mft_file_path: str, tags: str = None
+    records: Union[bytes, List[str]],
+    filename_list: List[str],
+    mft_file_path: str,
+    tags: Tuple[str, ...] = BASE_TAGS,
+    fields: Tuple[Tuple[str, str], ...] = (),
+    record_filter: RecordFilter = None,
+    projection: FieldProjection = None,
+    changes: List[str] = None,
 ) -> List[dict]:
     """Perform timeline formatting for each chunk.
 
     Creates multiple specialized records per MFT entry for better analysis.
 
     Args:
-        records (List[str]): chunk of MFT records(json).
-        rows (List[bytes]): chunk of MFT records(csv).
+        records (Union[bytes, List[str]]): chunk of MFT records(json), or
+            packed records (see pack_records).
+        filename_list (List[str]): Full path of each record.
         mft_file_path (str): Path to the MFT file being processed
-        tags (str): Comma-separated string of additional tags
+        tags (Tuple[str, ...]): Tags of every record (see parse_tags)
+        fields (Tuple[Tuple[str, str], ...]): Static fields (see parse_field)
+        record_filter (RecordFilter): Records that do not match are dropped
+            before formatting.
+        projection (FieldProjection): Fields kept in each record.
+        changes (List[str]): Change type of each record (see
+            FingerprintStore), added to its documents.
 
     Returns:
         List[dict]: Multiple specialized timeline records per MFT entry.
     """
 
-    filename_list: List[str] = [
-        row.decode("utf-8").split(",")[-1].strip() for row in rows
-    ]
+    with stage("decode"):
+        record_list: List[dict] = decode_records(records)
+        if changes:
+            for record, change in zip(record_list, changes):
+                record[CHANGE_FIELD] = change
+    if record_filter:
+        with stage("filter"):
+            record_list, filename_list = record_filter.select(
+                record_list, filename_list
+            )
 
-    concatenated_json: str = f"[{','.join(records)}]"
-    record_list: List[dict] = orjson.loads(concatenated_json)
+    with stage("format"):
+        return format_timeline_chunk(
+            record_list,
+            filename_list,
+            mft_file_path,
+            tags,
+            fields,
+            record_filter,
+            projection,
+        )
 
-    timeline_records = []
-    for record, filename in zip(record_list, filename_list):
-        timeline_records.extend(
-            format_timeline_records(record, filename, mft_file_path, tags)
+
+def detect_entry_size(mft_file_path: str) -> int:
+    """Read the size of each MFT entry from the header of the first entry.
+
+    Args:
+        mft_file_path (str): Path to the MFT file.
+
+    Returns:
+        int: Entry size in bytes (DEFAULT_ENTRY_SIZE if the header is invalid).
+    """
+    with open(mft_file_path, "rb") as f:
+        header = f.read(0x20)
+    if len(header) == 0x20 and header[:4] == b"FILE":
+        return int.from_bytes(header[0x1C:0x20], "little") or DEFAULT_ENTRY_SIZE
+    return DEFAULT_ENTRY_SIZE
+
+
+def count_entries(mft_file_path: str, entry_size: int) -> int:
+    """Count the entries of an MFT file from its size, like the parser does.
+
+    Args:
+        mft_file_path (str): Path to the MFT file.
+        entry_size (int): Entry size in bytes (see detect_entry_size).
+
+    Returns:
+        int: Number of entries.
+    """
+    return os.path.getsize(mft_file_path) // entry_size
+
+
+def open_entry_range(
+    mft_file_path: str, start: int, stop: int, entry_size: int
+) -> PyMftParser:
+    """Open a parser over the entries [start, stop) of an MFT file.
+
+    The parser numbers the entries from 0, so record numbers read from it
+    must be offset by start.
+
+    Args:
+        mft_file_path (str): Path to the MFT file.
+        start (int): First record number.
+        stop (int): Record number after the last one.
+        entry_size (int): Entry size in bytes (see detect_entry_size).
+
+    Returns:
+        PyMftParser: MFT parser.
+    """
+    with open(mft_file_path, "rb") as f:
+        f.seek(start * entry_size)
+        data = f.read((stop - start) * entry_size)
+    return PyMftParser(io.BytesIO(data))
+
+
+def index_names_by_range(
+    mft_file_path: str, start: int, stop: int, entry_size: int
+) -> List[tuple]:
+    """Read the names and base records of the entries [start, stop).
+
+    Args:
+        mft_file_path (str): Path to the MFT file.
+        start (int): First record number.
+        stop (int): Record number after the last one.
+        entry_size (int): Entry size in bytes (see detect_entry_size).
+
+    Returns:
+        List[tuple]: (record number, (parent entry, name) or None, base record,
+            directory flag) of each entry, to be registered on a MftPathIndex.
+    """
+    entries = list()
+    for entry in open_entry_range(mft_file_path, start, stop, entry_size).entries():
+        filenames = [
+            attribute.attribute_content
+            for attribute in entry.attributes()
+            if attribute.type_code == FILE_NAME_TYPE_CODE
+        ]
+        best = next(
+            (f for f in filenames if f.namespace in WIN32_NAMESPACES),
+            filenames[0] if filenames else None,
+        )
+        name = (best.parent_entry_id, best.name) if best else None
+        entries.append(
+            (
+                start + entry.entry_id,
+                name,
+                entry.base_entry_id,
+                DIRECTORY_FLAG in entry.flags,
+            )
         )
+    return entries
 
-    return timeline_records
+
+def process_by_range(
+    mft_file_path: str,
+    start: int,
+    stop: int,
+    entry_size: int,
+    paths: Dict[int, str],
+    timeline_mode: bool = False,
+    tags: Tuple[str, ...] = BASE_TAGS,
+    fields: Tuple[Tuple[str, str], ...] = (),
+    record_filter: RecordFilter = None,
+    projection: FieldProjection = None,
+) -> List[dict]:
+    """Parse and format the entries [start, stop) of an MFT file.
+
+    Args:
+        mft_file_path (str): Path to the MFT file.
+        start (int): First record number.
+        stop (int): Record number after the last one.
+        entry_size (int): Entry size in bytes (see detect_entry_size).
+        paths (Dict[int, str]): Full path of each named record in the range.
+        timeline_mode (bool): Flag to enable timeline analysis mode.
+        tags (Tuple[str, ...]): Tags of every record (see parse_tags)
+        fields (Tuple[Tuple[str, str], ...]): Static fields (see parse_field)
+        record_filter (RecordFilter): Records that do not match are dropped
+            before formatting.
+        projection (FieldProjection): Fields kept in each record.
+
+    Returns:
+        List[dict]: MFT records list, or timeline records.
+    """
+    with stage("parse"):
+        parser = open_entry_range(mft_file_path, start, stop, entry_size)
+        records = list(parser.entries_json())
+    with stage("decode"):
+        record_list: List[dict] = decode_records(records)
+
+    filename_list = list()
+    for record in record_list:
+        header = record.get("header", {})
+        header["record_number"] = header.get("record_number", 0) + start
+        filename_list.append(paths.get(header["record_number"], ""))
+    if record_filter:
+        with stage("filter"):
+            record_list, filename_list = record_filter.select(
+                record_list, filename_list
+            )
+
+    with stage("format"):
+        if timeline_mode:
+            return format_timeline_chunk(
+                record_list,
+                filename_list,
+                mft_file_path,
+                tags,
+                fields,
+                record_filter,
+                projection,
+            )
+        return format_standard_chunk(
+            record_list, filename_list, tags, fields, projection
+        )
+
+
+def serialize_by_chunk(serializer: Callable, func: Callable, *args) -> Any:
+    """Process a chunk with func and serialize the result on the same process.
+
+    Args:
+        serializer (Callable): Function applied to the processed records.
+        func (Callable): process_standard_by_chunk or process_timeline_by_chunk.
+        *args: Arguments of func.
+
+    Returns:
+        Any: Output of serializer.
+    """
+    records = func(*args)
+    with stage("serialize"):
+        return serializer(records)
+
+
+def get_record_number(record: dict) -> int:
+    """Get the MFT record number of a standard or timeline record.
+
+    Args:
+        record (dict): Standard or timeline record.
+
+    Returns:
+        int: Record number.
+    """
+    if "windows" in record:
+        return record["windows"]["mft"]["record"]["number"]
+    return record.get("header", {}).get("record_number", 0)
+
+
+def get_next_record_number(records: List[dict]) -> Optional[int]:
+    """Get the record number that follows a chunk of records.
+
+    Args:
+        records (List[dict]): Standard or timeline records.
+
+    Returns:
+        Optional[int]: Record number after the last record, or None if
+            records is empty.
+    """
+    return max(map(get_record_number, records)) + 1 if records else None
+
+
+def serialize_with_next_record(serializer: Callable, records: List[dict]) -> tuple:
+    """Serialize records, keeping the record number that follows the chunk.
+
+    Args:
+        serializer (Callable): Function applied to the records.
+        records (List[dict]): Standard or timeline records.
+
+    Returns:
+        tuple: Output of serializer and get_next_record_number(records).
+    """
+    return serializer(records), get_next_record_number(records)
+
+
+def skip_records_before(chunks: Iterable, start_record: int) -> Generator:
+    """Drop the records numbered below start_record from chunks of json records.
+
+    Only the first and last record of each chunk are decoded, unless the
+    chunk straddles start_record.
+
+    Args:
+        chunks (Iterable): Tuple[List[str], List[str]] of records(json) and paths.
+        start_record (int): First record number to keep.
+
+    Yields:
+        Generator: Yields Tuple[List[str], List[str]].
+    """
+
+    def number(record: str) -> int:
+        return orjson.loads(record).get("header", {}).get("record_number", 0)
+
+    for json_chunk, paths in chunks:
+        if number(json_chunk[-1]) < start_record:
+            continue
+        if start_record <= number(json_chunk[0]):
+            yield json_chunk, paths
+            continue
+        kept = [
+            (record, path)
+            for record, path in zip(json_chunk, paths)
+            if start_record <= number(record)
+        ]
+        yield [record for record, _ in kept], [path for _, path in kept]
 
 
 class Mft2es(SafeMultiprocessingMixin):
-    def __init__(self, input_path: Path) -> None:
+    def __init__(
+        self, input_path: Path, single_pass: bool = False, sharded: bool = False
+    ) -> None:
         self.path = input_path
-        self.parser = PyMftParser(self.path.open(mode="rb"))
-        self.csvparser = PyMftParser(self.path.open(mode="rb"))
+        self.single_pass = single_pass
+        self.sharded = sharded
+        # In sharded mode each range of entries is read by a parser of its own.
+        self.parser = None if sharded else self.open_parser()
+        # In single-pass and sharded modes full paths are rebuilt from the
+        # records, so the second (csv) parser is not needed.
+        self.csvparser = None if single_pass or sharded else self.open_parser()
+
+    def open_parser(self) -> PyMftParser:
+        """Open a parser that reads the MFT file on its own.
+
+        Given a path, the parser reads the file with native buffered I/O instead
+        of calling back into a Python file object for every read.
+
+        Returns:
+            PyMftParser: MFT parser.
+        """
+        return PyMftParser(str(self.path))
+
+    def gen_chunks(
+        self,
+        chunk_size: Size,
+        start_record: int = 0,
+        record_filter: RecordFilter = None,
+        delta: FingerprintStore = None,
+        tag_changes: bool = False,
+    ) -> Generator:
+        """Generates chunks of MFT records(json) with the full path of each record.
+
+        Args:
+            chunk_size (Size): Size of the chunk.
+            start_record (int): Records numbered below it are skipped.
+            record_filter (RecordFilter): Entries whose csv row does not match
+                are dropped here, before their records are decoded (single-pass
+                chunks are filtered by the process functions only). With delta,
+                the time window is matched here too, before entries are compared.
+            delta (FingerprintStore): Only the entries that changed since the
+                store was saved are yielded (not in single-pass mode).
+            tag_changes (bool): Add the change type of each record, with delta.
+
+        Raises:
+            ValueError: If delta is given in single-pass mode.
+
+        Yields:
+            Generator: Yields Tuple[List[str], List[str]], or
+                Tuple[List[str], List[str], List[str]] with tag_changes.
+        """
+        if self.parser is None:
+            raise ValueError("sharded records are read by gen_sharded_records")
+        if delta and self.single_pass:
+            raise ValueError("delta import needs the csv parser (not single-pass)")
+
+        if self.single_pass:
+            chunks = self.gen_single_pass_chunks(chunk_size)
+        elif delta:
+            entries = zip(self.parser.entries_json(), self.csvparser.entries_csv())
+            if record_filter:
+                entries = (
+                    entry for entry in entries if record_filter.match_row(entry[1])
+                )
+            if record_filter and record_filter.has_window:
+                # entries outside the time window are not sent, so they must
+                # keep their previous state rather than be compared (and saved)
+                entries = (
+                    entry
+                    for entry in entries
+                    if record_filter.match_window(orjson.loads(entry[0]))
+                )
+            # unchanged entries are dropped before being chunked
+            changed = delta.gen_changes(entries, start_record)
+            for chunk in generate_chunks(chunk_size, changed):
+                records, paths, changes = map(list, zip(*chunk))
+                yield (records, paths, changes) if tag_changes else (records, paths)
+            return
+        else:
+            # both parsers are read together, so a chunk size changing
+            # between the two reads cannot misalign records and paths
+            entries = zip(self.parser.entries_json(), self.csvparser.entries_csv())
+            if record_filter:
+                entries = (
+                    entry for entry in entries if record_filter.match_row(entry[1])
+                )
+            chunks = (
+                (
+                    [record for record, _ in chunk],
+                    extract_csv_paths([row for _, row in chunk]),
+                )
+                for chunk in generate_chunks(chunk_size, entries)
+            )
+        if start_record:
+            chunks = skip_records_before(chunks, start_record)
+        yield from chunks
+
+    def gen_single_pass_chunks(self, chunk_size: Size) -> Generator:
+        """Generates chunks of MFT records(json) with paths from a single parser.
+
+        Records whose parent directory comes later in the MFT are held back
+        until it has been read, so they may be yielded in a later chunk.
+
+        Args:
+            chunk_size (Size): Size of the chunk.
+
+        Yields:
+            Generator: Yields Tuple[List[str], List[str]].
+        """
+        if self.parser is None:
+            raise ValueError("sharded records are read by gen_sharded_records")
+
+        index = MftPathIndex(self.parser.number_of_entries())
+        order = count()
+
+        # heap of (missing ancestor, order, record(json), record number)
+        pending: List[tuple] = list()
+
+        for json_chunk in generate_chunks(chunk_size, self.parser.entries_json()):
+            numbers = [index.add(orjson.loads(record)) for record in json_chunk]
+
+            ready = list()
+            while pending and pending[0][0] <= index.position:
+                ready.append(heappop(pending)[1:])
+            ready.sort()
+            ready.extend(zip(order, json_chunk, numbers))
+
+            records, paths = list(), list()
+            for i, record, number in ready:
+                path, missing = index.resolve(number)
+                if path is None:
+                    heappush(pending, (missing, i, record, number))
+                else:
+                    records.append(record)
+                    paths.append(path)
+            if records:
+                yield records, paths
+
+        index.complete()
+        for chunk in generate_chunks(chunk_size, sorted(p[1:] for p in pending)):
+            yield (
+                [record for _, record, _ in chunk],
+                [index.resolve(number)[0] for _, _, number in chunk],
+            )
+
+    def gen_sharded_records(
+        self,
+        pool: Optional[Pool],
+        chunk_size: Size,
+        timeline_mode: bool = False,
+        tags: Tuple[str, ...] = BASE_TAGS,
+        max_pending: int = 0,
+        serializer: Callable = None,
+        fields: Tuple[Tuple[str, str], ...] = (),
+        start_record: int = 0,
+        worker_batch: Size = 1,
+        stats: Optional[ImportStats] = None,
+        record_filter: RecordFilter = None,
+        projection: FieldProjection = None,
+    ) -> Generator:
+        """Generates MFT records by parsing disjoint record ranges.
+
+        A first pass reads the names of every entry (by INDEX_SHARD_SIZE ranges)
+        to resolve full paths, then each range of chunk_size * worker_batch
+        entries is parsed and formatted on its own. Both passes run on the pool
+        if one is given.
+
+        Args:
+            pool (Pool): Worker pool, or None to parse on this process.
+            chunk_size (Size): Number of entries of a chunk.
+            timeline_mode (bool): Flag to enable timeline analysis mode.
+            tags (Tuple[str, ...]): Tags of every record (see parse_tags).
+            max_pending (int): Maximum number of tasks in flight on the pool.
+            serializer (Callable): Function applied to each List[dict].
+            fields (Tuple[Tuple[str, str], ...]): Static fields (see parse_field).
+            start_record (int): First record number to parse; the ranges
+                before it are not read (except for the names).
+            worker_batch (Size): Number of chunks parsed by each task.
+            stats (ImportStats): Collects the time spent in each stage.
+            record_filter (RecordFilter): Selects the records to format.
+            projection (FieldProjection): Fields kept in each record.
+
+        Yields:
+            Generator: Yields List[dict], or the output of serializer.
+        """
+        mft_file_path = str(self.path)
+        entry_size = detect_entry_size(mft_file_path)
+        entry_count = count_entries(mft_file_path, entry_size)
+
+        index = MftPathIndex(entry_count)
+        ranges = [
+            (
+                mft_file_path,
+                start,
+                min(start + INDEX_SHARD_SIZE, entry_count),
+                entry_size,
+            )
+            for start in range(0, entry_count, INDEX_SHARD_SIZE)
+        ]
+        names = (
+            imap_bounded(pool, index_names_by_range, ranges, max_pending)
+            if pool
+            else (index_names_by_range(*r) for r in ranges)
+        )
+        if stats:
+            names = stats.timed(names, "index")
+        for entries in names:
+            for entry in entries:
+                index.register(*entry)
+        index.complete()
+
+        def gen_args() -> Generator:
+            start = start_record
+            while start < entry_count:
+                stop = min(
+                    start + current_size(chunk_size) * current_size(worker_batch),
+                    entry_count,
+                )
+                paths = {
+                    number: index.resolve(number)[0]
+                    for number in range(start, stop)
+                    if number in index.names or number in index.bases
+                }
+                yield (
+                    mft_file_path,
+                    start,
+                    stop,
+                    entry_size,
+                    paths,
+                    timeline_mode,
+                    tags,
+                    fields,
+                    record_filter,
+                    projection,
+                )
+                start = stop
+
+        func = process_by_range
+        if serializer:
+            func = partial(serialize_by_chunk, serializer, func)
+        if stats:
+            func = partial(measure_by_chunk, func)
+
+        if not stats:
+            yield from (
+                imap_bounded(pool, func, gen_args(), max_pending)
+                if pool
+                else (func(*args) for args in gen_args())
+            )
+        elif pool:
+            results = imap_bounded(
+                pool,
+                func,
+                gen_args(),
+                max_pending,
+                partial(stats.observe_depth, "workers"),
+            )
+            yield from stats.collect(stats.timed(results, "wait"))
+        else:
+            yield from stats.collect((func(*args) for args in gen_args()), local=True)
 
     def gen_timeline_records(
         self,
         multiprocess: bool,
-        chunk_size: int,
+        chunk_size: Size,
         timeline_mode: bool = False,
-        tags: str = None,
+        tags: Tuple[str, ...] = BASE_TAGS,
+        max_pending: int = 0,
+        serializer: Callable = None,
+        fields: Tuple[Tuple[str, str], ...] = (),
+        pool: Optional[Pool] = None,
+        start_record: int = 0,
+        worker_batch: Size = 1,
+        stats: Optional[ImportStats] = None,
+        record_filter: RecordFilter = None,
+        projection: FieldProjection = None,
+        delta: FingerprintStore = None,
+        tag_changes: bool = False,
     ) -> Generator:
         """Generates MFT records.
 
         Args:
             multiprocess (bool): Flag to run multiprocessing.
-            chunk_size (int): Size of the chunk to be processed for each process.
+            chunk_size (Size): Number of entries read from the parser at a time.
             timeline_mode (bool): Flag to enable timeline analysis mode.
-            tags (str): Comma-separated string of additional tags
+            tags (Tuple[str, ...]): Tags of every record (see parse_tags).
+                A comma-separated string is also accepted.
+            max_pending (int): Maximum number of chunks in flight on the
+                process pool. Defaults to twice the CPU count.
+            serializer (Callable): Function applied to each List[dict] before it
+                is yielded; runs on the worker processes in multiprocess mode.
+                Must be picklable (e.g. functools.partial of a module function).
+            fields (Tuple[Tuple[str, str], ...]): Static fields merged into
+                every record (see parse_field).
+            pool (Pool): Process pool to run on. Defaults to the pool shared by
+                every run of this process (see get_shared_pool).
+            start_record (int): Records numbered below it are skipped, e.g. to
+                resume an interrupted import.
+            worker_batch (Size): Number of chunks processed by each task of the
+                process pool (multiprocess and sharded modes).
+            stats (ImportStats): Collects the time spent in each stage, on
+                this process and on the workers.
+            record_filter (RecordFilter): Records that do not match are not
+                formatted (nor yielded), and are dropped before being decoded
+                where their csv row is enough to tell.
+            projection (FieldProjection): Fields kept in each record; the
+                others are never copied into the records nor serialized.
+            delta (FingerprintStore): Only the entries that changed since the
+                store was saved are processed; the store is updated as they
+                are read (see gen_chunks).
+            tag_changes (bool): Add the change type to each record, with delta.
+
+        Raises:
+            ValueError: If delta is given in single-pass or sharded mode.
 
         Yields:
-            Generator: Yields List[dict].
+            Generator: Yields List[dict], or the output of serializer.
         """
+        if tags is None or isinstance(tags, str):
+            tags = parse_tags(tags)
+        if delta and (self.single_pass or self.sharded):
+            raise ValueError(
+                "delta import needs the csv parser (not single-pass/sharded)"
+            )
+
+        if self.sharded and not multiprocess:
+            yield from self.gen_sharded_records(
+                None,
+                chunk_size,
+                timeline_mode,
+                tags,
+                max_pending,
+                serializer,
+                fields,
+                start_record,
+                worker_batch,
+                stats,
+                record_filter,
+                projection,
+            )
+            return
+
+        if self.sharded:
+            cpu_count = self.get_cpu_count()
+            with self.open_pool(pool) as pool:
+                yield from self.gen_sharded_records(
+                    pool,
+                    chunk_size,
+                    timeline_mode,
+                    tags,
+                    max_pending or cpu_count * 2,
+                    serializer,
+                    fields,
+                    start_record,
+                    worker_batch,
+                    stats,
+                    record_filter,
+                    projection,
+                )
+            return
+
+        # chunks of (records, paths), with change types if tag_changes
+        chunks = self.gen_chunks(
+            chunk_size, start_record, record_filter, delta, tag_changes
+        )
+        if stats:
+            chunks = stats.timed(chunks, "parse")
+        if multiprocess:
+            # the workers receive each chunk as a single buffer
+            chunks = (
+                (pack_records(json_chunk), *lists)
+                for json_chunk, *lists in merge_chunks(chunks, worker_batch)
+            )
+
+        if timeline_mode:
+            func = process_timeline_by_chunk
+            args = (
+                (
+                    json_chunk,
+                    paths,
+                    str(self.path),
+                    tags,
+                    fields,
+                    record_filter,
+                    projection,
+                    *changes,
+                )
+                for json_chunk, paths, *changes in chunks
+            )
+        else:
+            func = process_standard_by_chunk
+            args = (
+                (json_chunk, paths, tags, fields, record_filter, projection, *changes)
+                for json_chunk, paths, *changes in chunks
+            )
+
+        if serializer:
+            func = partial(serialize_by_chunk, serializer, func)
+        if stats:
+            func = partial(measure_by_chunk, func)
 
         if multiprocess:
-            # Use safe context for Python 3.13 compatibility
-            ctx = self.get_multiprocessing_context()
-
-            # Pre-generate chunks to get accurate count
-            json_chunks = list(generate_chunks(chunk_size, self.parser.entries_json()))
-            csv_chunks = list(generate_chunks(chunk_size, self.csvparser.entries_csv()))
-
-            if timeline_mode:
-                with ctx.Pool(self.get_cpu_count()) as pool:
-                    results = pool.starmap_async(
-                        process_timeline_by_chunk,
-                        [
-                            (json_chunk, csv_chunk, str(self.path), tags)
-                            for json_chunk, csv_chunk in zip(json_chunks, csv_chunks)
-                        ],
-                    )
-                    yield list(chain.from_iterable(results.get(timeout=None)))
-            else:
-                with ctx.Pool(self.get_cpu_count()) as pool:
-                    results = pool.starmap_async(
-                        process_standard_by_chunk,
-                        [
-                            (json_chunk, csv_chunk, tags)
-                            for json_chunk, csv_chunk in zip(json_chunks, csv_chunks)
-                        ],
-                    )
-                    yield list(chain.from_iterable(results.get(timeout=None)))
+            # Chunks are sent to the pool while the parser is still reading,
+            # and each one is yielded as soon as it (and those before it) finish.
+            with self.open_pool(pool) as pool:
+                results = imap_bounded(
+                    pool,
+                    func,
+                    args,
+                    max_pending or self.get_cpu_count() * 2,
+                    partial(stats.observe_depth, "workers") if stats else None,
+                )
+                if stats:
+                    results = stats.collect(stats.timed(results, "wait"))
+                yield from results
         else:
-            buffer: List[dict] = list()
-            for json, csv in zip(
-                generate_chunks(chunk_size, self.parser.entries_json()),
-                generate_chunks(chunk_size, self.csvparser.entries_csv()),
-            ):
-                if chunk_size <= len(buffer):
-                    yield list(chain.from_iterable(buffer))
-                    buffer.clear()
-                else:
-                    if timeline_mode:
-                        buffer.append(
-                            process_timeline_by_chunk(json, csv, str(self.path), tags)
-                        )
-                    else:
-                        buffer.append(process_standard_by_chunk(json, csv, tags))
-            else:
-                yield list(chain.from_iterable(buffer))
+            # Each chunk is formatted and yielded on its own, so no more than
+            # one chunk of records is held at a time.
+            results = (func(*a) for a in args)
+            if stats:
+                results = stats.collect(results, local=True)
+            yield from results
@@ -0,0 +1,166 @@
+# coding: utf-8
+import os
+from typing import Dict, Optional, Set, Tuple
+
+# MFT entry 5 is the root directory of the volume.
+ROOT_ENTRY = 5
+
+# Path prefix used by the mft crate when a parent entry cannot be read.
+UNKNOWN_PARENT = "[Unknown]"
+
+# Preferred namespaces when an entry has several FileName attributes.
+WIN32_NAMESPACES = ("Win32", "Win32AndDos")
+
+# Entry flag of directories (entries with an index).
+DIRECTORY_FLAG = "INDEX_PRESENT"
+
+
+def find_best_name(record: dict) -> Optional[Tuple[int, str]]:
+    """Find the (parent entry, name) pair of the most readable FileName attribute.
+
+    Args:
+        record (dict): Single MFT record (entries_json).
+
+    Returns:
+        Optional[Tuple[int, str]]: Parent entry number and file name,
+            or None if the record has no FileName attribute.
+    """
+    filenames = [
+        attribute.get("data", {})
+        for attribute in record.get("attributes", [])
+        if attribute.get("header", {}).get("type_code") == "FileName"
+    ]
+    if not filenames:
+        return None
+
+    best = next(
+        (f for f in filenames if f.get("namespace") in WIN32_NAMESPACES),
+        filenames[0],
+    )
+    return best.get("parent", {}).get("entry", 0), best.get("name", "")
+
+
+class MftPathIndex(object):
+    """Rebuilds full paths from the FileName attributes of entries_json() records.
+
+    Mirrors the path resolution of the mft crate (the FullPath column of
+    entries_csv()), so a single parser is enough to get both the record and
+    its path. Like the crate, paths are not resolved through an entry that is
+    not a directory (e.g. a parent reference to an entry since reused by a
+    file, or the base record of a file): "[Unknown]" stands for its path.
+    """
+
+    def __init__(self, entry_count: int) -> None:
+        self.entry_count = entry_count
+        self.position = -1
+        self.names: Dict[int, Tuple[int, str]] = dict()
+        self.bases: Dict[int, int] = dict()
+        self.directories: Set[int] = set()
+        self.paths: Dict[int, str] = dict()
+        self.is_complete = False
+
+    def add(self, record: dict) -> int:
+        """Register the name and parent reference of a record.
+
+        Args:
+            record (dict): Single MFT record (entries_json).
+
+        Returns:
+            int: Record number.
+        """
+        header = record.get("header", {})
+        number = header.get("record_number", 0)
+        base = header.get("base_reference", {}).get("entry", 0)
+        directory = DIRECTORY_FLAG in header.get("flags", "")
+        self.register(number, find_best_name(record), base, directory)
+        return number
+
+    def register(
+        self,
+        number: int,
+        name: Optional[Tuple[int, str]],
+        base: int,
+        directory: bool = False,
+    ) -> None:
+        """Register the name or base record of an entry.
+
+        Args:
+            number (int): Record number.
+            name (Optional[Tuple[int, str]]): Parent entry number and file name
+                (see find_best_name), or None.
+            base (int): Base record number of an extension record, or 0.
+            directory (bool): Whether the entry is a directory.
+        """
+        if name:
+            self.names[number] = name
+        elif base:
+            self.bases[number] = base
+        if directory:
+            self.directories.add(number)
+
+        self.position = max(self.position, number)
+
+    def complete(self) -> None:
+        """Mark every record as registered; unseen parents are resolved as missing."""
+        self.is_complete = True
+
+    def resolve(self, number: int) -> Tuple[Optional[str], int]:
+        """Resolve the full path of a registered record.
+
+        Args:
+            number (int): Record number.
+
+        Returns:
+            Tuple[Optional[str], int]: Full path and -1, or None and the number
+                of the ancestor that has not been registered yet.
+        """
+        steps = []
+        current = number
+        via_base = False
+        while True:
+            if (
+                current != number
+                and (current in self.names or current in self.bases)
+                and current not in self.directories
+            ):
+                prefix = UNKNOWN_PARENT
+                break
+            if current in self.paths:
+                if current == number:
+                    return self.paths[current], -1
+                prefix = self.paths[current]
+                break
+            if current in steps:
+                prefix = ""
+                break
+            if current in self.names:
+                steps.append(current)
+                parent = self.names[current][0]
+                if parent in (0, ROOT_ENTRY, current):
+                    prefix = ""
+                    break
+                current, via_base = parent, False
+            elif current in self.bases:
+                steps.append(current)
+                current, via_base = self.bases[current], True
+            elif current == number:
+                return "", -1
+            elif not self.is_complete and self.position < current:
+                return None, current
+            elif self.entry_count <= current and not via_base:
+                prefix = UNKNOWN_PARENT
+                break
+            else:
+                prefix = ""
+                break
+
+        for step in reversed(steps):
+            if step in self.names:
+                parent, name = self.names[step]
+                if parent in (0, ROOT_ENTRY, step) or not prefix:
+                    prefix = name
+                else:
+                    prefix = f"{prefix}{os.sep}{name}"
+            if step != number:
+                self.paths[step] = prefix
+        return prefix, -1
@@ -0,0 +1,258 @@
+# coding: utf-8
+import csv
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+# Keys of the filter terms (see parse_filter)
+FILTER_KEYS = ("path", "ext", "state", "type", "since", "until")
+
+# Values of the state and type terms
+STATES = ("allocated", "deleted")
+TYPES = ("file", "directory")
+
+# Attributes whose timestamps are compared with since and until
+TIMESTAMP_ATTRIBUTES = ("StandardInformation", "FileName")
+TIMESTAMP_FIELDS = ("created", "modified", "mft_modified", "accessed")
+
+# Position of the entry flags in an entries_csv() row
+CSV_FLAGS_COLUMN = 6
+
+
+def normalize_timestamp(value: str) -> str:
+    """Convert an ISO 8601 date or time into the form of record timestamps.
+
+    Args:
+        value (str): Date or time (e.g. "2024-01-31" or "2024-01-31T12:00:00+09:00"),
+            UTC unless it has an offset.
+
+    Raises:
+        ValueError: If the value is not an ISO 8601 date or time.
+
+    Returns:
+        str: UTC time as "YYYY-MM-DDTHH:MM:SS".
+    """
+    moment = datetime.fromisoformat(value.strip())
+    if moment.tzinfo:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def parse_filter(term: str) -> Tuple[str, str]:
+    """Parse a filter term given as "key=value".
+
+    Args:
+        term (str): Filter term (e.g. "ext=exe,dll", "state=deleted").
+
+    Raises:
+        ValueError: If the key is not one of FILTER_KEYS or the value is invalid.
+
+    Returns:
+        Tuple[str, str]: Key and value.
+    """
+    key, separator, value = term.partition("=")
+    key, value = key.strip().lower(), value.strip()
+    if not separator or key not in FILTER_KEYS or not value:
+        raise ValueError(f"invalid filter: {term}")
+    if key == "state" and value.lower() not in STATES:
+        raise ValueError(
+            f"invalid filter: {term} (state is one of {', '.join(STATES)})"
+        )
+    if key == "type" and value.lower() not in TYPES:
+        raise ValueError(f"invalid filter: {term} (type is one of {', '.join(TYPES)})")
+    if key in ("since", "until"):
+        normalize_timestamp(value)
+    return key, value
+
+
+def split_csv_row(row: bytes) -> List[str]:
+    """Split an entries_csv() row into its columns.
+
+    Args:
+        row (bytes): entries_csv() row; the first one starts with the header.
+
+    Returns:
+        List[str]: Columns of the row (of its last line for the first one).
+    """
+    line = row.decode("utf-8").strip().rsplit("\n", 1)[-1]
+    if '"' not in line:
+        return line.split(",")
+    # names containing a comma or a quote are quoted
+    return next(csv.reader([line]))
+
+
+def get_entry_flags(record: dict) -> str:
+    return record.get("header", {}).get("flags", "")
+
+
+class RecordFilter(object):
+    """Selects the MFT entries to process, before they are formatted.
+
+    Terms of different keys must all match, several path or ext terms match
+    if any of them does:
+        path: glob matched against the full path, case-insensitively, with
+            "/" as separator (e.g. "Windows/System32/*")
+        ext: comma-separated file extensions (e.g. "exe,dll")
+        state: allocated (in use) or deleted
+        type: file or directory
+        since, until: an entry matches if one of its StandardInformation or
+            FileName timestamps is in [since, until); in timeline mode, only
+            the records of those timestamps are built.
+
+    The path, ext, state and type terms are decided from the entries_csv()
+    row, before the record is decoded (match_row); the time window needs the
+    decoded record (match_window, match_record).
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str] = (),
+        extensions: Iterable[str] = (),
+        state: str = None,
+        entry_type: str = None,
+        since: str = None,
+        until: str = None,
+    ) -> None:
+        self.paths: Tuple[str, ...] = tuple(
+            path.replace("\\", "/").lower() for path in paths
+        )
+        self.extensions: FrozenSet[str] = frozenset(
+            extension.strip().lstrip(".").lower() for extension in extensions
+        )
+        self.state = state.lower() if state else None
+        self.entry_type = entry_type.lower() if entry_type else None
+        self.since = normalize_timestamp(since) if since else None
+        self.until = normalize_timestamp(until) if until else None
+
+    @classmethod
+    def from_terms(cls, terms: Iterable[Tuple[str, str]]) -> Optional["RecordFilter"]:
+        """Build a filter from parsed terms.
+
+        Args:
+            terms (Iterable[Tuple[str, str]]): Keys and values (see parse_filter).
+
+        Returns:
+            Optional[RecordFilter]: Filter, or None if there are no terms.
+        """
+        terms = list(terms)
+        if not terms:
+            return None
+        values = {key: [value for k, value in terms if k == key] for key in FILTER_KEYS}
+        return cls(
+            paths=values["path"],
+            extensions=[
+                extension
+                for value in values["ext"]
+                for extension in value.split(",")
+                if extension.strip()
+            ],
+            state=values["state"][-1] if values["state"] else None,
+            entry_type=values["type"][-1] if values["type"] else None,
+            since=values["since"][-1] if values["since"] else None,
+            until=values["until"][-1] if values["until"] else None,
+        )
+
+    @property
+    def has_window(self) -> bool:
+        return self.since is not None or self.until is not None
+
+    def match_path(self, path: str) -> bool:
+        """Match the path and ext terms against a full path."""
+        normalized = path.replace("\\", "/").lower()
+        if self.paths and not any(fnmatchcase(normalized, p) for p in self.paths):
+            return False
+        if self.extensions:
+            name, dot, extension = normalized.rpartition("/")[2].rpartition(".")
+            if not (dot and name) or extension not in self.extensions:
+                return False
+        return True
+
+    def match_flags(self, flags: str) -> bool:
+        """Match the state and type terms against entry flags (e.g.
+        "EntryFlags(ALLOCATED | INDEX_PRESENT)")."""
+        if self.state and ("ALLOCATED" in flags) != (self.state == "allocated"):
+            return False
+        if self.entry_type and ("INDEX_PRESENT" in flags) != (
+            self.entry_type == "directory"
+        ):
+            return False
+        return True
+
+    def match_timestamp(self, timestamp: Optional[str]) -> bool:
+        """Match a record timestamp (e.g. "2024-01-31T12:00:00.123Z") against
+        since and until."""
+        if not self.has_window:
+            return True
+        if not timestamp:
+            return False
+        timestamp = timestamp[:19]
+        if self.since is not None and timestamp < self.since:
+            return False
+        return self.until is None or timestamp < self.until
+
+    def match_row(self, row: bytes) -> bool:
+        """Match every term but since and until against an entries_csv() row.
+
+        Args:
+            row (bytes): entries_csv() row; the first one starts with the header.
+
+        Returns:
+            bool: Whether the entry may match.
+        """
+        columns = split_csv_row(row)
+        return self.match_flags(columns[CSV_FLAGS_COLUMN]) and self.match_path(
+            columns[-1].strip()
+        )
+
+    def match_record(self, record: dict, path: str) -> bool:
+        """Match every term against a decoded entries_json() record.
+
+        Args:
+            record (dict): Single MFT record.
+            path (str): Full path of the record.
+
+        Returns:
+            bool: Whether the entry matches.
+        """
+        return (
+            self.match_flags(get_entry_flags(record))
+            and self.match_path(path)
+            and self.match_window(record)
+        )
+
+    def match_window(self, record: dict) -> bool:
+        """Match since and until against a decoded entries_json() record.
+
+        Args:
+            record (dict): Single MFT record.
+
+        Returns:
+            bool: Whether one of its timestamps is in the time window.
+        """
+        if not self.has_window:
+            return True
+        return any(
+            self.match_timestamp(attribute.get("data", {}).get(field))
+            for attribute in record.get("attributes", [])
+            if attribute.get("header", {}).get("type_code") in TIMESTAMP_ATTRIBUTES
+            for field in TIMESTAMP_FIELDS
+        )
+
+    def select(
+        self, records: List[dict], paths: List[str]
+    ) -> Tuple[List[dict], List[str]]:
+        """Keep the records (and their paths) that match.
+
+        Args:
+            records (List[dict]): Decoded MFT records.
+            paths (List[str]): Full path of each record.
+
+        Returns:
+            Tuple[List[dict], List[str]]: Matching records and their paths.
+        """
+        kept = [
+            (record, path)
+            for record, path in zip(records, paths)
+            if self.match_record(record, path)
+        ]
+        return [record for record, _ in kept], [path for _, path in kept]
@@ -0,0 +1,509 @@
+# coding: utf-8
+import os
+import zlib
+from abc import ABCMeta, abstractmethod
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from types import ModuleType
+from typing import Any, BinaryIO, Callable, Iterable, List, Optional, Protocol, Tuple
+
+import orjson
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed by ParquetWriter
+    pa = None
+
+zstandard: Optional[ModuleType]
+try:
+    import zstandard
+except ImportError:  # optional, only needed by zstd compression
+    zstandard = None
+
+# Size of the buffer between the writers and the output file.
+BUFFER_SIZE = 1024 * 1024
+
+# Number of records of each Parquet row group
+ROW_GROUP_SIZE = 65536
+
+PARQUET_COMPRESSION = "zstd"
+
+# Output compressions, and the file suffixes they are inferred from
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+COMPRESSIONS = tuple(COMPRESSION_SUFFIXES.values())
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Number of blocks (of BUFFER_SIZE bytes) queued for the compression thread
+COMPRESSION_QUEUE_SIZE = 8
+
+
+def get_compression(output_path: Path, compress: Optional[str] = None) -> str:
+    """Get the compression of an output file.
+
+    Args:
+        output_path (Path): Output file.
+        compress (Optional[str]): One of COMPRESSIONS, "none", or None to
+            infer it from the suffix of output_path.
+
+    Returns:
+        str: One of COMPRESSIONS, or "" if the output is not compressed.
+    """
+    if compress is None:
+        return COMPRESSION_SUFFIXES.get(Path(output_path).suffix.lower(), "")
+    return "" if compress == "none" else compress
+
+
+class Compressor(Protocol):
+    """Compression object of zlib or zstandard."""
+
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class OutputFile(Protocol):
+    """File the records are written to: a binary file or a CompressedFile."""
+
+    def write(self, data: bytes) -> Any: ...
+
+    def writelines(self, lines: Iterable[bytes]) -> Any: ...
+
+    def close(self) -> None: ...
+
+
+class CompressedFile(object):
+    """Write-only file compressing its content on a background thread.
+
+    Writes are gathered into blocks of BUFFER_SIZE bytes, which a thread
+    compresses and writes to the output file while the records of the next
+    ones are formatted (zlib and zstandard release the GIL while they
+    compress). Up to COMPRESSION_QUEUE_SIZE blocks are queued, after which
+    writes wait for the thread. zstd compresses with one thread per CPU as
+    well. An error of the thread is raised by the next write or close.
+    """
+
+    def __init__(self, output_path: Path, compression: str) -> None:
+        """
+        Args:
+            output_path (Path): Output file.
+            compression (str): One of COMPRESSIONS.
+        """
+        if compression == "zstd":
+            if zstandard is None:
+                raise ImportError(
+                    "zstd compression requires zstandard (pip install mft2es[zstd])"
+                )
+            self.compressor: Compressor = zstandard.ZstdCompressor(
+                level=ZSTD_LEVEL, threads=-1
+            ).compressobj()
+        else:
+            # wbits 31: gzip header and trailer
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        self.fp: BinaryIO = output_path.open(mode="wb")
+        self.buffer = bytearray()
+        self.blocks: Queue = Queue(COMPRESSION_QUEUE_SIZE)
+        self.error: Optional[BaseException] = None
+        self.thread = Thread(target=self.compress, daemon=True)
+        self.thread.start()
+
+    def compress(self) -> None:
+        while True:
+            block = self.blocks.get()
+            if self.error is not None and block is not None:
+                continue  # drain the queue so writes do not wait forever
+            try:
+                if block is None:
+                    if self.error is None:
+                        self.fp.write(self.compressor.flush())
+                    return
+                self.fp.write(self.compressor.compress(block))
+            except BaseException as error:
+                self.error = error
+                if block is None:
+                    return
+
+    def check(self) -> None:
+        if self.error is not None:
+            raise self.error
+
+    def write(self, data: bytes) -> None:
+        self.buffer += data
+        if BUFFER_SIZE <= len(self.buffer):
+            self.check()
+            self.blocks.put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def writelines(self, lines: Iterable[bytes]) -> None:
+        for line in lines:
+            self.write(line)
+
+    def close(self) -> None:
+        """Compress the rest, wait for the thread and close the file."""
+        try:
+            if self.buffer:
+                self.blocks.put(bytes(self.buffer))
+                self.buffer.clear()
+            self.blocks.put(None)
+            self.thread.join()
+        finally:
+            self.fp.close()
+        self.check()
+
+
+class RecordWriter(metaclass=ABCMeta):
+    """Writes chunks of records to a file as they are produced.
+
+    Only the chunk being written is serialized at a time, so memory use
+    depends on the chunk size and not on the size of the MFT. Records are
+    written to a temporary file next to the output, which replaces it once
+    the writer exits without error; if it fails, the output is left as it
+    was instead of holding a truncated file.
+    """
+
+    suffix = ""
+
+    def __init__(
+        self,
+        output_path: Path,
+        static_fields: Tuple[str, ...] = (),
+        compression: str = "",
+    ) -> None:
+        """
+        Args:
+            output_path (Path): Output file.
+            static_fields (Tuple[str, ...]): Dotted names of the static fields
+                of the records (see parse_field), for writers with a schema.
+            compression (str): One of COMPRESSIONS, or "" to write the
+                records uncompressed (see CompressedFile).
+        """
+        self.output_path = output_path
+        self.static_fields = static_fields
+        self.compression = compression
+        # opened by __enter__
+        self.fp: OutputFile
+        # files that cannot be replaced (e.g. /dev/stdout) are written directly
+        self.temporary_path = (
+            output_path
+            if output_path.exists() and not output_path.is_file()
+            else output_path.with_name(output_path.name + ".tmp")
+        )
+
+    def __enter__(self) -> "RecordWriter":
+        if self.compression:
+            self.fp = CompressedFile(self.temporary_path, self.compression)
+        else:
+            self.fp = self.temporary_path.open(mode="wb", buffering=BUFFER_SIZE)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        succeeded = False
+        try:
+            try:
+                # an incomplete output is not closed (e.g. with "]")
+                if exc[0] is None:
+                    self.close()
+            finally:
+                self.fp.close()
+            succeeded = exc[0] is None
+        finally:
+            if self.temporary_path != self.output_path:
+                if succeeded:
+                    os.replace(self.temporary_path, self.output_path)
+                else:
+                    self.temporary_path.unlink(missing_ok=True)
+
+    @abstractmethod
+    def write(self, records: List[dict]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class NdjsonWriter(RecordWriter):
+    """Writes one compact JSON document per line."""
+
+    suffix = ".ndjson"
+
+    def write(self, records: List[dict]) -> None:
+        self.fp.writelines(
+            orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE) for record in records
+        )
+
+
+class JsonArrayWriter(RecordWriter):
+    """Writes a single indented JSON array, byte-identical to dumping the full list."""
+
+    suffix = ".json"
+
+    def __init__(
+        self,
+        output_path: Path,
+        static_fields: Tuple[str, ...] = (),
+        compression: str = "",
+    ) -> None:
+        super().__init__(output_path, static_fields, compression)
+        self.is_empty = True
+
+    def write(self, records: List[dict]) -> None:
+        if not records:
+            return
+
+        # strip the enclosing "[\n" and "\n]" to join chunks into one array
+        body = orjson.dumps(records, option=orjson.OPT_INDENT_2)[2:-2]
+        self.fp.write(b"[\n" if self.is_empty else b",\n")
+        self.fp.write(body)
+        self.is_empty = False
+
+    def close(self) -> None:
+        self.fp.write(b"[]" if self.is_empty else b"\n]")
+
+
+def get_path(record: dict, path: Tuple[str, ...]) -> Any:
+    """Get a nested value of a record, or None if it is missing."""
+    value: Any = record
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def column(name: str, type_name: str, *path: str) -> Tuple[str, str, Callable]:
+    keys = tuple(path)
+    return name, type_name, lambda record: get_path(record, keys)
+
+
+def flag_column(name: str, flag: str, *path: str) -> Tuple[str, str, Callable]:
+    keys = tuple(path)
+
+    def get(record: dict) -> Optional[bool]:
+        flags = get_path(record, keys)
+        return None if flags is None else flag in flags
+
+    return name, "bool", get
+
+
+# Columns of standard records: (name, type, getter)
+STANDARD_COLUMNS = (
+    column("record_number", "int64", "header", "record_number"),
+    column("sequence", "int32", "header", "sequence"),
+    column("flags", "string", "header", "flags"),
+    flag_column("allocated", "ALLOCATED", "header", "flags"),
+    flag_column("directory", "INDEX_PRESENT", "header", "flags"),
+    column("hard_link_count", "int32", "header", "hard_link_count"),
+    column("base_record_number", "int64", "header", "base_reference", "entry"),
+    column("base_sequence", "int32", "header", "base_reference", "sequence"),
+    column("used_entry_size", "int64", "header", "used_entry_size"),
+    column("total_entry_size", "int64", "header", "total_entry_size"),
+    column("valid_fixup", "bool", "valid_fixup"),
+    column("path", "string", "attributes", "FileName", "data", "path"),
+    column("name", "string", "attributes", "FileName", "data", "name"),
+    column("namespace", "string", "attributes", "FileName", "data", "namespace"),
+    column(
+        "parent_record_number",
+        "int64",
+        "attributes",
+        "FileName",
+        "data",
+        "parent",
+        "entry",
+    ),
+    column(
+        "parent_sequence",
+        "int32",
+        "attributes",
+        "FileName",
+        "data",
+        "parent",
+        "sequence",
+    ),
+    column("logical_size", "int64", "attributes", "FileName", "data", "logical_size"),
+    column("physical_size", "int64", "attributes", "FileName", "data", "physical_size"),
+    *(
+        column(
+            f"si_{field}",
+            "timestamp",
+            "attributes",
+            "StandardInformation",
+            "data",
+            field,
+        )
+        for field in ("created", "modified", "mft_modified", "accessed")
+    ),
+    column(
+        "si_file_flags",
+        "string",
+        "attributes",
+        "StandardInformation",
+        "data",
+        "file_flags",
+    ),
+    column("usn", "int64", "attributes", "StandardInformation", "data", "usn"),
+    column(
+        "security_id",
+        "int64",
+        "attributes",
+        "StandardInformation",
+        "data",
+        "security_id",
+    ),
+    *(
+        column(f"fn_{field}", "timestamp", "attributes", "FileName", "data", field)
+        for field in ("created", "modified", "mft_modified", "accessed")
+    ),
+    column("fn_flags", "string", "attributes", "FileName", "data", "flags"),
+    (
+        "attribute_types",
+        "list<string>",
+        lambda record: list(record.get("attributes") or ()),
+    ),
+    column("tags", "list<string>", "tags"),
+)
+
+# Columns of timeline records
+TIMELINE_COLUMNS = (
+    column("timestamp", "timestamp", "@timestamp"),
+    column("action", "string", "event", "action"),
+    column("record_number", "int64", "windows", "mft", "record", "number"),
+    column("name", "string", "windows", "mft", "record", "name"),
+    column("path", "string", "windows", "mft", "record", "path"),
+    column("sequence", "int32", "windows", "mft", "header", "sequence"),
+    column("flags", "string", "windows", "mft", "header", "flags"),
+    flag_column("allocated", "ALLOCATED", "windows", "mft", "header", "flags"),
+    flag_column("directory", "INDEX_PRESENT", "windows", "mft", "header", "flags"),
+    column("attribute_type", "string", "windows", "mft", "attribute", "type"),
+    column("macb_type", "string", "windows", "mft", "attribute", "macb_type"),
+    column("file_flags", "string", "windows", "mft", "attribute", "data", "file_flags"),
+    column("fn_flags", "string", "windows", "mft", "attribute", "data", "flags"),
+    column(
+        "logical_size", "int64", "windows", "mft", "attribute", "data", "logical_size"
+    ),
+    column(
+        "parent_record_number",
+        "int64",
+        "windows",
+        "mft",
+        "attribute",
+        "data",
+        "parent",
+        "entry",
+    ),
+    column("mft_path", "string", "log", "file", "path"),
+    column("tags", "list<string>", "tags"),
+)
+
+
+def get_arrow_type(type_name: str) -> "pa.DataType":
+    if type_name == "timestamp":
+        # MFT times go back to 1601, out of the range of nanoseconds
+        return pa.timestamp("us", tz="UTC")
+    if type_name == "list<string>":
+        return pa.list_(pa.string())
+    return pa.type_for_alias(type_name)
+
+
+def to_timestamps(values: List[Optional[str]]) -> "pa.Array":
+    """Convert record timestamps (e.g. "2024-01-31T12:00:00.1234567Z") to
+    a timestamp array, keeping microseconds."""
+    strings = pc.replace_substring_regex(
+        pa.array(values, pa.string()), r"(\.\d{6})\d+Z$", r"\1Z"
+    )
+    return strings.cast(get_arrow_type("timestamp"))
+
+
+class ParquetWriter(RecordWriter):
+    """Writes records as a Parquet file with a fixed, flattened schema.
+
+    Standard and timeline records have their own columns (STANDARD_COLUMNS,
+    TIMELINE_COLUMNS, chosen from the first record), followed by a string
+    column for each static field. Missing values are null. Records are
+    buffered into row groups of ROW_GROUP_SIZE records, each written
+    (compressed) as soon as it is full. Requires pyarrow.
+    """
+
+    suffix = ".parquet"
+
+    def __init__(
+        self,
+        output_path: Path,
+        static_fields: Tuple[str, ...] = (),
+        compression: str = "",
+    ) -> None:
+        if pa is None:
+            raise ImportError(
+                "the parquet format requires pyarrow (pip install mft2es[parquet])"
+            )
+        if compression:
+            raise ValueError("parquet files are already compressed (by row group)")
+        super().__init__(output_path, static_fields, compression)
+        self.columns: Tuple[Tuple[str, str, Callable], ...] = ()
+        self.schema: "pa.Schema" = None
+        self.writer: "pq.ParquetWriter" = None
+        self.batches: List["pa.RecordBatch"] = list()
+        self.buffered = 0
+
+    def open(self, record: dict) -> None:
+        """Choose the columns from the first record and start the file."""
+        columns = TIMELINE_COLUMNS if "windows" in record else STANDARD_COLUMNS
+        self.columns = columns + tuple(
+            column(name, "string", *name.split(".")) for name in self.static_fields
+        )
+        self.schema = pa.schema(
+            [(name, get_arrow_type(type_name)) for name, type_name, _ in self.columns]
+        )
+        self.writer = pq.ParquetWriter(
+            self.fp, self.schema, compression=PARQUET_COMPRESSION
+        )
+
+    def to_batch(self, records: List[dict]) -> "pa.RecordBatch":
+        arrays = list()
+        for _, type_name, get in self.columns:
+            values = [get(record) for record in records]
+            if type_name == "timestamp":
+                arrays.append(to_timestamps(values))
+            else:
+                arrays.append(pa.array(values, get_arrow_type(type_name)))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def flush(self, final: bool = False) -> None:
+        """Write the full row groups buffered (and the rest, if final)."""
+        table = pa.Table.from_batches(self.batches, self.schema)
+        size = (
+            table.num_rows
+            if final
+            else table.num_rows // ROW_GROUP_SIZE * ROW_GROUP_SIZE
+        )
+        if size:
+            self.writer.write_table(table.slice(0, size), row_group_size=ROW_GROUP_SIZE)
+        rest = table.slice(size)
+        self.batches, self.buffered = rest.to_batches(), rest.num_rows
+
+    def write(self, records: List[dict]) -> None:
+        if not records:
+            return
+        if self.writer is None:
+            self.open(records[0])
+        self.batches.append(self.to_batch(records))
+        self.buffered += len(records)
+        if ROW_GROUP_SIZE <= self.buffered:
+            self.flush()
+
+    def close(self) -> None:
+        if self.writer is None:
+            # no records: an empty file with the standard columns
+            self.open({})
+        self.flush(final=True)
+        self.writer.close()
+
+
+WRITERS = {
+    "ndjson": NdjsonWriter,
+    "json": JsonArrayWriter,
+    "parquet": ParquetWriter,
+}
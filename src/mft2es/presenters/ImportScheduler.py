@@ -0,0 +1,225 @@
+# coding: utf-8
+import time
+from contextlib import nullcontext
+from multiprocessing.pool import Pool, ThreadPool
+from pathlib import Path
+from typing import Callable, ContextManager, List, Optional, Tuple
+
+from tqdm import tqdm
+
+from mft2es.models.Mft2es import SafeMultiprocessingMixin, set_worker_profiling
+from mft2es.models.AutoTuner import AutoTuner
+from mft2es.models.DeadLetterQueue import DeadLetterQueue
+from mft2es.models.ElasticsearchUtils import ElasticsearchUtils
+from mft2es.models.ImportStats import ImportStats, profile_thread
+from mft2es.presenters.Mft2esPresenter import Mft2esPresenter
+
+
+def order_by_size(mft_files: List[Path]) -> List[Path]:
+    """Order MFT files from the largest to the smallest.
+
+    Starting the large files first lets the small ones fill in the remaining
+    slots, so no single large file is left running alone at the end.
+
+    Args:
+        mft_files (List[Path]): MFT files.
+
+    Returns:
+        List[Path]: MFT files, largest first.
+    """
+    return sorted(mft_files, key=lambda path: path.stat().st_size, reverse=True)
+
+
+class ImportScheduler(SafeMultiprocessingMixin):
+    """Imports several MFT files at the same time.
+
+    Every file shares one Elasticsearch client (and its connection pool) and,
+    with multiprocess, one process pool, instead of creating them per file.
+    With auto_size, one AutoTuner adjusts the sizes of every file, and stats
+    collects the metrics of every file. With profile_directory, each file is
+    profiled on the thread importing it (import-<n>.prof, n following the
+    import order) and each worker process on its own (worker-<pid>.prof).
+    Unless quiet, a progress bar counts the documents of every file as each
+    chunk is parsed. Keyword arguments not listed below are passed to each
+    Mft2esPresenter.
+    """
+
+    def __init__(
+        self,
+        mft_files: List[Path],
+        jobs: int = 1,
+        host: str = "localhost",
+        port: int = 9200,
+        scheme: str = "http",
+        login: str = "",
+        pwd: str = "",
+        id_strategy: str = "key",
+        max_retries: int = 5,
+        dead_letter: str = "",
+        multiprocess: bool = False,
+        thread_count: int = 0,
+        auto_size: bool = False,
+        max_memory: int = 1024,
+        stats: Optional[ImportStats] = None,
+        profile_directory: str = "",
+        is_quiet: bool = False,
+        logger: Optional[Callable] = None,
+        **options,
+    ) -> None:
+        self.mft_files = mft_files
+        self.jobs = max(jobs, 1)
+        self.host = host
+        self.port = port
+        self.scheme = scheme
+        self.login = login
+        self.pwd = pwd
+        self.id_strategy = id_strategy
+        self.max_retries = max_retries
+        self.dead_letter = dead_letter
+        self.multiprocess = multiprocess
+        self.thread_count = thread_count
+        self.auto_size = auto_size
+        self.max_memory = max_memory
+        self.stats = stats
+        self.profile_directory = profile_directory
+        self.is_quiet = is_quiet
+        self.logger = logger
+        self.options = options
+        self.progress: Optional[tqdm] = None
+
+    def log(self, message: str, is_quiet: Optional[bool] = None) -> None:
+        if is_quiet is None:
+            is_quiet = self.is_quiet
+        if self.progress is not None and not self.progress.disable:
+            # printed above the progress bar
+            if self.logger and not is_quiet:
+                self.progress.write(message)
+        elif self.logger:
+            self.logger(message, is_quiet)
+
+    def observe_records(self, count: int) -> None:
+        if self.progress is not None:
+            self.progress.update(count)
+
+    def import_file(
+        self,
+        mft_file: Path,
+        es: ElasticsearchUtils,
+        pool: Optional[Pool],
+        tuner: Optional[AutoTuner],
+        number: int = 0,
+    ) -> Tuple[int, int]:
+        """Import a single MFT file with the shared client and pool.
+
+        Args:
+            mft_file (Path): MFT file.
+            es (ElasticsearchUtils): Shared Elasticsearch client.
+            pool (Pool): Shared process pool, or None.
+            tuner (AutoTuner): Shared tuner, or None.
+            number (int): Position of the file in the import order.
+
+        Returns:
+            Tuple[int, int]: Number of indexed and failed documents.
+        """
+        self.log(f"Currently Importing {mft_file}.")
+        profile: ContextManager = nullcontext()
+        if self.profile_directory:
+            path = Path(self.profile_directory) / f"import-{number}.prof"
+            self.log(f"Profiling {mft_file} into {path}")
+            profile = profile_thread(path)
+        start = time.perf_counter()
+        with profile:
+            success, failed = Mft2esPresenter(
+                input_path=mft_file,
+                host=self.host,
+                port=self.port,
+                scheme=self.scheme,
+                login=self.login,
+                pwd=self.pwd,
+                id_strategy=self.id_strategy,
+                multiprocess=self.multiprocess,
+                thread_count=self.thread_count,
+                is_quiet=self.is_quiet,
+                logger=self.log if self.logger else None,
+                es=es,
+                pool=pool,
+                tuner=tuner,
+                stats=self.stats,
+                on_records=self.observe_records,
+                **self.options,
+            ).bulk_import()
+        elapsed = time.perf_counter() - start
+        self.log(
+            f"Imported {mft_file}: {success} documents in {elapsed:.1f}s "
+            f"({success / elapsed if elapsed else 0:.0f} docs/s)"
+        )
+        return success, failed
+
+    def run(self) -> Tuple[int, int]:
+        """Import every MFT file, running up to jobs files at the same time.
+
+        Returns:
+            Tuple[int, int]: Total number of indexed and failed documents.
+        """
+        tuner = None
+        if self.auto_size:
+            tuner = AutoTuner(
+                chunk_size=self.options.get("chunk_size", 500),
+                worker_batch=self.options.get("worker_batch", 1),
+                bulk_size=self.options.get("bulk_size", 500),
+                max_memory=self.max_memory * 1024 * 1024,
+            )
+
+        # every file may send from max(thread_count, 1) threads at once
+        es = ElasticsearchUtils(
+            hostname=self.host,
+            port=self.port,
+            scheme=self.scheme,
+            login=self.login,
+            pwd=self.pwd,
+            id_strategy=self.id_strategy,
+            connections=max(10, self.jobs * max(self.thread_count, 1)),
+            max_retries=self.max_retries,
+            dead_letter=DeadLetterQueue(self.dead_letter) if self.dead_letter else None,
+            on_request=tuner.observe_request if tuner else None,
+            stats=self.stats,
+        )
+
+        mft_files = self.mft_files
+        if 1 < self.jobs:
+            mft_files = order_by_size(mft_files)
+
+        if self.profile_directory:
+            Path(self.profile_directory).mkdir(parents=True, exist_ok=True)
+            set_worker_profiling(self.profile_directory)
+
+        start = time.perf_counter()
+        total_success, total_failed = 0, 0
+        self.progress = tqdm(unit="docs", disable=self.is_quiet)
+        try:
+            with self.open_pool() if self.multiprocess else nullcontext() as pool:
+                with ThreadPool(self.jobs) as threads:
+                    # each thread takes the next file as soon as its file is done
+                    for success, failed in threads.imap_unordered(
+                        lambda item: self.import_file(
+                            item[1], es, pool, tuner, item[0]
+                        ),
+                        enumerate(mft_files),
+                    ):
+                        total_success += success
+                        total_failed += failed
+        finally:
+            self.progress.close()
+            self.progress = None
+            if self.profile_directory:
+                # the workers write their profiles as the pool shuts down
+                set_worker_profiling(None)
+
+        elapsed = time.perf_counter() - start
+        self.log(
+            f"Imported {len(mft_files)} files: {total_success} documents in "
+            f"{elapsed:.1f}s ({total_success / elapsed if elapsed else 0:.0f} docs/s)"
+        )
+        if self.stats:
+            self.stats.finish()
+        return total_success, total_failed
@@ -1,13 +1,29 @@
 # coding: utf-8
 import traceback
-from typing import List
+from collections import deque
+from functools import partial
+from multiprocessing.pool import Pool, ThreadPool
+from typing import Callable, List, Optional, Tuple
 from pathlib import Path
 
 import orjson
 from tqdm import tqdm
 
-from mft2es.models.Mft2es import Mft2es
-from mft2es.models.ElasticsearchUtils import ElasticsearchUtils
+from mft2es.models.Mft2es import (
+    Mft2es,
+    get_next_record_number,
+    parse_tags,
+    serialize_with_next_record,
+)
+from mft2es.models.AutoTuner import AutoTuner
+from mft2es.models.CheckpointJournal import CheckpointJournal
+from mft2es.models.DeadLetterQueue import DeadLetterQueue
+from mft2es.models.FieldProjection import FieldProjection
+from mft2es.models.FingerprintStore import FingerprintStore, calc_settings
+from mft2es.models.ElasticsearchUtils import ElasticsearchUtils, build_bulk_body
+from mft2es.models.ImportStats import ImportStats
+from mft2es.models.IterUtils import Size, imap_bounded
+from mft2es.models.RecordFilter import RecordFilter
 
 
 class Mft2esPresenter(object):
@@ -28,7 +44,40 @@ class Mft2esPresenter(object):
         logger=None,
         timeline_mode: bool = False,
         tags: str = "",
+        single_pass: bool = False,
+        sharded: bool = False,
+        thread_count: int = 0,
+        bulk_size: int = 500,
+        bulk_bytes: int = 100 * 1024 * 1024,
+        queue_size: int = 4,
+        id_strategy: str = "key",
+        raw_bulk: bool = False,
+        fields: Tuple[Tuple[str, str], ...] = (),
+        es: Optional[ElasticsearchUtils] = None,
+        pool: Optional[Pool] = None,
+        checkpoint: str = "",
+        resume: bool = False,
+        max_retries: int = 5,
+        dead_letter: str = "",
+        worker_batch: int = 1,
+        auto_size: bool = False,
+        max_memory: int = 1024,
+        tuner: Optional[AutoTuner] = None,
+        stats: Optional[ImportStats] = None,
+        filters: Tuple[Tuple[str, str], ...] = (),
+        projection: str = "full",
+        exclude_fields: Tuple[str, ...] = (),
+        delta: str = "",
+        tag_changes: bool = False,
+        on_records: Optional[Callable[[int], None]] = None,
     ):
+        if resume and single_pass:
+            # single-pass output is not ordered by record number
+            raise ValueError("resume cannot be combined with single_pass")
+        if delta and (single_pass or sharded):
+            # entries are compared on the csv rows of the second parser
+            raise ValueError("delta cannot be combined with single_pass or sharded")
+
         self.input_path = input_path
         self.host = host
         self.port = port
@@ -39,13 +88,67 @@ class Mft2esPresenter(object):
         self.pwd = pwd
         self.is_quiet = is_quiet
         self.multiprocess = multiprocess
-        self.chunk_size = chunk_size
+        self.chunk_size: Size = chunk_size
         self.logger = logger
         self.timeline_mode = timeline_mode
-        self.tags = tags
+        # parsed once here and shared by every record
+        self.tags = parse_tags(tags)
+        self.fields = tuple(fields)
+        self.single_pass = single_pass
+        self.sharded = sharded
+        self.thread_count = thread_count
+        self.bulk_size: Size = bulk_size
+        self.bulk_bytes = bulk_bytes
+        self.queue_size = queue_size
+        self.id_strategy = id_strategy
+        self.raw_bulk = raw_bulk
+        # shared by every file when importing several files concurrently
+        self.es = es
+        self.pool = pool
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.max_retries = max_retries
+        self.dead_letter = dead_letter
+        self.worker_batch: Size = worker_batch
+        # with auto_size the sizes are read from the tuner as it adjusts them
+        if tuner is None and auto_size:
+            tuner = AutoTuner(
+                chunk_size, worker_batch, bulk_size, max_memory * 1024 * 1024
+            )
+        self.tuner = tuner
+        if tuner:
+            self.chunk_size = tuner.get_chunk_size
+            self.worker_batch = tuner.get_worker_batch
+            self.bulk_size = tuner.get_bulk_size
+        # shared by every file, like the client, when importing several files
+        self.stats = stats
+        self.filters = tuple(filters)
+        # None without filters, so nothing is matched at all
+        self.record_filter = RecordFilter.from_terms(filters)
+        # None with the full profile, so records are not copied
+        self.projection = FieldProjection.from_options(projection, exclude_fields)
+        # fingerprint store of the volume, loaded by bulk_import
+        self.delta = delta
+        self.tag_changes = tag_changes
+        self.fingerprints: FingerprintStore = None
+        # called with the number of documents of each chunk, as the parser
+        # produces them (e.g. to report progress)
+        self.on_records = on_records
 
-    def mft2es(self):
-        mft2es = Mft2es(self.input_path)
+    def observe_records(self, count: int) -> None:
+        """Report documents produced by the parser to the tuner, the stats and
+        on_records."""
+        if self.on_records:
+            self.on_records(count)
+        if self.tuner:
+            self.tuner.observe_records(count)
+        if self.stats:
+            self.stats.add_documents(count)
+
+    def mft2es(self, serializer: Callable = None, start_record: int = 0):
+        mft2es = Mft2es(
+            self.input_path, single_pass=self.single_pass, sharded=self.sharded
+        )
 
         # Timeline mode uses specialized record generation
         for records in mft2es.gen_timeline_records(
@@ -53,35 +156,199 @@ class Mft2esPresenter(object):
             chunk_size=self.chunk_size,
             timeline_mode=self.timeline_mode,
             tags=self.tags,
+            fields=self.fields,
+            serializer=serializer,
+            pool=self.pool,
+            start_record=start_record,
+            worker_batch=self.worker_batch,
+            stats=self.stats,
+            record_filter=self.record_filter,
+            projection=self.projection,
+            delta=self.fingerprints,
+            tag_changes=self.tag_changes,
         ):
             yield records
 
-    def bulk_import(self):
-        es = ElasticsearchUtils(
+    def bulk_import(self) -> Tuple[int, int]:
+        es = self.es or ElasticsearchUtils(
             hostname=self.host,
             port=self.port,
             scheme=self.scheme,
             login=self.login,
             pwd=self.pwd,
+            id_strategy=self.id_strategy,
+            max_retries=self.max_retries,
+            dead_letter=DeadLetterQueue(self.dead_letter) if self.dead_letter else None,
+            on_request=self.tuner.observe_request if self.tuner else None,
+            stats=self.stats,
+        )
+        source = str(Path(self.input_path).resolve())
+        # documents built otherwise than the stored ones are all sent again,
+        # by delta imports and resumed imports alike
+        settings = calc_settings(
+            index=self.index,
+            pipeline=self.pipeline,
+            timeline_mode=self.timeline_mode,
+            tags=self.tags,
+            fields=self.fields,
+            filters=self.filters,
+            projection=(
+                [self.projection.include, self.projection.exclude]
+                if self.projection
+                else None
+            ),
+            id_strategy=self.id_strategy,
+            tag_changes=self.tag_changes,
         )
 
+        if self.delta:
+            self.fingerprints = FingerprintStore(self.delta)
+            if not self.fingerprints.load(settings) and self.logger:
+                self.logger(
+                    f"No fingerprints in {self.delta}, every entry is new",
+                    self.is_quiet,
+                )
+
         # Buffer for collecting results
         total_success = 0
         total_failed = []
         batch_count = 0
 
-        for records in self.mft2es():
+        # The journal records, as chunks are acknowledged, the record number
+        # below which every record has been indexed. It stops advancing at
+        # the first failure, so a resumed import retries from there.
+        journal = CheckpointJournal(self.checkpoint) if self.checkpoint else None
+        start_record = 0
+        if journal and self.resume:
+            start_record = journal.load(source, self.index, settings)
+            if start_record and self.logger:
+                self.logger(f"Resuming from record {start_record}", self.is_quiet)
+        elif journal:
+            journal.commit(source, self.index, 0, settings)
+        acknowledged = True
+
+        def commit(next_record: int = None, failed: bool = False) -> None:
+            nonlocal acknowledged
+            # documents kept in the dead-letter queue can be replayed later
+            acknowledged = acknowledged and not (failed and not es.dead_letter)
+            if journal and acknowledged and next_record is not None:
+                journal.commit(source, self.index, next_record, settings)
+
+        if self.raw_bulk:
+            # _bulk bodies are serialized with the records (on the worker
+            # processes with -m) and sent as they are.
+            serializer = partial(
+                serialize_with_next_record,
+                partial(
+                    build_bulk_body,
+                    index_name=self.index,
+                    pipeline=self.pipeline,
+                    id_strategy=self.id_strategy,
+                    source=source,
+                ),
+            )
+            thread_count = max(self.thread_count, 1)
+            next_records: deque = deque()
+
+            def gen_bodies():
+                for body, next_record in self.mft2es(serializer, start_record):
+                    next_records.append(next_record)
+                    self.observe_records(body.count(b"\n") // 2)
+                    yield (body, self.bulk_size, self.bulk_bytes)
+
             try:
-                success, failed = es.bulk_indice(records, self.index, self.pipeline)
-                total_success += success
+                with ThreadPool(thread_count) as pool:
+                    for success, failed in imap_bounded(
+                        pool,
+                        es.bulk_body_indice,
+                        gen_bodies(),
+                        thread_count + self.queue_size,
+                        (
+                            partial(self.stats.observe_depth, "bulk")
+                            if self.stats
+                            else None
+                        ),
+                    ):
+                        total_success += success
+                        total_failed.extend(failed)
+                        batch_count += 1
+                        commit(next_records.popleft(), bool(failed))
+            except Exception:
+                commit(failed=True)
+                if self.logger:
+                    self.logger("Error occurred during bulk indexing", self.is_quiet)
+                traceback.print_exc()
+        elif 0 < self.thread_count:
+            # Parsing and indexing run concurrently; parallel_bulk pulls
+            # records from the parser only as fast as the threads send them.
+            # (number of documents up to the end of a chunk, next record)
+            boundaries: deque = deque()
+            sent, acked = 0, 0
+
+            def gen_records():
+                nonlocal batch_count, sent
+                for records in self.mft2es(start_record=start_record):
+                    batch_count += 1
+                    sent += len(records)
+                    boundaries.append((sent, get_next_record_number(records)))
+                    self.observe_records(len(records))
+                    yield from records
+
+            def on_ack(count: int, failed: bool) -> None:
+                nonlocal acked
+                acked += count
                 if failed:
-                    total_failed.extend(failed)
-                batch_count += 1
+                    commit(failed=True)
+                while boundaries and boundaries[0][0] <= acked:
+                    commit(boundaries.popleft()[1])
 
+            try:
+                total_success, total_failed = es.parallel_bulk_indice(
+                    gen_records(),
+                    self.index,
+                    self.pipeline,
+                    thread_count=self.thread_count,
+                    bulk_size=self.bulk_size,
+                    bulk_bytes=self.bulk_bytes,
+                    queue_size=self.queue_size,
+                    source=source,
+                    callback=on_ack,
+                )
             except Exception:
+                commit(failed=True)
                 if self.logger:
                     self.logger("Error occurred during bulk indexing", self.is_quiet)
                 traceback.print_exc()
+        else:
+            for records in self.mft2es(start_record=start_record):
+                self.observe_records(len(records))
+                try:
+                    success, failed = es.bulk_indice(
+                        records,
+                        self.index,
+                        self.pipeline,
+                        source,
+                        self.bulk_size,
+                        self.bulk_bytes,
+                    )
+                    total_success += success
+                    if failed:
+                        total_failed.extend(failed)
+                    batch_count += 1
+                    commit(get_next_record_number(records), bool(failed))
+
+                except Exception:
+                    commit(failed=True)
+                    if self.logger:
+                        self.logger(
+                            "Error occurred during bulk indexing", self.is_quiet
+                        )
+                    traceback.print_exc()
+
+        # The store only moves forward after an import without lost
+        # documents, so the changes of a failed one are sent again.
+        if self.fingerprints and acknowledged:
+            self.fingerprints.save()
 
         # Log summary results after tqdm completes
         if self.logger:
@@ -91,9 +358,30 @@ class Mft2esPresenter(object):
             self.logger(
                 f"Successfully indexed: {total_success} documents", self.is_quiet
             )
+            if self.fingerprints:
+                counts = self.fingerprints.counts
+                self.logger(
+                    f"Delta: {counts['new']} new, {counts['changed']} changed, "
+                    f"{counts['deleted']} deleted, {counts['unchanged']} unchanged"
+                    + ("" if acknowledged else f" ({self.delta} not updated)"),
+                    self.is_quiet,
+                )
+            if self.tuner:
+                self.logger(
+                    f"Auto sizing: chunk size {self.tuner.chunk_size}, worker batch "
+                    f"{self.tuner.worker_batch}, bulk size {self.tuner.bulk_size}",
+                    self.is_quiet,
+                )
             if total_failed:
                 self.logger(
                     f"Failed to index: {len(total_failed)} documents", self.is_quiet
                 )
                 for failure in total_failed[:3]:  # Show first 3 failures
                     self.logger(f"Error: {failure}", self.is_quiet)
+                if es.dead_letter:
+                    self.logger(
+                        f"Failed documents written to: {es.dead_letter.path}",
+                        self.is_quiet,
+                    )
+
+        return total_success, len(total_failed)
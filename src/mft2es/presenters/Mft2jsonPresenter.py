@@ -1,12 +1,17 @@
 # coding: utf-8
-from itertools import chain
 from pathlib import Path
-from typing import List
+from typing import Optional, Tuple
 
-import orjson
 from tqdm import tqdm
 
-from mft2es.models.Mft2es import Mft2es
+from mft2es.models.FieldProjection import FieldProjection
+from mft2es.models.Mft2es import Mft2es, parse_tags
+from mft2es.models.RecordFilter import RecordFilter
+from mft2es.models.RecordWriter import (
+    COMPRESSION_SUFFIXES,
+    WRITERS,
+    get_compression,
+)
 
 
 class Mft2jsonPresenter(object):
@@ -20,21 +25,41 @@ class Mft2jsonPresenter(object):
         chunk_size: int = 500,
         timeline_mode: bool = False,
         tags: str = "",
+        single_pass: bool = False,
+        sharded: bool = False,
+        output_format: str = "ndjson",
+        fields: Tuple[Tuple[str, str], ...] = (),
+        filters: Tuple[Tuple[str, str], ...] = (),
+        projection: str = "full",
+        exclude_fields: Tuple[str, ...] = (),
+        compress: Optional[str] = None,
     ):
         self.input_path = Path(input_path).resolve()
-        self.output_path: Path = (
-            Path(output_path)
-            if output_path
-            else Path(self.input_path).with_suffix(".json")
-        )
+        self.writer = WRITERS[output_format]
+        if output_path:
+            self.output_path = Path(output_path)
+            self.compression = get_compression(self.output_path, compress)
+        else:
+            self.compression = get_compression(Path(), compress)
+            suffix = self.writer.suffix + next(
+                (s for s, c in COMPRESSION_SUFFIXES.items() if c == self.compression),
+                "",
+            )
+            self.output_path = Path(self.input_path).with_suffix(suffix)
         self.is_quiet = is_quiet
         self.multiprocess = multiprocess
         self.chunk_size = chunk_size
         self.timeline_mode = timeline_mode
-        self.tags = tags
+        # parsed once here and shared by every record
+        self.tags = parse_tags(tags)
+        self.fields = tuple(fields)
+        self.single_pass = single_pass
+        self.sharded = sharded
+        self.record_filter = RecordFilter.from_terms(filters)
+        self.projection = FieldProjection.from_options(projection, exclude_fields)
 
     def export_json(self) -> None:
-        r = Mft2es(self.input_path)
+        r = Mft2es(self.input_path, single_pass=self.single_pass, sharded=self.sharded)
 
         # Use unified generation function with timeline mode parameter
         generator = (
@@ -43,6 +68,9 @@ class Mft2jsonPresenter(object):
                 chunk_size=self.chunk_size,
                 timeline_mode=self.timeline_mode,
                 tags=self.tags,
+                fields=self.fields,
+                record_filter=self.record_filter,
+                projection=self.projection,
             )
             if self.is_quiet
             else tqdm(
@@ -51,12 +79,14 @@ class Mft2jsonPresenter(object):
                     chunk_size=self.chunk_size,
                     timeline_mode=self.timeline_mode,
                     tags=self.tags,
+                    fields=self.fields,
+                    record_filter=self.record_filter,
+                    projection=self.projection,
                 )
             )
         )
 
-        self.output_path.write_text(
-            orjson.dumps(
-                list(chain.from_iterable(generator)), option=orjson.OPT_INDENT_2
-            ).decode("utf-8")
-        )
+        static_fields = tuple(name for name, _ in self.fields)
+        with self.writer(self.output_path, static_fields, self.compression) as writer:
+            for records in generator:
+                writer.write(records)
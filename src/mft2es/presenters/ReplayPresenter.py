@@ -0,0 +1,73 @@
+# coding: utf-8
+from pathlib import Path
+from typing import Tuple
+
+from mft2es.models.DeadLetterQueue import DeadLetterQueue
+from mft2es.models.ElasticsearchUtils import ElasticsearchUtils, batch_operations
+
+
+class ReplayPresenter(object):
+    """Sends the documents of a dead-letter queue to Elasticsearch again."""
+
+    def __init__(
+        self,
+        input_path: Path,
+        host: str = "localhost",
+        port: int = 9200,
+        scheme: str = "http",
+        login: str = "",
+        pwd: str = "",
+        is_quiet: bool = False,
+        logger=None,
+        bulk_size: int = 500,
+        bulk_bytes: int = 100 * 1024 * 1024,
+        max_retries: int = 5,
+        dead_letter: str = "",
+    ):
+        if dead_letter and Path(dead_letter).resolve() == Path(input_path).resolve():
+            # the queue would be appended to while it is being read
+            raise ValueError("dead_letter must differ from the replayed file")
+
+        self.input_path = input_path
+        self.host = host
+        self.port = port
+        self.scheme = scheme
+        self.login = login
+        self.pwd = pwd
+        self.is_quiet = is_quiet
+        self.logger = logger
+        self.bulk_size = bulk_size
+        self.bulk_bytes = bulk_bytes
+        self.max_retries = max_retries
+        self.dead_letter = dead_letter
+
+    def replay(self) -> Tuple[int, int]:
+        es = ElasticsearchUtils(
+            hostname=self.host,
+            port=self.port,
+            scheme=self.scheme,
+            login=self.login,
+            pwd=self.pwd,
+            max_retries=self.max_retries,
+            dead_letter=DeadLetterQueue(self.dead_letter) if self.dead_letter else None,
+        )
+
+        total_success, total_failed = 0, []
+        operations = DeadLetterQueue(self.input_path).read()
+        for batch in batch_operations(operations, self.bulk_size, self.bulk_bytes):
+            success, failed = es.send_operations(batch)
+            total_success += success
+            total_failed.extend(failed)
+
+        if self.logger:
+            self.logger(
+                f"Successfully indexed: {total_success} documents", self.is_quiet
+            )
+            if total_failed:
+                self.logger(
+                    f"Failed to index: {len(total_failed)} documents", self.is_quiet
+                )
+                for failure in total_failed[:3]:  # Show first 3 failures
+                    self.logger(f"Error: {failure}", self.is_quiet)
+
+        return total_success, len(total_failed)
@@ -6,10 +6,14 @@ from mft2es.models.MetaData import get_version
 
 
 class BaseView(metaclass=ABCMeta):
+    # whether the view parses MFT files (and takes the parsing options)
+    parses_mft = True
 
     def __init__(self):
         self.parser = argparse.ArgumentParser()
         self.__define_common_options()
+        if self.parses_mft:
+            self.__define_parsing_options()
 
     def __define_common_options(self):
         self.parser.add_argument(
@@ -21,6 +25,8 @@ class BaseView(metaclass=ABCMeta):
             action="store_true",
             help="flag to suppress standard output.",
         )
+
+    def __define_parsing_options(self):
         self.parser.add_argument(
             "--multiprocess",
             "-m",
@@ -34,6 +40,17 @@ class BaseView(metaclass=ABCMeta):
             default=500,
             help="size of the chunk to be processed for each process.",
         )
+        self.parser.add_argument(
+            "--single-pass",
+            action="store_true",
+            help="flag to parse the MFT once, rebuilding full paths from the records.",
+        )
+        self.parser.add_argument(
+            "--sharded",
+            action="store_true",
+            help="flag to parse disjoint record ranges one by one, "
+            "or on each process with --multiprocess.",
+        )
 
     @abstractmethod
     def define_options(self):
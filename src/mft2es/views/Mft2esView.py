@@ -3,8 +3,13 @@ from typing import List
 from pathlib import Path
 from multiprocessing import cpu_count
 
+from mft2es.models.Mft2es import parse_field
+from mft2es.models.ImportStats import ImportStats
+from mft2es.models.FieldProjection import FieldProjection, parse_field_names
+from mft2es.models.RecordFilter import parse_filter
 from mft2es.views.BaseView import BaseView
-from mft2es.presenters.Mft2esPresenter import Mft2esPresenter
+from mft2es.models.ElasticsearchUtils import ID_STRATEGIES
+from mft2es.presenters.ImportScheduler import ImportScheduler
 
 
 class Mft2esView(BaseView):
@@ -51,6 +56,180 @@ class Mft2esView(BaseView):
             default="",
             help="Comma-separated tags to add to each record (e.g., 'WORKSTATION-1,DOMAIN-ABC')",
         )
+        self.parser.add_argument(
+            "--add-field",
+            action="append",
+            type=parse_field,
+            default=[],
+            metavar="NAME=VALUE",
+            help="Static field to add to each record, can be repeated (e.g., "
+            "'host.name=WS1')",
+        )
+        self.parser.add_argument(
+            "--fields",
+            default="full",
+            metavar="PROFILE|NAMES",
+            help="Fields of each document: a profile (minimal, standard: without "
+            "attribute headers, resident data and entry layout, full) or "
+            "comma-separated dotted field names, '*' matching any one name (e.g., "
+            "'header.flags,attributes.FileName.data')",
+        )
+        self.parser.add_argument(
+            "--exclude-fields",
+            type=parse_field_names,
+            default=(),
+            metavar="NAMES",
+            help="Comma-separated dotted field names removed from each document "
+            "(e.g., 'attributes.*.header,attributes.DATA')",
+        )
+        self.parser.add_argument(
+            "--filter",
+            action="append",
+            type=parse_filter,
+            default=[],
+            metavar="KEY=VALUE",
+            help="Only import the entries matching every filter key, can be repeated: "
+            "path=GLOB, ext=EXT[,EXT...], state=allocated|deleted, "
+            "type=file|directory, since=TIME, until=TIME (e.g., 'ext=exe,dll' "
+            "'since=2024-01-01')",
+        )
+        self.parser.add_argument(
+            "--threads",
+            type=int,
+            default=0,
+            help="Number of threads sending bulk requests concurrently with parsing "
+            "(0: sequential)",
+        )
+        self.parser.add_argument(
+            "--bulk-size",
+            type=int,
+            default=500,
+            help="Maximum number of documents per bulk request",
+        )
+        self.parser.add_argument(
+            "--bulk-bytes",
+            type=int,
+            default=100 * 1024 * 1024,
+            help="Maximum size of a bulk request in bytes",
+        )
+        self.parser.add_argument(
+            "--worker-batch",
+            type=int,
+            default=1,
+            help="Number of chunks (of --size entries) processed by each worker task "
+            "(with -m or --sharded)",
+        )
+        self.parser.add_argument(
+            "--auto-size",
+            action="store_true",
+            help="Adjust --size, --worker-batch and --bulk-size while running from the "
+            "measured records/s, bulk request latency and memory use",
+        )
+        self.parser.add_argument(
+            "--max-memory",
+            type=int,
+            default=1024,
+            metavar="MIB",
+            help="Resident memory above which --auto-size reduces every size",
+        )
+        self.parser.add_argument(
+            "--queue-size",
+            type=int,
+            default=4,
+            help="Number of bulk requests queued between parser and threads (with "
+            "--threads)",
+        )
+        self.parser.add_argument(
+            "--id-strategy",
+            choices=ID_STRATEGIES,
+            default="key",
+            help="How document ids are derived: from MFT path, record number and "
+            "sequence (key), from the sha1 of the whole record (content), or by "
+            "Elasticsearch (none). With key, the resolved path of the MFT file is part "
+            "of the id, so importing the same file again from another location creates "
+            "duplicates",
+        )
+        self.parser.add_argument(
+            "--raw-bulk",
+            action="store_true",
+            help="Serialize bulk request bodies with the records (in the worker "
+            "processes with -m) and send them as they are",
+        )
+        self.parser.add_argument(
+            "--jobs",
+            "-j",
+            type=int,
+            default=1,
+            help="Number of MFT files imported at the same time, sharing one process "
+            "pool and one Elasticsearch connection pool (largest files first)",
+        )
+        self.parser.add_argument(
+            "--checkpoint",
+            default="",
+            metavar="FILE",
+            help="Journal file recording, for each MFT, the records acknowledged by "
+            "Elasticsearch",
+        )
+        self.parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip the records the --checkpoint journal records as already "
+            "imported",
+        )
+        self.parser.add_argument(
+            "--delta",
+            default="",
+            metavar="FILE",
+            help="Fingerprint store of the volume: only the entries that are new, "
+            "changed or deleted since the last import that saved it are sent (single "
+            "MFT file)",
+        )
+        self.parser.add_argument(
+            "--tag-changes",
+            action="store_true",
+            help="Add the change type (new, changed, deleted) of each document sent "
+            "with --delta as the 'delta' field",
+        )
+        self.parser.add_argument(
+            "--max-retries",
+            type=int,
+            default=5,
+            help="Number of retries, with exponential backoff, of documents rejected "
+            "by a busy cluster (429/503)",
+        )
+        self.parser.add_argument(
+            "--dead-letter",
+            default="",
+            metavar="FILE",
+            help="NDJSON file collecting the documents that could not be indexed "
+            "(send them again with mft2es-replay)",
+        )
+        self.parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Print the time spent in each stage (parse, decode, format, "
+            "serialize, bulk), bulk latency percentiles, queue depths and peak memory "
+            "at the end",
+        )
+        self.parser.add_argument(
+            "--metrics",
+            default="",
+            metavar="FILE",
+            help="Write the --stats metrics to this file",
+        )
+        self.parser.add_argument(
+            "--metrics-format",
+            choices=("json", "prometheus"),
+            default="json",
+            help="Format of the --metrics file (prometheus: text exposition format)",
+        )
+        self.parser.add_argument(
+            "--profile",
+            default="",
+            metavar="DIR",
+            help="Write cProfile output of the import of each file (import-<n>.prof) "
+            "and of each worker process (worker-<pid>.prof) to this directory",
+        )
 
     def __list_mft_files(self, mft_files: List[str]) -> List[Path]:
         mft_path_list = list()
@@ -65,8 +244,26 @@ class Mft2esView(BaseView):
         return mft_path_list
 
     def run(self):
+        if self.args.resume and not self.args.checkpoint:
+            self.parser.error("--resume requires --checkpoint")
+        if self.args.resume and self.args.single_pass:
+            self.parser.error("--resume cannot be combined with --single-pass")
+        if self.args.delta and (self.args.single_pass or self.args.sharded):
+            self.parser.error(
+                "--delta cannot be combined with --single-pass or --sharded"
+            )
+        if self.args.tag_changes and not self.args.delta:
+            self.parser.error("--tag-changes requires --delta")
+        try:
+            FieldProjection.from_options(self.args.fields, self.args.exclude_fields)
+        except ValueError as error:
+            self.parser.error(str(error))
+
         view = Mft2esView()
         mft_files = self.__list_mft_files(self.args.mft_files)
+        if self.args.delta and len(mft_files) != 1:
+            # the store holds the fingerprints of one volume
+            self.parser.error("--delta takes a single MFT file")
 
         if self.args.multiprocess:
             view.log(f"Multi-Process: {cpu_count()}", self.args.quiet)
@@ -74,25 +271,53 @@ class Mft2esView(BaseView):
         if self.args.timeline:
             view.log("Timeline analysis mode enabled", self.args.quiet)
 
-        for mft_file in mft_files:
-            view.log(f"Currently Importing {mft_file}.", self.args.quiet)
-
-            Mft2esPresenter(
-                input_path=mft_file,
-                host=self.args.host,
-                port=int(self.args.port),
-                index=self.args.index,
-                scheme=self.args.scheme,
-                pipeline=self.args.pipeline,
-                login=self.args.login,
-                pwd=self.args.pwd,
-                is_quiet=self.args.quiet,
-                multiprocess=self.args.multiprocess,
-                chunk_size=int(self.args.size),
-                logger=self.log,
-                timeline_mode=self.args.timeline,
-                tags=self.args.tags,
-            ).bulk_import()
+        stats = ImportStats() if self.args.stats or self.args.metrics else None
+        ImportScheduler(
+            mft_files,
+            jobs=self.args.jobs,
+            host=self.args.host,
+            port=int(self.args.port),
+            index=self.args.index,
+            scheme=self.args.scheme,
+            pipeline=self.args.pipeline,
+            login=self.args.login,
+            pwd=self.args.pwd,
+            is_quiet=self.args.quiet,
+            multiprocess=self.args.multiprocess,
+            chunk_size=int(self.args.size),
+            logger=self.log,
+            timeline_mode=self.args.timeline,
+            tags=self.args.tags,
+            fields=self.args.add_field,
+            filters=self.args.filter,
+            projection=self.args.fields,
+            exclude_fields=self.args.exclude_fields,
+            delta=self.args.delta,
+            tag_changes=self.args.tag_changes,
+            single_pass=self.args.single_pass,
+            sharded=self.args.sharded,
+            thread_count=self.args.threads,
+            bulk_size=self.args.bulk_size,
+            bulk_bytes=self.args.bulk_bytes,
+            worker_batch=self.args.worker_batch,
+            auto_size=self.args.auto_size,
+            max_memory=self.args.max_memory,
+            queue_size=self.args.queue_size,
+            id_strategy=self.args.id_strategy,
+            raw_bulk=self.args.raw_bulk,
+            checkpoint=self.args.checkpoint,
+            resume=self.args.resume,
+            max_retries=self.args.max_retries,
+            dead_letter=self.args.dead_letter,
+            stats=stats,
+            profile_directory=self.args.profile,
+        ).run()
+
+        if stats and self.args.stats:
+            for line in stats.summary():
+                view.log(line, self.args.quiet)
+        if stats and self.args.metrics:
+            stats.write(Path(self.args.metrics), self.args.metrics_format)
 
         view.log("Import completed.", self.args.quiet)
 
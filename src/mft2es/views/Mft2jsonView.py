@@ -1,6 +1,11 @@
 # coding: utf-8
 from multiprocessing import cpu_count
+from pathlib import Path
 
+from mft2es.models.Mft2es import parse_field
+from mft2es.models.FieldProjection import FieldProjection, parse_field_names
+from mft2es.models.RecordFilter import parse_filter
+from mft2es.models.RecordWriter import get_compression
 from mft2es.views.BaseView import BaseView
 from mft2es.presenters.Mft2jsonPresenter import Mft2jsonPresenter
 
@@ -21,7 +26,25 @@ class Mft2jsonView(BaseView):
             "-o",
             type=str,
             default="",
-            help="json file path to output.",
+            help="file path to output, in --format (compressed with a .gz or .zst "
+            "suffix). Defaults to the input path with the suffix of the format.",
+        )
+        self.parser.add_argument(
+            "--format",
+            "-f",
+            choices=["ndjson", "json", "parquet"],
+            default="ndjson",
+            help="output format: one record per line (ndjson), a single json array, "
+            "or a Parquet file with one typed column per field "
+            "(requires pyarrow: pip install mft2es[parquet]).",
+        )
+        self.parser.add_argument(
+            "--compress",
+            choices=["none", "gzip", "zstd"],
+            default=None,
+            help="compress the output while it is written, on a background thread "
+            "(zstd requires zstandard: pip install mft2es[zstd]). Inferred from a "
+            ".gz or .zst output file suffix by default.",
         )
         self.parser.add_argument(
             "--timeline",
@@ -33,8 +56,70 @@ class Mft2jsonView(BaseView):
             default="",
             help="Comma-separated tags to add to each record (e.g., 'WORKSTATION-1,DOMAIN-ABC')",
         )
+        self.parser.add_argument(
+            "--add-field",
+            action="append",
+            type=parse_field,
+            default=[],
+            metavar="NAME=VALUE",
+            help="Static field to add to each record, can be repeated (e.g., "
+            "'host.name=WS1')",
+        )
+        self.parser.add_argument(
+            "--fields",
+            default="full",
+            metavar="PROFILE|NAMES",
+            help="Fields of each document: a profile (minimal, standard: without "
+            "attribute headers, resident data and entry layout, full) or "
+            "comma-separated dotted field names, '*' matching any one name (e.g., "
+            "'header.flags,attributes.FileName.data')",
+        )
+        self.parser.add_argument(
+            "--exclude-fields",
+            type=parse_field_names,
+            default=(),
+            metavar="NAMES",
+            help="Comma-separated dotted field names removed from each document "
+            "(e.g., 'attributes.*.header,attributes.DATA')",
+        )
+        self.parser.add_argument(
+            "--filter",
+            action="append",
+            type=parse_filter,
+            default=[],
+            metavar="KEY=VALUE",
+            help="Only convert the entries matching every filter key, can be repeated: "
+            "path=GLOB, ext=EXT[,EXT...], state=allocated|deleted, "
+            "type=file|directory, since=TIME, until=TIME (e.g., 'ext=exe,dll' "
+            "'since=2024-01-01')",
+        )
 
     def run(self):
+        if self.args.format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                self.parser.error(
+                    "--format parquet requires pyarrow (pip install mft2es[parquet])"
+                )
+        compression = get_compression(Path(self.args.output_file), self.args.compress)
+        if compression and self.args.format == "parquet":
+            self.parser.error(
+                "--compress cannot be used with --format parquet "
+                "(parquet files are already compressed)"
+            )
+        if compression == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                self.parser.error(
+                    "zstd compression requires zstandard (pip install mft2es[zstd])"
+                )
+        try:
+            FieldProjection.from_options(self.args.fields, self.args.exclude_fields)
+        except ValueError as error:
+            self.parser.error(str(error))
+
         view = Mft2jsonView()
         view.log(f"Converting {self.args.mft_file}.", self.args.quiet)
 
@@ -52,6 +137,14 @@ class Mft2jsonView(BaseView):
             chunk_size=self.args.size,
             timeline_mode=self.args.timeline,
             tags=self.args.tags,
+            fields=self.args.add_field,
+            filters=self.args.filter,
+            projection=self.args.fields,
+            exclude_fields=self.args.exclude_fields,
+            single_pass=self.args.single_pass,
+            sharded=self.args.sharded,
+            output_format=self.args.format,
+            compress=self.args.compress,
         ).export_json()
 
         view.log("Converted.", self.args.quiet)
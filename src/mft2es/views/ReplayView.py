@@ -0,0 +1,100 @@
+# coding: utf-8
+from pathlib import Path
+
+from mft2es.views.BaseView import BaseView
+from mft2es.presenters.ReplayPresenter import ReplayPresenter
+
+
+class ReplayView(BaseView):
+    # dead-letter files hold documents, no MFT is parsed
+    parses_mft = False
+
+    def __init__(self):
+        super().__init__()
+        self.define_options()
+        self.args = self.parser.parse_args()
+
+    def define_options(self):
+        self.parser.add_argument(
+            "dead_letter_files",
+            nargs="+",
+            type=str,
+            help="Dead-letter files written by mft2es --dead-letter.",
+        )
+
+        self.parser.add_argument(
+            "--host", default="localhost", help="ElasticSearch host"
+        )
+        self.parser.add_argument(
+            "--port", default=9200, help="ElasticSearch port number"
+        )
+        self.parser.add_argument(
+            "--scheme", default="http", help="Scheme to use (http, https)"
+        )
+        self.parser.add_argument(
+            "--login", default="", help="Login to use to connect to Elastic database"
+        )
+        self.parser.add_argument(
+            "--pwd", default="", help="Password associated with the login"
+        )
+        self.parser.add_argument(
+            "--bulk-size",
+            type=int,
+            default=500,
+            help="Maximum number of documents per bulk request",
+        )
+        self.parser.add_argument(
+            "--bulk-bytes",
+            type=int,
+            default=100 * 1024 * 1024,
+            help="Maximum size of a bulk request in bytes",
+        )
+        self.parser.add_argument(
+            "--max-retries",
+            type=int,
+            default=5,
+            help="Number of retries, with exponential backoff, of documents rejected "
+            "by a busy cluster (429/503)",
+        )
+        self.parser.add_argument(
+            "--dead-letter",
+            default="",
+            metavar="FILE",
+            help="NDJSON file collecting the documents that fail again",
+        )
+
+    def run(self):
+        view = ReplayView()
+
+        # every file is checked before the first one is replayed
+        presenters = list()
+        for dead_letter_file in self.args.dead_letter_files:
+            try:
+                presenters.append(
+                    ReplayPresenter(
+                        input_path=Path(dead_letter_file),
+                        host=self.args.host,
+                        port=int(self.args.port),
+                        scheme=self.args.scheme,
+                        login=self.args.login,
+                        pwd=self.args.pwd,
+                        is_quiet=self.args.quiet,
+                        logger=self.log,
+                        bulk_size=self.args.bulk_size,
+                        bulk_bytes=self.args.bulk_bytes,
+                        max_retries=self.args.max_retries,
+                        dead_letter=self.args.dead_letter,
+                    )
+                )
+            except ValueError as error:
+                self.parser.error(str(error))
+
+        for presenter in presenters:
+            view.log(f"Currently Replaying {presenter.input_path}.", self.args.quiet)
+            presenter.replay()
+
+        view.log("Replay completed.", self.args.quiet)
+
+
+def entry_point():
+    ReplayView().run()
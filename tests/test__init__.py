@@ -1,10 +1,43 @@
 # coding: utf-8
+import gzip
+import sys
 from hashlib import md5
+from itertools import chain, cycle
 from pathlib import Path
 
+import orjson
 import pytest
+from mft import PyMftParser
+from tqdm import tqdm
+from mft2es import iter_mft_records, mft2json
+from mft2es.models.AutoTuner import AutoTuner, MIN_BULK_SIZE
+from mft2es.models.CheckpointJournal import COMPACT_LINES, CheckpointJournal
+from mft2es.models.DeadLetterQueue import DeadLetterQueue
+from mft2es.models.ElasticsearchUtils import (
+    ElasticsearchUtils,
+    batch_operations,
+    build_bulk_body,
+    calc_key,
+    gen_operations,
+    split_operations,
+)
+from mft2es.models.FieldProjection import FieldProjection
+from mft2es.models.FingerprintStore import FingerprintStore
+from mft2es.models.ImportStats import ImportStats
+from mft2es.models.Mft2es import (
+    Mft2es,
+    close_shared_pool,
+    decode_records,
+    get_record_number,
+    pack_records,
+)
+from mft2es.models.RecordFilter import RecordFilter, parse_filter
+from mft2es.models.RecordWriter import JsonArrayWriter, RecordWriter
+from mft2es.presenters.ImportScheduler import ImportScheduler, order_by_size
+from mft2es.presenters.Mft2esPresenter import Mft2esPresenter
 from mft2es.views.Mft2esView import entry_point as m2e
 from mft2es.views.Mft2jsonView import entry_point as m2j
+from mft2es.views.ReplayView import entry_point as replay
 
 # utils
 def calc_md5(path: Path) -> str:
@@ -13,6 +46,9 @@ def calc_md5(path: Path) -> str:
     else:
         return md5(path.read_bytes()).hexdigest()
 
+def read_records(mft: Mft2es, multiprocess: bool = False, chunk_size=500, **kwargs) -> list:
+    return list(chain.from_iterable(mft.gen_timeline_records(multiprocess, chunk_size, **kwargs)))
+
 
 # command-line test cases
 def test__mft2es_help(monkeypatch):
@@ -47,36 +83,451 @@ def test__mft2json_version(monkeypatch):
             m2j()
         assert exited.value.code == 0
 
+def test__mft2es_replay_options(monkeypatch, capsys, tmp_path):
+    for argv in (
+        ["mft2es-replay", "--sharded", "dead-letter.ndjson"],
+        ["mft2es-replay", "--dead-letter", str(tmp_path / "a"), str(tmp_path / "a")],
+    ):
+        with pytest.raises(SystemExit) as exited:
+            with monkeypatch.context() as m:
+                m.setattr("sys.argv", argv)
+                replay()
+        assert exited.value.code == 2
+    assert "dead_letter must differ" in capsys.readouterr().err
+
+def test__mft2json_parquet_requires_extra(monkeypatch, capsys):
+    argv = ["mft2json", "--format", "parquet", "tests/cache/MFT"]
+    with pytest.raises(SystemExit) as exited:
+        with monkeypatch.context() as m:
+            m.setitem(sys.modules, "pyarrow", None)
+            m.setattr("sys.argv", argv)
+            m2j()
+    assert exited.value.code == 2
+    assert "pip install mft2es[parquet]" in capsys.readouterr().err
+
 
 # behavior test cases 
 def test__mft2json_convert(monkeypatch):
     path = 'tests/cache/MFT.json'
-    argv = ["mft2json", "-o", path, "tests/cache/MFT"]
+    argv = ["mft2json", "--format", "json", "-o", path, "tests/cache/MFT"]
     with monkeypatch.context() as m:
         m.setattr("sys.argv", argv)
         m2j()
-    assert calc_md5(Path(path)) == "b3e228a56fd310dcbcb6ffc6e332cba9"
+    assert calc_md5(Path(path)) == "520ef49469e7023f73803bb81ebeb5ce"
 
 def test__mft2json_convert_multiprocessing(monkeypatch):
     path = 'tests/cache/MFT-m.json'
-    argv = ["mft2json", "-o", path, "-m", "tests/cache/MFT"]
+    argv = ["mft2json", "--format", "json", "-o", path, "-m", "tests/cache/MFT"]
     with monkeypatch.context() as m:
         m.setattr("sys.argv", argv)
         m2j()
-    assert calc_md5(Path(path)) == "b3e228a56fd310dcbcb6ffc6e332cba9"
+    assert calc_md5(Path(path)) == "520ef49469e7023f73803bb81ebeb5ce"
 
 def test__mft2json_timeline_convert(monkeypatch):
     path = 'tests/cache/MFT-t.json'
-    argv = ["mft2json", "--timeline", "-o", path, "tests/cache/MFT"]
+    argv = ["mft2json", "--format", "json", "--timeline", "-o", path, "tests/cache/MFT"]
     with monkeypatch.context() as m:
         m.setattr("sys.argv", argv)
         m2j()
-    assert calc_md5(Path(path)) == "cc18cc8cf067d68ca90084688ae44df0"
+    assert calc_md5(Path(path)) == "4098da9a31c84b161dcd3a88cba9f108"
 
 def test__mft2json_timeline_convert_multiprocessing(monkeypatch):
     path = 'tests/cache/MFT-t-m.json'
-    argv = ["mft2json", "--timeline", "-o", path, "-m", "tests/cache/MFT"]
+    argv = ["mft2json", "--format", "json", "--timeline", "-o", path, "-m", "tests/cache/MFT"]
+    with monkeypatch.context() as m:
+        m.setattr("sys.argv", argv)
+        m2j()
+    assert calc_md5(Path(path)) == "4098da9a31c84b161dcd3a88cba9f108"
+
+def test__mft2json_ndjson_convert(monkeypatch):
+    path = 'tests/cache/MFT.ndjson'
+    argv = ["mft2json", "-o", path, "tests/cache/MFT"]
+    with monkeypatch.context() as m:
+        m.setattr("sys.argv", argv)
+        m2j()
+
+    json_path = 'tests/cache/MFT-ndjson.json'
+    argv = ["mft2json", "--format", "json", "-o", json_path, "tests/cache/MFT"]
+    with monkeypatch.context() as m:
+        m.setattr("sys.argv", argv)
+        m2j()
+
+    lines = Path(path).read_bytes().splitlines()
+    assert [orjson.loads(line) for line in lines] == orjson.loads(Path(json_path).read_bytes())
+
+def test__mft2es_multiprocessing_streams_chunks():
+    chunks = list(
+        Mft2es(Path("tests/cache/MFT")).gen_timeline_records(
+            multiprocess=True, chunk_size=100, max_pending=2
+        )
+    )
+    assert 1 < len(chunks)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+
+def test__mft2es_single_pass_paths():
+    def paths(single_pass: bool) -> dict:
+        result = dict()
+        mft = Mft2es(Path("tests/cache/MFT"), single_pass=single_pass)
+        for records, filepaths in mft.gen_chunks(500):
+            for record, filepath in zip(records, filepaths):
+                number = orjson.loads(record)["header"]["record_number"]
+                result[number] = filepath
+        return result
+
+    assert paths(single_pass=True) == paths(single_pass=False)
+
+def test__mft2es_sharded_matches_single_pass():
+    def records(multiprocess: bool, **kwargs) -> list:
+        mft = Mft2es(Path("tests/cache/MFT"), **kwargs)
+        return read_records(mft, multiprocess, chunk_size=37, timeline_mode=True)
+
+    expected = records(True, single_pass=True)
+    key = lambda record: orjson.dumps(record, option=orjson.OPT_SORT_KEYS)
+    for multiprocess in (False, True):
+        actual = records(multiprocess, sharded=True)
+        assert sorted(map(key, actual)) == sorted(map(key, expected))
+
+def test__mft2es_key_ids_are_unique():
+    es = ElasticsearchUtils("localhost", 9200, "http", "", "", id_strategy="key")
+    for timeline_mode in (False, True):
+        records = read_records(Mft2es(Path("tests/cache/MFT")), timeline_mode=timeline_mode)
+        ids = [a["_id"] for a in es.gen_actions(records, "mft2es", "", "tests/cache/MFT")]
+        assert len(ids) == len(set(ids)) == len(records)
+
+def test__mft2json_add_field(monkeypatch):
+    path = 'tests/cache/MFT-fields.ndjson'
+    argv = [
+        "mft2json", "--timeline", "--tags", "WS1, DOMAIN", "--add-field", "host.name=WS1",
+        "--add-field", "log.file.name=$MFT", "-o", path, "tests/cache/MFT",
+    ]
     with monkeypatch.context() as m:
         m.setattr("sys.argv", argv)
         m2j()
-    assert calc_md5(Path(path)) == "cc18cc8cf067d68ca90084688ae44df0"
+    for line in Path(path).read_bytes().splitlines():
+        record = orjson.loads(line)
+        assert record["tags"] == ["mft", "WS1", "DOMAIN"]
+        assert record["host"] == {"name": "WS1"}
+        assert record["log"]["file"]["name"] == "$MFT"
+        assert record["log"]["file"]["path"].endswith("MFT")
+
+def test__import_scheduler_orders_largest_first(tmp_path):
+    files = list()
+    for name, size in (("a", 10), ("b", 30), ("c", 20)):
+        path = tmp_path / name / "MFT"
+        path.parent.mkdir()
+        path.write_bytes(b"\0" * size)
+        files.append(path)
+    assert [p.parent.name for p in order_by_size(files)] == ["b", "c", "a"]
+
+def test__import_scheduler_reports_chunks(capsys):
+    counts = list()
+    Mft2esPresenter("tests/cache/MFT", on_records=counts.append).observe_records(3)
+    assert counts == [3]
+
+    scheduler = ImportScheduler([], logger=lambda message, is_quiet: print(message))
+    scheduler.progress = tqdm(unit="docs")
+    scheduler.observe_records(3)
+    scheduler.observe_records(4)
+    assert scheduler.progress.n == 7
+    scheduler.log("Currently Importing MFT.")
+    scheduler.progress.close()
+    assert "Currently Importing MFT." in capsys.readouterr().out
+
+def test__mft2es_reuses_shared_pool():
+    pool = Mft2es.get_shared_pool()
+    for _ in range(2):
+        read_records(Mft2es(Path("tests/cache/MFT")), multiprocess=True)
+        assert Mft2es.get_shared_pool() is pool
+
+    close_shared_pool()
+    assert Mft2es.get_shared_pool() is not pool
+
+def test__checkpoint_journal_resumes_from_last_commit(tmp_path):
+    journal = CheckpointJournal(tmp_path / "checkpoint")
+    assert journal.load("MFT", "mft2es") == 0
+    journal.commit("MFT", "mft2es", 500)
+    journal.commit("other/MFT", "mft2es", 700)
+    journal.commit("MFT", "mft2es", 1000)
+    journal.commit("MFT", "mft2es", 300, "timeline settings")
+    with (tmp_path / "checkpoint").open("ab") as f:
+        f.write(b'{"source": "MFT", "ind')  # cut short by a crash
+    assert journal.load("MFT", "mft2es") == 1000
+    assert journal.load("MFT", "mft2es", "timeline settings") == 300
+    assert journal.load("MFT", "timeline") == 0
+
+    # the next import starts with a clean journal, compacted as it grows
+    journal = CheckpointJournal(tmp_path / "checkpoint")
+    for next_record in range(3000):
+        journal.commit("MFT", "mft2es", next_record)
+    assert journal.load("MFT", "mft2es") == 2999
+    assert journal.load("other/MFT", "mft2es") == 700
+    assert len((tmp_path / "checkpoint").read_bytes().splitlines()) <= COMPACT_LINES + 3
+
+def test__mft2es_start_record_skips_records():
+    def numbers(start_record: int, **kwargs) -> list:
+        records = read_records(
+            Mft2es(Path("tests/cache/MFT"), **kwargs), True, 100, start_record=start_record
+        )
+        return [get_record_number(record) for record in records]
+
+    expected = numbers(0)
+    start_record = expected[len(expected) // 2] - 50
+    for kwargs in ({}, {"sharded": True}):
+        assert numbers(start_record, **kwargs) == [n for n in expected if start_record <= n]
+
+def test__dead_letter_queue_round_trip(tmp_path):
+    records = [{"header": {"record_number": i, "sequence": 1}} for i in range(25)]
+    operations = list(gen_operations(records, "mft2es", "", source="MFT"))
+    assert split_operations(build_bulk_body(records, "mft2es", "", source="MFT")) == operations
+    assert [len(b) for b in batch_operations(operations, bulk_size=10)] == [10, 10, 5]
+
+    queue = DeadLetterQueue(tmp_path / "dead-letter.ndjson")
+    queue.write(operations[:5])
+    queue.write(operations[5:])
+    assert list(queue.read()) == operations
+
+def test__mft2es_changing_sizes_keep_records():
+    def records(**kwargs) -> list:
+        mft = Mft2es(Path("tests/cache/MFT"), sharded=kwargs.pop("sharded"))
+        return read_records(mft, multiprocess=True, **kwargs)
+
+    for sharded in (False, True):
+        chunk_sizes, worker_batches = cycle((7, 300, 50)), cycle((1, 3))
+        assert records(sharded=sharded, chunk_size=500) == records(
+            sharded=sharded,
+            chunk_size=lambda: next(chunk_sizes),
+            worker_batch=lambda: next(worker_batches),
+        )
+
+def test__auto_tuner_follows_bulk_latency():
+    tuner = AutoTuner(bulk_size=100)
+    tuner.observe_request(100, 0.1)
+    assert tuner.get_bulk_size() == 200
+    tuner.observe_request(50, 0.1)  # not full, says nothing about larger requests
+    assert tuner.get_bulk_size() == 200
+    for _ in range(10):
+        tuner.observe_request(200, 5.0)
+    assert tuner.get_bulk_size() == MIN_BULK_SIZE
+
+def test__mft2es_single_process_yields_each_chunk():
+    entry_count = sum(1 for _ in PyMftParser("tests/cache/MFT").entries_json())
+    for chunk_size in (1, 7, 100):
+        chunks = list(
+            Mft2es(Path("tests/cache/MFT")).gen_timeline_records(
+                multiprocess=False, chunk_size=chunk_size
+            )
+        )
+        assert [len(chunk) for chunk in chunks[:-1]] == [chunk_size] * (len(chunks) - 1)
+        assert 0 < len(chunks[-1]) <= chunk_size
+        assert sum(map(len, chunks)) == entry_count
+
+    def records(multiprocess: bool) -> list:
+        mft = Mft2es(Path("tests/cache/MFT"))
+        return read_records(mft, multiprocess, chunk_size=3, timeline_mode=True)
+
+    assert records(False) == records(True)
+
+def test__iter_mft_records():
+    for timeline_mode in (False, True):
+        mft = Mft2es(Path("tests/cache/MFT").resolve())
+        expected = read_records(mft, timeline_mode=timeline_mode)
+        assert mft2json("tests/cache/MFT", timeline_mode=timeline_mode) == expected
+
+    records = iter_mft_records("tests/cache/MFT", tags="WS1", fields={"host.name": "WS1"})
+    record = next(records)
+    assert record["tags"] == ["mft", "WS1"]
+    assert record["host"] == {"name": "WS1"}
+    records.close()
+    for name in ("host..name", "host.name=WS1", ""):
+        with pytest.raises(ValueError):
+            next(iter_mft_records("tests/cache/MFT", fields={name: "WS1"}))
+
+def test__timeline_records_share_no_state():
+    def records() -> list:
+        return list(iter_mft_records("tests/cache/MFT", timeline_mode=True, fields={"host.name": "WS1"}))
+
+    expected = records()
+    first, *siblings = [r for r in records() if r["windows"]["mft"]["record"]["number"] == 0]
+    assert len(siblings) == 7
+    mft = first["windows"]["mft"]
+    mft["record"]["path"] = "changed"
+    mft["header"]["sequence"] = -1
+    mft["attribute"]["header"]["instance"] = -1
+    mft["attribute"]["data"]["changed"] = True
+    first["event"]["kind"] = "changed"
+    first["log"]["file"]["path"] = "changed"
+    first["host"]["name"] = "changed"
+    first["tags"].append("changed")
+    assert siblings == expected[1:8]
+    assert records() == expected
+
+def test__import_stats_collects_stages():
+    for multiprocess in (False, True):
+        stats = ImportStats()
+        records = read_records(Mft2es(Path("tests/cache/MFT")), multiprocess, 100, stats=stats)
+        assert records == read_records(Mft2es(Path("tests/cache/MFT")), multiprocess, 100)
+        assert {"parse", "decode", "format"} <= set(stats.stages)
+
+    stats.observe_request(500, 1024, 0.25)
+    stats.observe_depth("bulk", 3)
+    metrics = stats.to_dict()
+    assert metrics["bulk"]["latency_seconds"]["p50"] == 0.25
+    assert metrics["queue_depth"]["bulk"] == {"mean": 3.0, "max": 3}
+    assert 'mft2es_bulk_bytes_total 1024' in stats.to_prometheus()
+
+def test__packed_records_decode_like_records():
+    for records, _ in Mft2es(Path("tests/cache/MFT")).gen_chunks(50):
+        assert decode_records(pack_records(records)) == decode_records(records)
+
+def test__filter_drops_records_before_formatting():
+    timeline = list(iter_mft_records("tests/cache/MFT", timeline_mode=True))
+    timestamps = sorted(record["@timestamp"] for record in timeline)
+    since, until = timestamps[len(timestamps) // 4], timestamps[len(timestamps) * 3 // 4]
+
+    for terms in (
+        ["state=allocated", "type=file", f"since={since[:19]}", f"until={until[:19]}"],
+        ["ext=txt,exe,dll"],
+        ["path=*/*", "state=deleted"],
+    ):
+        record_filter = RecordFilter.from_terms(map(parse_filter, terms))
+        expected = [
+            record
+            for record in timeline
+            if record_filter.match_flags(record["windows"]["mft"]["header"]["flags"])
+            and record_filter.match_path(record["windows"]["mft"]["record"]["path"])
+            and record_filter.match_timestamp(record["@timestamp"])
+        ]
+        numbers = sorted({record["windows"]["mft"]["record"]["number"] for record in expected})
+        key = lambda record: orjson.dumps(record, option=orjson.OPT_SORT_KEYS)
+        for single_pass in (False, True):
+            records = iter_mft_records("tests/cache/MFT", timeline_mode=True, filters=terms, single_pass=single_pass)
+            # single-pass records may come after the records of their parents
+            assert sorted(map(key, records)) == sorted(map(key, expected))
+            records = iter_mft_records("tests/cache/MFT", filters=terms, single_pass=single_pass, multiprocess=True)
+            assert sorted(record["header"]["record_number"] for record in records) == numbers
+
+def test__field_projection_profiles():
+    for timeline_mode in (False, True):
+        full = list(iter_mft_records("tests/cache/MFT", timeline_mode=timeline_mode, fields={"host.name": "WS1"}))
+        for profile in ("standard", "minimal"):
+            records = list(iter_mft_records("tests/cache/MFT", timeline_mode=timeline_mode, fields={"host.name": "WS1"}, projection=profile, multiprocess=True))
+            assert [calc_key(r, "x") for r in records] == [calc_key(r, "x") for r in full]
+            assert all(r["host"] == {"name": "WS1"} for r in records)
+            assert len(orjson.dumps(records)) < len(orjson.dumps(full))
+
+    records = list(iter_mft_records("tests/cache/MFT", projection=["attributes.FileName.data.path"], exclude_fields=["tags"]))
+    assert set(records[0]) == {"header", "attributes"}
+    assert set(records[0]["header"]) == {"record_number", "sequence"}
+    assert all(set(r["attributes"]) <= {"FileName"} for r in records)
+
+    projection = FieldProjection(exclude=["attributes.*.header", "attributes.DATA"])
+    record = {"attributes": {"FileName": {"header": {}, "data": {"name": "a"}}, "DATA": {"data": "00"}}}
+    assert projection.apply(record) == {"attributes": {"FileName": {"data": {"name": "a"}}}}
+    with pytest.raises(ValueError):
+        FieldProjection.from_options("full", "header")
+
+def test__delta_import_sends_changed_entries(tmp_path):
+    def run(store, tag_changes=False, multiprocess=False):
+        mft = Mft2es(Path("tests/cache/MFT"))
+        return read_records(mft, multiprocess, 100, delta=store, tag_changes=tag_changes)
+
+    store = FingerprintStore(tmp_path / "volume.fp")
+    assert not store.load("settings")
+    records = run(store, tag_changes=True, multiprocess=True)
+    assert len(records) == store.counts["new"] and {r["delta"] for r in records} == {"new"}
+    store.save()
+
+    store = FingerprintStore(tmp_path / "volume.fp")
+    assert store.load("settings")
+    assert run(store) == []
+    assert store.counts["unchanged"] == len(records)
+
+    number = len(store.fingerprints) + 10
+    assert store.compare(number, 1, True, 1) == "new"
+    assert store.compare(number, 1, True, 2) == "changed"
+    # freeing the entry increments its sequence number
+    assert store.compare(number, 2, False, 3) == "deleted"
+    assert store.compare(number, 2, False, 3) is None
+    assert store.compare(number, 2, True, 4) == "new"
+    assert not FingerprintStore(tmp_path / "volume.fp").load("other settings")
+
+def test__delta_import_keeps_entries_outside_time_window(tmp_path):
+    timestamps = sorted(
+        record["@timestamp"]
+        for record in iter_mft_records("tests/cache/MFT", timeline_mode=True)
+    )
+    since = timestamps[len(timestamps) // 2][:19]
+
+    def run(record_filter=None):
+        store = FingerprintStore(tmp_path / "volume.fp")
+        store.load("settings")
+        mft = Mft2es(Path("tests/cache/MFT"))
+        records = read_records(mft, False, 100, record_filter=record_filter, delta=store)
+        numbers = [record["header"]["record_number"] for record in records]
+        store.save()
+        return numbers
+
+    numbers = [r["header"]["record_number"] for r in iter_mft_records("tests/cache/MFT")]
+    windowed = run(RecordFilter(since=since))
+    assert 0 < len(windowed) < len(numbers)
+    # the entries left out by the time window were not recorded as sent
+    rest = run()
+    assert sorted(windowed + rest) == numbers
+    assert run() == []
+
+def test__mft2json_parquet_convert(monkeypatch, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    for timeline_mode in (False, True):
+        path = tmp_path / f"MFT-{timeline_mode}.parquet"
+        argv = ["mft2json", "--format", "parquet", "--add-field", "host.name=WS1", "-o", str(path), "tests/cache/MFT"]
+        if timeline_mode:
+            argv.insert(1, "--timeline")
+        with monkeypatch.context() as m:
+            m.setattr("sys.argv", argv)
+            m2j()
+        table = pq.read_table(path)
+        records = list(iter_mft_records("tests/cache/MFT", timeline_mode=timeline_mode))
+        assert table.num_rows == len(records)
+        assert set(table.column("host.name").to_pylist()) == {"WS1"}
+        if timeline_mode:
+            assert table.column("record_number").to_pylist() == [r["windows"]["mft"]["record"]["number"] for r in records]
+            assert table.column("timestamp").null_count == 0
+        else:
+            assert table.column("record_number").to_pylist() == [r["header"]["record_number"] for r in records]
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test__mft2json_compressed_convert(monkeypatch, tmp_path, compression):
+    path = tmp_path / "MFT.ndjson"
+    with monkeypatch.context() as m:
+        m.setattr("sys.argv", ["mft2json", "-o", str(path), "tests/cache/MFT"])
+        m2j()
+    expected = path.read_bytes()
+
+    if compression == "gzip":
+        output, options, decompress = tmp_path / "MFT.ndjson.gz", [], gzip.decompress
+    else:
+        zstandard = pytest.importorskip("zstandard")
+        output, options = tmp_path / "MFT.out", ["--compress", "zstd"]
+        decompress = zstandard.ZstdDecompressor().decompressobj().decompress
+    argv = ["mft2json", *options, "-o", str(output), "tests/cache/MFT"]
+    with monkeypatch.context() as m:
+        m.setattr("sys.argv", argv)
+        m2j()
+    assert decompress(output.read_bytes()) == expected
+
+def test__record_writer_keeps_output_on_failure(tmp_path):
+    path = tmp_path / "MFT.json"
+    path.write_bytes(b"previous")
+    with pytest.raises(RuntimeError):
+        with JsonArrayWriter(path) as writer:
+            writer.write([{"a": 1}])
+            raise RuntimeError("conversion failed")
+    assert path.read_bytes() == b"previous"
+    assert list(tmp_path.iterdir()) == [path]
+
+    with JsonArrayWriter(path) as writer:
+        writer.write([{"a": 1}])
+    assert orjson.loads(path.read_bytes()) == [{"a": 1}]
+    with pytest.raises(TypeError):
+        RecordWriter(path)